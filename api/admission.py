@@ -0,0 +1,204 @@
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+
+DEADLINE_HEADER = 'X-Swasthya-Deadline'
+# Never shed, so load balancers and dashboards still see the server under overload
+EXEMPT_PATHS = ('/api/health', '/api/metrics')
+# Read line by line rather than as one document, so exempt from the body size cap
+STREAMED_PATHS = ('/api/predict-batch',)
+# Generous size of one food in a request body; a full food object is about 250 bytes
+FOOD_BYTES = 1024
+# Room for everything in a body besides its foods (plan structure, options, ...)
+BODY_OVERHEAD_BYTES = 64 * 1024
+
+
+class TooManyFoods(ValueError):
+    """A request with more foods than AdmissionControl.max_foods; answered with 413"""
+
+    def __init__(self, count, limit):
+        super().__init__(f'{count} foods is over the limit of {limit} per request')
+
+
+class AdmissionControl:
+    """
+    Load shedding for a Flask app, wrapped around the whole WSGI call so a
+    rejected request costs no routing, parsing or model work.
+
+    At most `max_in_flight` requests are worked on at once per process;
+    any request beyond that is answered at once with 503 and a Retry-After
+    of `retry_after` seconds instead of queueing behind the others. A
+    request whose `X-Swasthya-Deadline` (Unix time in seconds) has passed
+    by the time it is admitted, typically after waiting in the server's
+    accept queue, gets 504 without being worked on: its client has given
+    up. Handlers call check_foods() to cap the foods in one request, and
+    bodies too large to hold `max_foods` foods get 413 before any handler
+    parses them.
+
+    The server must have more threads than `max_in_flight` for the excess
+    to reach this check rather than wait in the server's own queue;
+    ml/gunicorn.conf.py sizes its threads from the limit for this reason.
+    A max_in_flight of 0 disables the limit, a max_foods of 0 the cap.
+    """
+
+    def __init__(self, max_in_flight=16, retry_after=1, max_foods=1000, clock=time.time):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.max_foods = max_foods
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.accepted = 0
+        self.shed = 0
+        self.expired = 0
+        self.too_large = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build admission control from SWASTHYA_MAX_IN_FLIGHT / _RETRY_AFTER / _MAX_FOODS"""
+        return cls(
+            max_in_flight=int(os.environ.get('SWASTHYA_MAX_IN_FLIGHT', 16)),
+            retry_after=int(os.environ.get('SWASTHYA_RETRY_AFTER', 1)),
+            max_foods=int(os.environ.get('SWASTHYA_MAX_FOODS', 1000)),
+        )
+
+    def check_foods(self, count):
+        """Raise TooManyFoods when `count` foods is over the per-request cap"""
+        if self.max_foods and count > self.max_foods:
+            with self._lock:
+                self.too_large += 1
+            raise TooManyFoods(count, self.max_foods)
+
+    @property
+    def max_body_bytes(self):
+        """Largest request body that can hold `max_foods` foods; None when foods are not capped"""
+        return self.max_foods * FOOD_BYTES + BODY_OVERHEAD_BYTES if self.max_foods else None
+
+    def deadline_passed(self, environ):
+        value = environ.get('HTTP_' + DEADLINE_HEADER.upper().replace('-', '_'))
+        if not value:
+            return False
+        try:
+            return self._clock() >= float(value)
+        except ValueError:
+            return False
+
+    def instrument(self, app):
+        """Wrap `app.wsgi_app`; call last so shed requests skip the other wrappers too"""
+        from flask import jsonify, request
+        from werkzeug.exceptions import RequestEntityTooLarge
+
+        app.config['MAX_CONTENT_LENGTH'] = self.max_body_bytes
+
+        # Read the body before the handler so one over the cap is answered
+        # with 413 here, not parsed or caught by the handler's own error path
+        @app.before_request
+        def read_body():
+            limit = request.max_content_length
+            if request.path in STREAMED_PATHS:
+                # None would fall back to MAX_CONTENT_LENGTH
+                request.max_content_length = sys.maxsize
+            elif limit is not None and len(request.get_data()) >= limit:
+                # A body without Content-Length is cut off quietly at the
+                # limit; reading past it raises RequestEntityTooLarge
+                request.stream.read(1)
+
+        @app.errorhandler(RequestEntityTooLarge)
+        def body_too_large(e):
+            with self._lock:
+                self.too_large += 1
+            return jsonify({'success': False, 'error': f'Request body is over the limit of {self.max_body_bytes} bytes'}), 413
+
+        app.wsgi_app = self._wrap(app.wsgi_app)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _wrap(self, wsgi_app):
+        def admitted_app(environ, start_response):
+            if environ.get('PATH_INFO') in EXEMPT_PATHS:
+                return wsgi_app(environ, start_response)
+
+            if self.deadline_passed(environ):
+                with self._lock:
+                    self.expired += 1
+                return _reject(start_response, '504 Gateway Timeout', 'Request deadline passed before it was served')
+
+            with self._lock:
+                admitted = not self.max_in_flight or self.in_flight < self.max_in_flight
+                if admitted:
+                    self.in_flight += 1
+                    self.accepted += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                else:
+                    self.shed += 1
+            if not admitted:
+                return _reject(start_response, '503 Service Unavailable', 'Server is overloaded; retry later',
+                               [('Retry-After', str(self.retry_after))])
+
+            try:
+                return _AdmittedBody(wsgi_app(environ, start_response), self._release)
+            except BaseException:
+                self._release()
+                raise
+
+        return admitted_app
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'accepted': self.accepted,
+                'shed': self.shed,
+                'expired': self.expired,
+                'too_large': self.too_large,
+                'max_foods': self.max_foods,
+            }
+
+
+class _AdmittedBody:
+    """
+    Response body that frees its request's slot exactly once: when the body
+    has been sent in full, when it is closed, or when it is dropped without
+    either. Holding the slot until the server has written the body keeps
+    threads that are still sending from competing with newly admitted ones;
+    the other two cases cover streamed bodies cut short and callers such as
+    Flask's test client that never close responses they do not read.
+    """
+
+    def __init__(self, iterable, release):
+        self._iterable = iterable
+        self._iterator = iter(iterable)
+        self._release = weakref.finalize(self, release)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._release()
+            raise
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._release()
+
+
+def _reject(start_response, status, message, headers=()):
+    body = json.dumps({'success': False, 'error': message}).encode()
+    # Rejections bypass flask_cors, so the browser frontend can still read them
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body))),
+                            ('Access-Control-Allow-Origin', '*'), *headers])
+    return [body]
@@ -0,0 +1,165 @@
+import numpy as np
+
+
+def normalize_features(features, mean, std):
+    """log1p-compress the skewed nutrient columns, then standardize each one"""
+    return (np.log1p(np.maximum(np.asarray(features, dtype=np.float64), 0)) - mean) / std
+
+
+class NutrientKDTree:
+    """
+    KD-tree over normalized nutrient vectors, flattened to its leaves.
+
+    Points are split on the widest dimension at the median until buckets
+    hold at most `leaf_size` rows; each leaf owns a contiguous slice of the
+    reordered points, healthiest first, and records its bounding box and
+    best health score. A query computes the distance to every leaf's box in
+    one vectorized step, drops leaves with nothing healthier than the query
+    and scans the healthier prefix of the rest nearest-first, in batches,
+    until no box can beat the k-th best distance, so the Python-level work
+    is a few vectorized steps rather than a tree walk.
+    """
+
+    # Leaves sorted up front: exactly the first five scan rounds (8 + 16 + ... + 128)
+    SORTED_LEAVES = 248
+
+    def __init__(self, points, scores, rows, leaf_size=128):
+        order = np.arange(len(rows))
+        starts, ends = [], []
+
+        # An empty tree has no leaves, and every query finds nothing
+        stack = [(0, len(rows))] if len(rows) else []
+        while stack:
+            start, end = stack.pop()
+            if end - start <= leaf_size:
+                starts.append(start)
+                ends.append(end)
+                continue
+            # Split on the widest dimension at the median
+            block = points[order[start:end]]
+            dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            middle = (end - start) // 2
+            order[start:end] = order[start:end][np.argpartition(block[:, dim], middle)]
+            stack.append((start + middle, end))
+            stack.append((start, start + middle))
+
+        # Leaves in storage order, each sorted healthiest first, so the points
+        # healthier than a query are a prefix of every leaf
+        starts, ends = np.sort(np.asarray(starts, dtype=np.intp)), np.sort(np.asarray(ends, dtype=np.intp))
+        for start, end in zip(starts, ends):
+            order[start:end] = order[start:end][np.argsort(-scores[order[start:end]], kind='stable')]
+        self.points = np.ascontiguousarray(points[order])
+        self.scores = scores[order]
+        self.rows = rows[order]
+        self.starts = starts
+        self.ends = ends
+        # Integer keys ascending over the whole tree (leaf, then score
+        # descending), so one searchsorted finds where every leaf's points
+        # stop beating a query's score
+        self._levels = np.unique(self.scores)
+        leaf_of = np.repeat(np.arange(len(starts)), ends - starts)
+        descending_rank = len(self._levels) - 1 - np.searchsorted(self._levels, self.scores)
+        self._score_keys = leaf_of * len(self._levels) + descending_rank
+        dims = points.shape[1]
+        self.lows = np.array([self.points[a:b].min(axis=0) for a, b in zip(starts, ends)]).reshape(-1, dims)
+        self.highs = np.array([self.points[a:b].max(axis=0) for a, b in zip(starts, ends)]).reshape(-1, dims)
+        self.best_scores = np.array([self.scores[a:b].max() for a, b in zip(starts, ends)], dtype=np.float64)
+
+    def query(self, point, k, min_score):
+        """(rows, squared distances) of the k nearest points scoring above min_score"""
+        # Squared distance from the point to every leaf's bounding box
+        gap = np.maximum(self.lows - point, 0) + np.maximum(point - self.highs, 0)
+        bounds = np.einsum('ij,ij->i', gap, gap)
+        candidates = np.flatnonzero(self.best_scores > min_score)
+        # Queries rarely get past the nearest couple of hundred leaves, so only
+        # those are sorted up front; the rest are sorted if the scan reaches them
+        remaining = None
+        if len(candidates) > self.SORTED_LEAVES:
+            head = np.argpartition(bounds[candidates], self.SORTED_LEAVES)[:self.SORTED_LEAVES]
+            remaining = np.delete(candidates, head)
+            candidates = candidates[head]
+        candidates = candidates[np.argsort(bounds[candidates], kind='stable')]
+
+        # Key offset, within a leaf, at which points stop beating min_score
+        cutoff = len(self._levels) - np.searchsorted(self._levels, min_score, side='right')
+        found = np.empty(0, dtype=np.intp)
+        found_distances = np.empty(0)
+        worst = np.inf
+        position, batch = 0, 8
+        while True:
+            if position >= len(candidates):
+                if remaining is None:
+                    break
+                candidates = np.concatenate([candidates, remaining[np.argsort(bounds[remaining], kind='stable')]])
+                remaining = None
+            # Scan the next few leaves in one go, doubling the batch each round
+            leaves = candidates[position:position + batch]
+            position += len(leaves)
+            batch *= 2
+            leaves = leaves[bounds[leaves] < worst]
+            if len(leaves) == 0:
+                break
+
+            # Positions of each leaf's healthier prefix; np.take gathers
+            # rows about twice as fast as fancy indexing
+            sizes = np.searchsorted(self._score_keys, leaves * len(self._levels) + cutoff) - self.starts[leaves]
+            offsets = np.repeat(self.starts[leaves] - np.cumsum(sizes) + sizes, sizes)
+            index = offsets + np.arange(sizes.sum())
+            diff = np.take(self.points, index, axis=0) - point
+            distances = np.concatenate([found_distances, np.einsum('ij,ij->i', diff, diff)])
+            index = np.concatenate([found, index])
+            if len(distances) > k:
+                nearest = np.argpartition(distances, k - 1)[:k]
+                distances, index = distances[nearest], index[nearest]
+            found_distances, found = distances, index
+            if len(found_distances) == k:
+                worst = found_distances.max()
+
+        order = np.argsort(found_distances, kind='stable')
+        return self.rows[found[order]], found_distances[order]
+
+
+class AlternativesIndex:
+    """
+    "Healthier alternative" lookup over a FoodCatalog: the foods nearest in
+    nutrient space that score better than a given food.
+
+    One KD-tree covers the whole catalog and one more covers each category,
+    built once from the catalog's precomputed health scores.
+    """
+
+    def __init__(self, catalog, leaf_size=128):
+        self.catalog = catalog
+        compressed = np.log1p(np.maximum(catalog.features.astype(np.float64), 0))
+        if len(compressed):
+            self.mean = compressed.mean(axis=0)
+            self.std = compressed.std(axis=0)
+            self.std[self.std == 0] = 1
+        else:
+            self.mean, self.std = np.zeros(compressed.shape[1]), np.ones(compressed.shape[1])
+        points = normalize_features(catalog.features, self.mean, self.std)
+        scores = catalog.health_scores.astype(np.float64)
+
+        rows = np.arange(len(catalog))
+        self._trees = {None: NutrientKDTree(points, scores, rows, leaf_size)}
+        for code in range(len(catalog.category_names)):
+            members = rows[catalog.category_codes == code]
+            self._trees[code] = NutrientKDTree(points[members], scores[members], members, leaf_size)
+
+    def query(self, features, health_score, k=5, category=None):
+        """
+        (rows, distances) of up to k catalog foods scoring above health_score,
+        closest first, optionally restricted to one category
+        """
+        code = self.catalog.category_code(category)
+        if category and code is None:
+            raise ValueError(f"Unknown category '{category}'")
+        point = normalize_features(features, self.mean, self.std)
+        # Compare in float32 like the stored scores, so a food never counts as healthier than itself
+        rows, distances = self._trees[code].query(point, k, float(np.float32(health_score)))
+        return rows, np.sqrt(distances)
+
+    def suggest(self, features, health_score, k=3):
+        """Names of the k nearest healthier foods not themselves labelled Unhealthy"""
+        rows, _ = self.query(features, health_score, 4 * k)
+        return [self.catalog.names[row] for row in rows if self.catalog.predictions[row] != 'Unhealthy'][:k]
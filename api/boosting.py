@@ -0,0 +1,132 @@
+import numpy as np
+
+from forest import CompiledForest, save_npz_aligned
+
+
+class CompiledBoosting(CompiledForest):
+    """
+    A HistGradientBoostingClassifier flattened into the same node arrays as
+    CompiledForest and walked by the same lock-step `apply`.
+
+    `value` holds each leaf's raw score. Trees are stored iteration by
+    iteration with one tree per output (`n_outputs`: 1 for binary, else one
+    per class), preceded by one single-leaf tree per output holding the
+    baseline prediction, so summing the leaves reached in tree order gives
+    the raw predictions exactly as sklearn accumulates them. Categorical
+    splits are not supported.
+    """
+
+    kind = 'boosting'
+    # Histogram trees compare float64 inputs against float64 thresholds
+    input_dtype = np.float64
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, classes,
+                 n_outputs):
+        super().__init__(feature, threshold, left, right, missing_left, value, roots, max_depth, classes)
+        self.n_outputs = int(n_outputs)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted sklearn HistGradientBoostingClassifier"""
+        n_outputs = model.n_trees_per_iteration_
+        baseline = np.asarray(model._baseline_prediction, dtype=np.float64).ravel()
+        # Baseline trees: a lone leaf that points back to itself
+        features = [np.zeros(n_outputs, dtype=np.int64)]
+        thresholds = [np.full(n_outputs, np.inf)]
+        lefts = [np.arange(n_outputs)]
+        rights = [np.arange(n_outputs)]
+        missing = [np.zeros(n_outputs, dtype=bool)]
+        values = [baseline]
+        roots = list(range(n_outputs))
+        offset = n_outputs
+        max_depth = 0
+        for iteration in model._predictors:
+            for predictor in iteration:
+                nodes = predictor.nodes
+                if nodes['is_categorical'].any():
+                    raise ValueError('Categorical splits cannot be compiled')
+                node_ids = np.arange(len(nodes))
+                is_leaf = nodes['is_leaf'].astype(bool)
+
+                features.append(np.where(is_leaf, 0, nodes['feature_idx']))
+                thresholds.append(np.where(is_leaf, np.inf, nodes['num_threshold']))
+                lefts.append(np.where(is_leaf, node_ids, nodes['left']) + offset)
+                rights.append(np.where(is_leaf, node_ids, nodes['right']) + offset)
+                missing.append(nodes['missing_go_to_left'].astype(bool))
+                values.append(np.where(is_leaf, nodes['value'], 0.0))
+
+                roots.append(offset)
+                offset += len(nodes)
+                max_depth = max(max_depth, int(nodes['depth'].max()))
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            missing_left=np.ascontiguousarray(np.concatenate(missing)),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            n_outputs=n_outputs,
+        )
+
+    @property
+    def n_estimators(self):
+        """Boosting iterations (excluding the baseline trees)"""
+        return len(self.roots) // self.n_outputs - 1
+
+    def decision_function(self, X):
+        """Raw predictions, (N, n_outputs)"""
+        X = np.asarray(X, dtype=self.input_dtype)
+        return self.raw_predictions(self.apply(X))
+
+    def raw_predictions(self, leaves):
+        # A cumulative sum always adds trees in order, as sklearn does (a
+        # plain sum may use pairwise summation and differ in the last bits)
+        values = self.value[leaves.T].reshape(-1, self.n_outputs, len(leaves))
+        return values.cumsum(axis=0)[-1].T
+
+    def leaf_proba(self, leaves):
+        raw = self.raw_predictions(leaves)
+        if self.n_outputs == 1:
+            positive = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        raw -= raw.max(axis=1, keepdims=True)
+        proba = np.exp(raw)
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba
+
+    def save(self, path, label_classes, source_hash=None):
+        save_npz_aligned(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            missing_left=self.missing_left,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.int32(self.max_depth),
+            classes=self.classes_,
+            label_classes=np.asarray(label_classes, dtype=str),
+            kind=np.asarray(self.kind),
+            n_outputs=np.int32(self.n_outputs),
+            **({'source_hash': np.asarray(source_hash)} if source_hash else {})
+        )
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(
+            feature=data['feature'],
+            threshold=data['threshold'],
+            left=data['left'],
+            right=data['right'],
+            missing_left=data['missing_left'],
+            value=data['value'],
+            roots=data['roots'],
+            max_depth=data['max_depth'],
+            classes=data['classes'],
+            n_outputs=data['n_outputs'],
+        )
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+
+from json_codec import dumps, loads
+from scoring import FEATURE_NAMES, score_matrix
+
+DEFAULT_CHUNK_SIZE = 1024
+MAX_CHUNK_SIZE = 10000
+# One food is a few hundred bytes; longer lines are answered with an error row
+MAX_LINE_BYTES = 64 * 1024
+
+
+def parse_food_line(line):
+    """
+    Parse one NDJSON record into (food, feature_row).
+    Raises ValueError with a readable message for bad rows.
+    """
+    try:
+        food = loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Invalid JSON: {e.msg}')
+    if not isinstance(food, dict):
+        raise ValueError('Each line must be a JSON object')
+    try:
+        row = [float(food.get(name) or 0) for name in FEATURE_NAMES]
+    except (TypeError, ValueError):
+        raise ValueError(f'Nutrient values must be numbers: {line[:80]!r}')
+    return food, row
+
+
+def read_lines(stream, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Yield the lines of a binary stream, holding at most `max_line_bytes` of
+    any one line in memory. A longer line is read past and yielded as None.
+    """
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        if len(line) <= max_line_bytes or line.endswith(b'\n'):
+            yield line
+            continue
+        while line and not line.endswith(b'\n'):
+            line = stream.readline(max_line_bytes + 1)
+        yield None
+
+
+def score_ndjson(lines, model, label_encoder, chunk_size=DEFAULT_CHUNK_SIZE, cache=None,
+                 max_line_bytes=MAX_LINE_BYTES):
+    """
+    Score NDJSON lines, yielding NDJSON result lines. `lines` is an
+    iterable of lines or a binary stream such as `request.stream`.
+
+    Rows are buffered into chunks of `chunk_size` and each chunk is scored
+    with one vectorized model call, so memory stays flat however many rows
+    the client streams. Bad rows, including lines over `max_line_bytes`,
+    produce an inline error record and do not stop the stream. Results keep
+    input order; `line` is the 1-based input line number and an `id` or
+    `name` on the input is echoed back.
+    """
+    pending = []    # (line_number, food, error) in input order
+    rows = []
+
+    def flush():
+        scores = labels = None
+        if rows:
+            labels, _, scores = score_matrix(model, label_encoder, np.array(rows), cache=cache)
+            labels = labels.tolist()
+            scores = np.round(scores, 1).tolist()
+        position = 0
+        for line_number, food, error in pending:
+            if error is not None:
+                record = {'line': line_number, 'success': False, 'error': error}
+            else:
+                record = {'line': line_number, 'success': True}
+                for key in ('id', 'name'):
+                    if key in food:
+                        record[key] = food[key]
+                record['prediction'] = labels[position]
+                record['health_score'] = scores[position]
+                position += 1
+            yield dumps(record) + b'\n'
+        pending.clear()
+        rows.clear()
+
+    if hasattr(lines, 'readline'):
+        lines = read_lines(lines, max_line_bytes)
+    for line_number, line in enumerate(lines, start=1):
+        if line is not None:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            line = line.strip()
+            if not line:
+                continue
+        try:
+            if line is None or len(line) > max_line_bytes:
+                raise ValueError(f'Line is over the limit of {max_line_bytes} bytes')
+            food, row = parse_food_line(line)
+        except ValueError as e:
+            pending.append((line_number, None, str(e)))
+        else:
+            pending.append((line_number, food, None))
+            rows.append(row)
+        if len(pending) >= chunk_size:
+            yield from flush()
+
+    yield from flush()
@@ -0,0 +1,153 @@
+import bisect
+import csv
+import re
+
+import numpy as np
+
+from scoring import FEATURE_NAMES, score_matrix
+
+
+def normalize_name(name):
+    """Lower-case and collapse whitespace so lookups ignore formatting"""
+    return ' '.join(str(name).lower().split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodCatalog:
+    """
+    Column-oriented store of named foods loaded from a CSV with the
+    ml/data/sample_nutrition.csv schema.
+
+    Nutrients live in one (N, 7) float32 matrix and categories are stored as
+    small integer codes. An optional `cuisine` column is kept (normalized)
+    in `cuisines`, or None when the CSV has no such column. Every row's prediction and health score are computed
+    once at load time, so lookups never run the model.
+
+    Two indexes back autocomplete:
+      - a sorted list of every word-start suffix of each name, searched with
+        bisect for prefix matches ("ri" finds "Rice" and "Brown Rice")
+      - a trigram inverted index for fuzzy matches when no prefix matches
+    """
+
+    def __init__(self, names, categories, features, model, label_encoder, cuisines=None):
+        self.names = list(names)
+        self.cuisines = [normalize_name(cuisine) for cuisine in cuisines] if cuisines is not None else None
+        self.category_names, codes = np.unique(np.asarray(categories, dtype=str), return_inverse=True)
+        self.category_codes = codes.astype(np.int16)
+        self.features = np.asarray(features, dtype=np.float32).reshape(len(self.names), len(FEATURE_NAMES))
+
+        labels, _, health_scores = score_matrix(model, label_encoder, self.features.astype(np.float64))
+        self.predictions = np.asarray(labels, dtype=str)
+        self.health_scores = np.asarray(health_scores, dtype=np.float32)
+
+        self._build_indexes()
+
+    @classmethod
+    def from_csv(cls, path, model, label_encoder):
+        names, categories, cuisines, rows = [], [], [], []
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                names.append(record['food_name'].strip())
+                categories.append(record.get('category', '').strip() or 'Other')
+                cuisines.append(record.get('cuisine') or '')
+                rows.append([float(record.get(name) or 0) for name in FEATURE_NAMES])
+            has_cuisine = 'cuisine' in (reader.fieldnames or ())
+        return cls(names, categories, rows, model, label_encoder, cuisines if has_cuisine else None)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build_indexes(self):
+        normalized = [normalize_name(name) for name in self.names]
+        self._by_name = {}
+        for row, name in enumerate(normalized):
+            self._by_name.setdefault(name, row)
+
+        # Every suffix that starts at a word boundary, sorted for bisect
+        suffixes = []
+        for row, name in enumerate(normalized):
+            for match in re.finditer(r'\b\w', name):
+                suffixes.append((name[match.start():], row))
+        suffixes.sort()
+        self._suffix_keys = [key for key, _ in suffixes]
+        self._suffix_rows = [row for _, row in suffixes]
+
+        postings = {}
+        for row, name in enumerate(normalized):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(row)
+        self._trigrams = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self._trigram_counts = np.array([len(trigrams(name)) for name in normalized], dtype=np.int32)
+
+    def lookup(self, name):
+        """Row index for an exact (case-insensitive) name, or None"""
+        return self._by_name.get(normalize_name(name))
+
+    def prefix_rows(self, prefix, limit, code=None):
+        prefix = normalize_name(prefix)
+        start = bisect.bisect_left(self._suffix_keys, prefix)
+        rows, seen = [], set()
+        for index in range(start, len(self._suffix_keys)):
+            if not self._suffix_keys[index].startswith(prefix):
+                break
+            row = self._suffix_rows[index]
+            if row in seen or (code is not None and self.category_codes[row] != code):
+                continue
+            seen.add(row)
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def fuzzy_rows(self, query, limit, code=None, min_overlap=0.5):
+        """
+        Rows sharing at least `min_overlap` of the query's trigrams, ranked by
+        that overlap and then by Jaccard similarity (favouring closer lengths)
+        """
+        query_grams = trigrams(normalize_name(query))
+        hits = [self._trigrams[gram] for gram in query_grams if gram in self._trigrams]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        candidates = np.flatnonzero(shared >= min_overlap * len(query_grams))
+        if code is not None:
+            candidates = candidates[self.category_codes[candidates] == code]
+        overlap = shared[candidates] / len(query_grams)
+        jaccard = shared[candidates] / (len(query_grams) + self._trigram_counts[candidates] - shared[candidates])
+        order = np.lexsort((-jaccard, -overlap))[:limit]
+        return candidates[order].tolist()
+
+    def search(self, query, limit=10, category=None):
+        """Word-prefix matches, falling back to fuzzy matches for typos"""
+        if not normalize_name(query):
+            return []
+        code = self.category_code(category)
+        if category and code is None:
+            return []
+
+        rows = self.prefix_rows(query, limit, code)
+        if not rows:
+            rows = self.fuzzy_rows(query, limit, code)
+        return rows
+
+    def category_code(self, category):
+        if not category:
+            return None
+        matches = np.flatnonzero(np.char.lower(self.category_names) == category.strip().lower())
+        return int(matches[0]) if len(matches) else None
+
+    def to_dict(self, row):
+        food = {
+            'name': self.names[row],
+            'category': str(self.category_names[self.category_codes[row]]),
+        }
+        for name, value in zip(FEATURE_NAMES, self.features[row].tolist()):
+            food[name] = round(value, 3)
+        food['prediction'] = str(self.predictions[row])
+        food['health_score'] = round(float(self.health_scores[row]), 1)
+        return food
@@ -0,0 +1,338 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+# Exported forest artifact written by ml/train_swasthya.py
+COMPILED_MODEL_NAME = 'food_health_model.npz'
+# Pruned/quantized artifact written by ml/compact_model.py
+COMPACT_MODEL_NAME = 'food_health_model.compact.npz'
+# The scikit-learn pickles the exported artifacts are made from
+SOURCE_MODEL_FILES = ('food_health_model.joblib', 'label_encoder.joblib')
+# Every file that can define the served model, hashed by model_version
+MODEL_FILES = (COMPACT_MODEL_NAME, COMPILED_MODEL_NAME) + SOURCE_MODEL_FILES
+
+
+class CompiledForest:
+    """
+    A RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    Every tree's nodes are concatenated into shared feature / threshold /
+    left / right arrays, with `roots` holding the offset of each tree.
+    Leaves point back to themselves so a batch can walk all trees in
+    lock-step for `max_depth` steps without branching per sample.
+    Exposes the subset of the sklearn API that the serving code uses.
+
+    Compact forests (see ml/compact_model.py) number their leaves last and
+    store `value` for leaves only, starting at node `leaf_offset`, as
+    integers that sum to roughly `value_scale` per leaf.
+    """
+
+    # Artifact kind recorded by save(); see load_compiled_model
+    kind = 'forest'
+    # sklearn trees compare float32 inputs against float64 thresholds
+    input_dtype = np.float32
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, classes,
+                 leaf_offset=0, value_scale=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.leaf_offset = int(leaf_offset)
+        self.value_scale = float(value_scale) if value_scale else None
+        # Children interleaved as [left, right] per node: one gather per step
+        self.children = np.stack([left, right], axis=1).astype(np.intp).ravel()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted sklearn RandomForestClassifier"""
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            missing.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)), dtype=bool))
+
+            # Normalise leaf counts into class probabilities, as DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            missing_left=np.ascontiguousarray(np.concatenate(missing)),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Return the (N, n_trees) matrix of leaf indices reached by each sample"""
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        has_missing = bool(np.isnan(flat).any())
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat.take(row_offsets + self.feature.take(nodes))
+            # NaN fails the comparison and goes right unless the node sends missing values left
+            go_right = ~(x <= self.threshold.take(nodes))
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.missing_left.take(nodes))
+            nodes = self.children.take(nodes * 2 + go_right)
+        return nodes
+
+    def predict_proba(self, X, block_size=512):
+        # Walk large batches in blocks so the (rows, trees) node matrix stays in cache
+        X = np.asarray(X, dtype=self.input_dtype)
+        if len(X) > block_size:
+            return np.concatenate([
+                self.predict_proba(X[start:start + block_size], block_size)
+                for start in range(0, len(X), block_size)
+            ])
+        return self.leaf_proba(self.apply(X))
+
+    def leaf_proba(self, leaves):
+        """Class probabilities from the (N, n_trees) leaves reached"""
+        if self.leaf_offset:
+            leaves -= self.leaf_offset
+        # Reducing over the (non-contiguous) tree axis adds trees in order,
+        # the same accumulation sklearn does, so results match bit-for-bit
+        proba = self.value[leaves].sum(axis=1, dtype=np.float64)
+        proba /= leaves.shape[1]
+        if self.value_scale:
+            proba /= self.value_scale
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def save(self, path, label_classes, source_hash=None):
+        """
+        Write the arrays plus the label names to an .npz artifact, with the
+        source_hash() of the pickles it was exported from when given
+        """
+        save_npz_aligned(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            missing_left=self.missing_left,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.int32(self.max_depth),
+            classes=self.classes_,
+            label_classes=np.asarray(label_classes, dtype=str),
+            kind=np.asarray(self.kind),
+            **({'leaf_offset': np.int32(self.leaf_offset), 'value_scale': np.float64(self.value_scale)}
+               if self.value_scale else {}),
+            **({'source_hash': np.asarray(source_hash)} if source_hash else {})
+        )
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """
+        Load an exported forest, returning (forest, label_encoder).
+        With mmap_mode='r' the arrays are read-only views onto the mapped file
+        instead of copies, so nothing is decompressed or copied at load time.
+        """
+        data = load_npz_mmap(path) if mmap_mode else load_npz(path)
+        if str(data.get('kind', 'forest')) != cls.kind:
+            raise ValueError(f"{path} holds a {data['kind']} model, not a {cls.kind}; use load_compiled_model")
+        return cls.from_arrays(data), ExportedLabelEncoder(data['label_classes'])
+
+    @classmethod
+    def from_arrays(cls, data):
+        return cls(
+            feature=data['feature'],
+            threshold=data['threshold'],
+            left=data['left'],
+            right=data['right'],
+            missing_left=data['missing_left'],
+            value=data['value'],
+            roots=data['roots'],
+            max_depth=data['max_depth'],
+            classes=data['classes'],
+            leaf_offset=data.get('leaf_offset', 0),
+            value_scale=data.get('value_scale'),
+        )
+
+
+# Zip extra-field ID used by Android's zipalign for alignment padding
+_ALIGNMENT_EXTRA_ID = 0xD935
+_NPZ_ALIGNMENT = 64
+
+
+def save_npz_aligned(path, **arrays):
+    """
+    Write an uncompressed .npz readable by np.load whose array payloads start
+    on 64-byte boundaries, so load_npz_mmap can return aligned views.
+    Timestamps are fixed, so identical arrays give an identical file.
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, array in arrays.items():
+            payload = io.BytesIO()
+            np.lib.format.write_array(payload, np.asarray(array), allow_pickle=False)
+            info = zipfile.ZipInfo(name + '.npy', date_time=(1980, 1, 1, 0, 0, 0))
+            # .npy headers are already padded to 64 bytes, so aligning the
+            # start of the member aligns the array data as well
+            data_start = archive.fp.tell() + 30 + len(info.filename.encode()) + 4
+            padding = -data_start % _NPZ_ALIGNMENT
+            info.extra = struct.pack('<HH', _ALIGNMENT_EXTRA_ID, padding) + b'\0' * padding
+            archive.writestr(info, payload.getvalue())
+
+
+def load_npz(path):
+    """Read every array of an .npz into memory"""
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def load_npz_mmap(path):
+    """
+    Memory-map the arrays of an uncompressed .npz (as written by np.savez).
+    np.load ignores mmap_mode for archives, so locate each member's .npy
+    payload inside the zip and build ndarrays directly on the mapping.
+    """
+    arrays = {}
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with zipfile.ZipFile(f) as archive:
+            members = archive.infolist()
+        for info in members:
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: '{info.filename}' is compressed and cannot be memory-mapped")
+            # Local file header is 30 fixed bytes followed by the name and extra field
+            name_length, extra_length = struct.unpack('<HH', buffer[info.header_offset + 26:info.header_offset + 30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[info.filename[:-len('.npy')]] = np.ndarray(
+                shape, dtype=dtype, buffer=buffer, offset=f.tell(), order='F' if fortran_order else 'C'
+            )
+    return arrays
+
+
+class ExportedLabelEncoder:
+    """Stand-in for sklearn's LabelEncoder when serving a compiled forest"""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y):
+        return self.classes_.take(np.asarray(y, dtype=np.intp))
+
+
+def load_compiled_model(path, mmap_mode=None):
+    """
+    Load an exported model of either backend, returning (model, label_encoder):
+    a CompiledForest, or a CompiledBoosting for artifacts saved with
+    kind='boosting' (see boosting.py)
+    """
+    data = load_npz_mmap(path) if mmap_mode else load_npz(path)
+    model_class = CompiledForest
+    if str(data.get('kind', 'forest')) == 'boosting':
+        from boosting import CompiledBoosting as model_class
+    return model_class.from_arrays(data), ExportedLabelEncoder(data['label_classes'])
+
+
+def load_serving_model(model_dir, mmap_mode='r'):
+    """
+    Load (model, label_encoder) from `model_dir`.
+    Prefers a compacted forest, then the exported NumPy model of either
+    backend (both memory-mapped by default) so scikit-learn is never
+    imported; falls back to the joblib pickles when neither is present.
+    An export that no longer matches the pickles beside it is refused
+    (see check_export_current).
+    """
+    for name in (COMPACT_MODEL_NAME, COMPILED_MODEL_NAME):
+        compiled_path = os.path.join(model_dir, name)
+        if os.path.exists(compiled_path):
+            check_export_current(model_dir, compiled_path)
+            return load_compiled_model(compiled_path, mmap_mode=mmap_mode)
+
+    import joblib
+    model = joblib.load(os.path.join(model_dir, 'food_health_model.joblib'))
+    label_encoder = joblib.load(os.path.join(model_dir, 'label_encoder.joblib'))
+    return model, label_encoder
+
+
+def _hash_files(model_dir, names):
+    digest = hashlib.sha256()
+    for name in names:
+        path = os.path.join(model_dir, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def model_version(model_dir):
+    """
+    Short content hash of the model artifacts present in `model_dir`.
+    Changes whenever any of them is replaced, e.g. a newly trained
+    food_health_model.joblib, without loading the model.
+    """
+    return _hash_files(model_dir, MODEL_FILES)
+
+
+def source_hash(model_dir):
+    """Short content hash of the joblib pickles in `model_dir`, recorded in the artifacts exported from them"""
+    return _hash_files(model_dir, SOURCE_MODEL_FILES)
+
+
+def check_export_current(model_dir, path):
+    """
+    Raise ValueError when the exported model at `path` was not made from
+    the joblib pickles in `model_dir`, e.g. a retrained
+    food_health_model.joblib deployed without re-exporting. Serving it
+    would answer with the old model under the new model_version (and
+    ETag). Without pickles there is nothing to compare against.
+    """
+    if not any(os.path.exists(os.path.join(model_dir, name)) for name in SOURCE_MODEL_FILES):
+        return
+    with np.load(path, allow_pickle=False) as data:
+        exported = str(data['source_hash']) if 'source_hash' in data.files else None
+    if exported != source_hash(model_dir):
+        reason = 'does not record which model it was exported from' if exported is None else \
+            'was exported from a different food_health_model.joblib than the one beside it'
+        raise ValueError(f"{path} {reason}; re-export it with 'python train_swasthya.py --export-only' "
+                         f"(then rerun compact_model.py if used)")
@@ -0,0 +1,59 @@
+import math
+
+from scoring import FEATURE_NAMES
+
+# Browsers revalidate after an hour (a 304 while the model is unchanged); the
+# CDN keeps answers for a day, and Vercel purges its cache on every deployment
+PREDICT_CACHE_CONTROL = 'public, max-age=3600, s-maxage=86400'
+# Redirects to the canonical URL never depend on the model
+REDIRECT_CACHE_CONTROL = 'public, max-age=86400'
+
+QUERY_OPTIONS = ('format',)
+
+
+def format_value(value, precision):
+    """Shortest decimal text of a value already rounded to `precision` places"""
+    text = f'{value:.{precision}f}'
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def canonical_query(args, precision):
+    """
+    Parse GET /api/predict query parameters into a food dict and the
+    canonical query string for it.
+
+    Nutrients are rounded to `precision` decimals (the PredictionCache
+    quantization, so the answer is what POST /api/predict would return),
+    zero values are dropped and the rest are listed in FEATURE_NAMES order,
+    so every distinct prediction has exactly one URL for caches to store.
+    """
+    unknown = sorted(set(args) - set(FEATURE_NAMES) - set(QUERY_OPTIONS))
+    if unknown:
+        raise ValueError(f"Unknown query parameter(s): {', '.join(unknown)}")
+
+    food, parts = {}, []
+    for name in FEATURE_NAMES:
+        value = float(args.get(name, 0))
+        if not math.isfinite(value):
+            raise ValueError(f"'{name}' must be a finite number")
+        # Adding 0.0 turns -0.0 into 0.0
+        value = round(value, precision) + 0.0
+        food[name] = value
+        if value:
+            parts.append(f'{name}={format_value(value, precision)}')
+    if args.get('format') == 'compact':
+        parts.append('format=compact')
+    return food, '&'.join(parts)
+
+
+def prediction_etag(model_version, compact):
+    """ETag of a GET /api/predict response: one per model version and body format"""
+    return f"{model_version}-{'compact' if compact else 'full'}"
+
+
+def cacheable(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = PREDICT_CACHE_CONTROL
+    # The compact body can also be chosen with the Accept header
+    response.vary.add('Accept')
+    return response
@@ -1,146 +1,341 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, redirect, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
 import numpy as np
 import os
+import sys
+import time
+
+# Shared serving helpers live next to this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from scoring import build_feature_matrix, score_matrix, compact_scores, confidence, rate_meal
+from prediction_cache import PredictionCache
+from model_registry import ModelReloader
+from bulk_scoring import score_ndjson, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from metrics import ServingMetrics
+from profiling import RequestProfiler
+from json_codec import json_response, loads, wants_compact
+from http_cache import REDIRECT_CACHE_CONTROL, cacheable, canonical_query, prediction_etag
+from plan_analysis import analyze_plan
+from admission import AdmissionControl, TooManyFoods
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
+# Per-route and per-stage Prometheus metrics, served at /api/metrics
+metrics = ServingMetrics()
+metrics.instrument(app)
+
+# Opt-in per-request profiles (SWASTHYA_PROFILE_* env vars); a no-op when off
+RequestProfiler.from_env().instrument(app)
+
+# Bounded in-flight requests with fast 503s beyond, client deadlines and a
+# cap on foods per request (SWASTHYA_MAX_IN_FLIGHT / _RETRY_AFTER / _MAX_FOODS)
+admission = AdmissionControl.from_env()
+admission.instrument(app)
+
 # Load ML model
 # Vercel's environment might have different pathing, so we use absolute pathing relative to this file
+# The exported NumPy forest (food_health_model.npz) is served when present so
+# scikit-learn never has to be imported; the joblib pickles are the fallback
 script_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(script_dir, 'food_health_model.joblib')
-encoder_path = os.path.join(script_dir, 'label_encoder.joblib')
 
-# Global variables for model and encoder to leverage Vercel's function warm starts
-model = None
-label_encoder = None
+# LRU of predictions keyed on rounded nutrient vectors (SWASTHYA_CACHE_* env vars)
+prediction_cache = PredictionCache.from_env()
 
-def get_model():
-    global model, label_encoder
-    if model is None:
-        model = joblib.load(model_path)
-    if label_encoder is None:
-        label_encoder = joblib.load(encoder_path)
-    return model, label_encoder
+# Named food catalog with precomputed scores, built on first use
+catalog_path = os.environ.get('SWASTHYA_CATALOG_PATH', os.path.join(script_dir, 'data', 'sample_nutrition.csv'))
+
+# Active model version (models/manifest.json if published, else the files
+# here) with its catalog and indexes, kept across Vercel's warm starts. A
+# newly activated version is loaded in the background and swapped in whole
+# (SWASTHYA_RELOAD_* env vars); each request takes one snapshot
+reloader = ModelReloader.from_env(script_dir, catalog_path, on_swap=[lambda serving: prediction_cache.clear(serving.model)])
+
+def get_serving():
+    if not reloader.loaded:
+        start = time.perf_counter()
+        serving = reloader.get()
+        metrics.model_load_seconds.set(time.perf_counter() - start)
+        return serving
+    return reloader.get()
+
+# Optionally pay the model load during the function's init phase rather than
+# on the first request
+if os.environ.get('SWASTHYA_PRELOAD_MODEL') == '1':
+    get_serving().warm_up()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
-        'message': 'Swasthya AI ML API is running on Vercel'
+        'message': 'Swasthya AI ML API is running on Vercel',
+        'model': reloader.stats(),
+        'cache': prediction_cache.stats(),
+        'admission': admission.stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def predict_response(serving, data, compact):
+    
+    # Prepare features array
+    with metrics.stage('features'):
+        features = build_feature_matrix([data])
+    
+    # Make prediction
+    with metrics.stage('inference'):
+        labels, probabilities, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
+    
+    # Compact mode: label index and score only
+    if compact:
+        with metrics.stage('serialize'):
+            response = json_response({
+                'success': True,
+                **compact_scores(serving.model, serving.label_encoder, probabilities, health_scores)
+            })
+        return response
+    
+    label = labels[0]
+    health_score = float(health_scores[0])
+    
+    # Generate recommendation
+    if label == 'Healthy':
+        recommendation = f"✓ Great choice! This food is healthy with a score of {health_score:.0f}/100."
+        emoji = "🥗"
+    elif label == 'Moderate':
+        recommendation = f"⚠ Moderate choice with a score of {health_score:.0f}/100."
+        emoji = "🍽️"
+    else:
+        recommendation = f"✗ Not recommended. Health score: {health_score:.0f}/100."
+        emoji = "🚫"
+    
+    body = {
+        'success': True,
+        'prediction': label,
+        'health_score': round(health_score, 1),
+        'confidence': confidence(probabilities[0], serving.label_encoder),
+        'recommendation': recommendation,
+        'emoji': emoji
+    }
+    # Name the nearest healthier catalog foods
+    if label == 'Unhealthy':
+        body['alternatives'] = serving.alternatives.suggest(features[0], health_score)
+        if body['alternatives']:
+            body['recommendation'] = recommendation[:-1] + f". Try {', '.join(body['alternatives'])} instead."
+    
+    with metrics.stage('serialize'):
+        response = json_response(body)
+    return response
+
 @app.route('/api/predict', methods=['POST'])
 def predict_food():
     try:
-        data = request.get_json()
-        model, label_encoder = get_model()
-        
-        # Extract features
-        calories = float(data.get('calories', 0))
-        protein = float(data.get('protein', 0))
-        carbs = float(data.get('carbs', 0))
-        fat = float(data.get('fat', 0))
-        fiber = float(data.get('fiber', 0))
-        iron = float(data.get('iron', 0))
-        vitamin_c = float(data.get('vitamin_c', 0))
-        
-        # Prepare features array
-        features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]])
-        
-        # Make prediction
-        prediction = model.predict(features)[0]
-        probabilities = model.predict_proba(features)[0]
-        
-        # Get label
-        label = label_encoder.inverse_transform([prediction])[0]
-        
-        # Calculate health score
-        health_score = float(probabilities[2]) * 100  # Healthy probability
-        
-        # Generate recommendation
-        if label == 'Healthy':
-            recommendation = f"✓ Great choice! This food is healthy with a score of {health_score:.0f}/100."
-            emoji = "🥗"
-        elif label == 'Moderate':
-            recommendation = f"⚠ Moderate choice with a score of {health_score:.0f}/100."
-            emoji = "🍽️"
-        else:
-            recommendation = f"✗ Not recommended. Health score: {health_score:.0f}/100."
-            emoji = "🚫"
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
+        return predict_response(get_serving(), data, wants_compact(request))
         
-        return jsonify({
-            'success': True,
-            'prediction': label,
-            'health_score': round(health_score, 1),
-            'confidence': {
-                'healthy': round(float(probabilities[2]) * 100, 1),
-                'moderate': round(float(probabilities[1]) * 100, 1),
-                'unhealthy': round(float(probabilities[0]) * 100, 1)
-            },
-            'recommendation': recommendation,
-            'emoji': emoji
-        })
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# Cacheable variant: /api/predict?calories=370&protein=7.9&... Non-canonical
+# queries are redirected to the canonical URL, and a matching If-None-Match
+# gets a 304 without loading the model
+@app.route('/api/predict', methods=['GET'])
+def predict_food_get():
+    try:
+        data, query = canonical_query(request.args, prediction_cache.precision)
+    except ValueError as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if request.query_string.decode() != query:
+        response = redirect(f'{request.path}?{query}', code=308)
+        response.headers['Cache-Control'] = REDIRECT_CACHE_CONTROL
+        return response
+    
+    compact = wants_compact(request)
+    etag = prediction_etag(reloader.version(), compact)
+    if request.if_none_match.contains_weak(etag):
+        return cacheable(Response(status=304), etag)
+    
+    try:
+        serving = get_serving()
+        return cacheable(predict_response(serving, data, compact), prediction_etag(serving.version, compact))
         
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({'success': False, 'error': str(e)}), 400
 
 @app.route('/api/analyze-meal', methods=['POST'])
 def analyze_meal():
     try:
-        data = request.get_json()
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
         foods = data.get('foods', [])
-        model, label_encoder = get_model()
-        
-        results = []
-        total_score = 0
-        
-        for food in foods:
-            name = food.get('name', 'Unknown')
-            calories = float(food.get('calories', 0))
-            protein = float(food.get('protein', 0))
-            carbs = float(food.get('carbs', 0))
-            fat = float(food.get('fat', 0))
-            fiber = float(food.get('fiber', 0))
-            iron = float(food.get('iron', 0))
-            vitamin_c = float(food.get('vitamin_c', 0))
-            
-            features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]])
-            prediction = model.predict(features)[0]
-            probabilities = model.predict_proba(features)[0]
-            label = label_encoder.inverse_transform([prediction])[0]
-            health_score = float(probabilities[2]) * 100
-            
-            results.append({
-                'name': name,
-                'prediction': label,
-                'health_score': round(health_score, 1)
+        admission.check_foods(len(foods))
+        metrics.meal_size.observe(len(foods))
+        serving = get_serving()
+        
+        # Score the whole meal in one batched model call
+        with metrics.stage('features'):
+            features = build_feature_matrix(foods)
+        with metrics.stage('inference'):
+            labels, probabilities, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
+        
+        meal_score = float(health_scores.mean()) if foods else 0
+        
+        # Compact mode: per-food label indexes and scores as arrays
+        if wants_compact(request):
+            with metrics.stage('serialize'):
+                response = json_response({
+                    'success': True,
+                    'meal_score': round(meal_score, 1),
+                    **compact_scores(serving.model, serving.label_encoder, probabilities, health_scores)
+                })
+            return response
+        
+        results = [
+            {'name': food.get('name', 'Unknown'), 'prediction': label, 'health_score': score}
+            for food, label, score in zip(foods, labels.tolist(), np.round(health_scores, 1).tolist())
+        ]
+        
+        meal_rating, meal_emoji = rate_meal(meal_score)
+        
+        with metrics.stage('serialize'):
+            response = json_response({
+                'success': True,
+                'meal_score': round(meal_score, 1),
+                'meal_rating': meal_rating,
+                'meal_emoji': meal_emoji,
+                'foods': results
             })
-            total_score += health_score
+        return response
         
-        meal_score = total_score / len(foods) if foods else 0
+    except TooManyFoods as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# Multi-day plan (days -> meals -> foods with grams), scored in one batch
+@app.route('/api/analyze-plan', methods=['POST'])
+def analyze_plan_route():
+    try:
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
+        serving = get_serving()
+        with metrics.stage('inference'):
+            result = analyze_plan(serving, data.get('days', []), cache=prediction_cache, admission=admission)
+        with metrics.stage('serialize'):
+            response = json_response({'success': True, **result})
+        return response
         
-        if meal_score >= 70:
-            meal_rating = "Excellent"
-            meal_emoji = "🌟"
-        elif meal_score >= 50:
-            meal_rating = "Good"
-            meal_emoji = "👍"
-        else:
-            meal_rating = "Needs Improvement"
-            meal_emoji = "⚠️"
+    except TooManyFoods as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/predict-batch', methods=['POST'])
+def predict_batch():
+    try:
+        chunk_size = max(1, min(int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE)), MAX_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'chunk_size must be an integer'}), 400
+    try:
+        serving = get_serving()
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Bulk rows bypass the prediction cache so one-off rows don't evict the hot set
+    results = score_ndjson(request.stream, serving.model, serving.label_encoder, chunk_size)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+@app.route('/api/foods', methods=['GET'])
+def search_foods():
+    try:
+        catalog = get_serving().catalog
+        query = request.args.get('q', '')
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+        rows = catalog.search(query, limit=limit, category=request.args.get('category'))
         
         return jsonify({
             'success': True,
-            'meal_score': round(meal_score, 1),
-            'meal_rating': meal_rating,
-            'meal_emoji': meal_emoji,
-            'foods': results
+            'query': query,
+            'foods': [catalog.to_dict(row) for row in rows]
+        })
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/foods/<path:name>', methods=['GET'])
+def get_food(name):
+    try:
+        catalog = get_serving().catalog
+        row = catalog.lookup(name)
+        if row is None:
+            return jsonify({'success': False, 'error': f"Food '{name}' not found"}), 404
+        return jsonify({'success': True, 'food': catalog.to_dict(row)})
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/alternatives', methods=['POST'])
+def find_alternatives():
+    try:
+        data = loads(request.get_data())
+        k = max(1, min(int(data.get('k', 5)), 50))
+        serving = get_serving()
+        catalog = serving.catalog
+        row = catalog.lookup(data['name']) if 'name' in data else None
+        if row is None and 'calories' not in data:
+            return jsonify({'success': False, 'error': f"Food '{data.get('name')}' not found; send its nutrients instead"}), 404
+        if row is not None:
+            features, health_score = catalog.features[row], float(catalog.health_scores[row])
+        else:
+            features = build_feature_matrix([data])
+            _, _, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
+            features, health_score = features[0], float(health_scores[0])
+        
+        rows, distances = serving.alternatives.query(features, health_score, k=k, category=data.get('category'))
+        return json_response({
+            'success': True,
+            'health_score': round(health_score, 1),
+            'alternatives': [
+                {**catalog.to_dict(row), 'distance': round(float(distance), 3)}
+                for row, distance in zip(rows.tolist(), distances)
+            ]
         })
         
     except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/generate-plan', methods=['POST'])
+def generate_plan():
+    try:
+        data = loads(request.get_data())
+        plan = get_serving().planner.plan(
+            calories=float(data.get('calories', 2000)),
+            protein=data.get('protein'),
+            carbs=data.get('carbs'),
+            fat=data.get('fat'),
+            diet_type=data.get('diet_type'),
+            cuisine=data.get('cuisine'),
+            tolerance=float(data.get('tolerance', 0.1))
+        )
+        return json_response({'success': True, **plan})
+        
+    except Exception as e:
+        metrics.record_error(e)
         return jsonify({'success': False, 'error': str(e)}), 400
 
 # Vercel needs the 'app' object
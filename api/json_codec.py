@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+from flask import Response
+
+# orjson is several times faster than the stdlib codec and serializes NumPy
+# arrays natively; everything falls back to the json module without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Media type a client can send in Accept to ask for compact responses
+COMPACT_MEDIA_TYPE = 'application/vnd.swasthya.compact+json'
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(obj):
+    """Serialize to compact UTF-8 JSON bytes (NumPy arrays allowed)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from bytes or str; raises ValueError on malformed input"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_response(obj, status=200):
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+def wants_compact(request):
+    """True for ?format=compact or an Accept header naming the compact media type"""
+    return request.args.get('format') == 'compact' or COMPACT_MEDIA_TYPE in request.headers.get('Accept', '')
@@ -0,0 +1,231 @@
+import time
+
+import numpy as np
+
+from food_catalog import normalize_name
+from scoring import FEATURE_NAMES, rate_meal
+
+# Diet types from most to least restrictive; a food is allowed for a diet when
+# its own level is not above the diet's
+DIET_LEVELS = {'vegan': 0, 'vegetarian': 1, 'eggetarian': 2, 'non-vegetarian': 3}
+DIET_ALIASES = {
+    'veg': 'vegetarian', 'non-veg': 'non-vegetarian', 'nonveg': 'non-vegetarian',
+    'non vegetarian': 'non-vegetarian', 'egg': 'eggetarian', 'eggitarian': 'eggetarian',
+}
+MEAT_CATEGORIES = {'poultry', 'fish', 'meat', 'seafood'}
+ANIMAL_CATEGORIES = {'dairy'}
+
+# Each meal is a list of slots; a slot holds one food from any of its categories
+MEAL_SLOTS = {
+    'breakfast': (('Grains',), ('Dairy', 'Fruits', 'Nuts', 'Legumes', 'Soy', 'Poultry')),
+    'lunch': (('Grains',), ('Legumes', 'Poultry', 'Fish', 'Soy', 'Dairy'), ('Vegetables',)),
+    'snack': (('Fruits', 'Nuts', 'Dairy'),),
+    'dinner': (('Grains', 'Legumes'), ('Poultry', 'Fish', 'Soy', 'Legumes', 'Dairy'), ('Vegetables',)),
+}
+# Share of the day's calories each meal is expected to contribute (guides the search)
+MEAL_SHARES = {'breakfast': 0.25, 'lunch': 0.35, 'snack': 0.1, 'dinner': 0.3}
+PORTIONS_G = (50, 100, 150, 200, 250, 300)
+
+# Nutrients the plan can target, as columns of the catalog feature matrix
+TARGET_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+_TARGET_COLUMNS = [FEATURE_NAMES.index(name) for name in TARGET_NUTRIENTS]
+
+
+def diet_level(name, category):
+    """Least restrictive diet a food needs (see DIET_LEVELS), from its category and name"""
+    category = category.lower()
+    if category in MEAT_CATEGORIES:
+        words = normalize_name(name).split()
+        return DIET_LEVELS['eggetarian'] if 'egg' in words or 'eggs' in words else DIET_LEVELS['non-vegetarian']
+    if category in ANIMAL_CATEGORIES:
+        return DIET_LEVELS['vegetarian']
+    return DIET_LEVELS['vegan']
+
+
+def parse_diet(diet_type):
+    diet = normalize_name(diet_type or 'non-vegetarian')
+    diet = DIET_ALIASES.get(diet, diet)
+    if diet not in DIET_LEVELS:
+        raise ValueError(f"Unknown diet_type '{diet_type}'; expected one of {', '.join(DIET_LEVELS)}")
+    return diet
+
+
+class MealPlanner:
+    """
+    Builds full-day plans from a FoodCatalog, maximizing the mean model
+    health score of the chosen foods (what /api/analyze-meal reports) while
+    keeping calories and any macro targets within a tolerance.
+
+    Food choice decides the score and portion sizes decide the nutrient
+    totals, so the search is a beam search over (food, portion) options,
+    one meal slot at a time. It uses the catalog's precomputed scores plus
+    per-category indexes sorted by score, prunes every slot to the
+    `per_category` best foods that the diet and cuisine allow, and keeps
+    the `beam_width` partial plans that best combine score and progress
+    towards the targets.
+
+    Constraints are relaxed rather than failing outright, and the plan
+    lists what was relaxed under `relaxed`. The cuisine is dropped when no
+    food is tagged with it, when it leaves a meal slot with no foods, or
+    when the catalog has no cuisine column. When no beam can be completed
+    without repeating a food, the search runs again with repeats allowed.
+    """
+
+    def __init__(self, catalog, per_category=8, beam_width=256):
+        self.catalog = catalog
+        self.per_category = per_category
+        self.beam_width = beam_width
+        self.nutrients = catalog.features[:, _TARGET_COLUMNS].astype(np.float64) / 100    # per gram
+        self.diet_levels = np.array(
+            [diet_level(name, str(catalog.category_names[code]))
+             for name, code in zip(catalog.names, catalog.category_codes)], dtype=np.int8)
+        # Category code -> rows sorted by health score, best first
+        order = np.argsort(-catalog.health_scores, kind='stable')
+        self._by_category = {
+            code: order[catalog.category_codes[order] == code] for code in range(len(catalog.category_names))
+        }
+
+    def _slot_options(self, categories, allowed):
+        """(rows, grams) for every pruned food/portion combination of one slot"""
+        rows = []
+        for category in categories:
+            code = self.catalog.category_code(category)
+            if code is None:
+                continue
+            candidates = self._by_category[code]
+            rows.extend(candidates[allowed[candidates]][:self.per_category])
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        portions = np.asarray(PORTIONS_G, dtype=np.float64)
+        return np.repeat(rows, len(portions)), np.tile(portions, len(rows))
+
+    def _cuisine_mask(self, cuisine):
+        """Rows allowed for `cuisine` (untagged rows match any), or None when no row is tagged with it"""
+        if not cuisine or self.catalog.cuisines is None:
+            return None
+        wanted = normalize_name(cuisine)
+        tagged = np.array([bool(c) and (c in wanted or wanted in c) for c in self.catalog.cuisines])
+        if not tagged.any():
+            return None
+        return tagged | np.array([not c for c in self.catalog.cuisines])
+
+    def _slots(self, allowed):
+        """[(meal, (rows, grams))] per slot and the share of the day's targets due after each"""
+        slots, progress, shared = [], [], 0.0
+        for meal, categories in MEAL_SLOTS.items():
+            for slot_categories in categories:
+                shared += MEAL_SHARES[meal] / len(categories)
+                slots.append((meal, self._slot_options(slot_categories, allowed)))
+                progress.append(shared)
+        return slots, progress
+
+    def plan(self, calories, protein=None, carbs=None, fat=None, diet_type=None, cuisine=None, tolerance=0.1):
+        started = time.perf_counter()
+        if not calories or calories <= 0:
+            raise ValueError('calories must be a positive number')
+        diet = parse_diet(diet_type)
+        targets = np.array([calories, protein or 0, carbs or 0, fat or 0], dtype=np.float64)
+        targeted = np.array([True, protein is not None, carbs is not None, fat is not None])
+        scale = np.where(targeted, np.maximum(targets, 1), 1)
+
+        relaxed = []
+        allowed = self.diet_levels <= DIET_LEVELS[diet]
+        cuisine_mask = self._cuisine_mask(cuisine)
+        slots, progress = self._slots(allowed if cuisine_mask is None else allowed & cuisine_mask)
+        if cuisine_mask is not None and any(len(rows) == 0 for _, (rows, _) in slots):
+            cuisine_mask = None
+            slots, progress = self._slots(allowed)
+        if cuisine and cuisine_mask is None:
+            relaxed.append('cuisine')
+        for meal, (rows, _) in slots:
+            if len(rows) == 0:
+                raise ValueError(f'No {diet} foods in the catalog for {meal}')
+
+        upper = targets[0] * (1 + tolerance)
+        beam = self._search(slots, progress, targets, targeted, scale, upper, no_repeat=True)
+        if beam is None:
+            beam = self._search(slots, progress, targets, targeted, scale, upper, no_repeat=False)
+            if beam is None:
+                raise ValueError('No combination of foods fits the calorie target')
+            relaxed.append('no_repeat')
+        scores, totals, choices = beam
+
+        # Best feasible plan; otherwise the one closest to the targets
+        deviation = (np.abs(totals - targets) / scale * targeted).max(axis=1)
+        feasible = deviation <= tolerance
+        if feasible.any():
+            candidates = np.flatnonzero(feasible)
+            best = candidates[np.lexsort((deviation[candidates], -scores[candidates]))[0]]
+        else:
+            best = int(np.argmin(deviation))
+
+        plan = {meal: [] for meal in MEAL_SLOTS}
+        for (meal, (rows, grams)), option in zip(slots, choices[best]):
+            row = rows[option]
+            item = {
+                'name': self.catalog.names[row],
+                'category': str(self.catalog.category_names[self.catalog.category_codes[row]]),
+                'grams': int(grams[option]),
+            }
+            for name, value in zip(TARGET_NUTRIENTS, self.nutrients[row] * grams[option]):
+                item[name] = round(float(value), 1)
+            item['prediction'] = str(self.catalog.predictions[row])
+            item['health_score'] = round(float(self.catalog.health_scores[row]), 1)
+            plan[meal].append(item)
+
+        meal_score = float(scores[best]) / len(slots)
+        meal_rating, meal_emoji = rate_meal(meal_score)
+        return {
+            'diet_type': diet,
+            'cuisine': cuisine if cuisine_mask is not None else None,
+            'relaxed': relaxed,
+            'plan': plan,
+            'totals': {name: round(float(value), 1) for name, value in zip(TARGET_NUTRIENTS, totals[best])},
+            'targets': {name: float(value) for name, value, wanted in zip(TARGET_NUTRIENTS, targets, targeted) if wanted},
+            'feasible': bool(feasible[best]),
+            'meal_score': round(meal_score, 1),
+            'meal_rating': meal_rating,
+            'meal_emoji': meal_emoji,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def _search(self, slots, progress, targets, targeted, scale, upper, no_repeat):
+        """
+        Beam search over the slots. Returns the final beam's (scores,
+        totals, choices), or None when some slot leaves no beam a valid
+        option (over the calorie ceiling, or only foods already used when
+        `no_repeat`).
+        """
+        # Beam state: summed scores, nutrient totals, chosen option per slot and foods used so far
+        scores = np.zeros(1)
+        totals = np.zeros((1, len(TARGET_NUTRIENTS)))
+        choices = np.zeros((1, 0), dtype=np.intp)
+        used = np.zeros((1, len(self.catalog)), dtype=bool)
+
+        for (_, (rows, grams)), expected in zip(slots, progress):
+            option_scores = self.catalog.health_scores[rows].astype(np.float64)
+            option_totals = self.nutrients[rows] * grams[:, None]
+
+            new_scores = scores[:, None] + option_scores[None, :]
+            new_totals = totals[:, None, :] + option_totals[None, :, :]
+            valid = new_totals[:, :, 0] <= upper
+            if no_repeat:
+                valid &= ~used[:, rows]
+            # Rank by score minus deviation from where the totals should be by now
+            deviation = np.abs(new_totals - targets * expected) / scale
+            rank = new_scores - 100 * (deviation * targeted).sum(axis=2)
+            rank[~valid] = -np.inf
+
+            flat = rank.ravel()
+            keep = min(self.beam_width, int(np.isfinite(flat).sum()))
+            if keep == 0:
+                return None
+            best = np.argpartition(-flat, keep - 1)[:keep]
+            beam, option = np.divmod(best, len(rows))
+
+            scores = new_scores[beam, option]
+            totals = new_totals[beam, option]
+            choices = np.column_stack([choices[beam], option])
+            used = used[beam]
+            used[np.arange(len(beam)), rows[option]] = True
+
+        return scores, totals, choices
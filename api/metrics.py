@@ -0,0 +1,226 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import g, got_request_exception, request
+
+# Histogram upper bounds in seconds
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _ShardOwner:
+    """Per-thread holder of a shard; its finalizer runs when the thread exits"""
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self):
+        self.shard = {}
+
+
+class _Metric:
+    """
+    Base for counters and histograms. Every thread updates its own shard
+    (a dict of label values -> counts), so recording never takes a lock;
+    the lock is only used to register a new thread's shard and to collect
+    the shards when rendering. When a thread exits, its shard is merged
+    into a retired total and dropped, so servers that start a thread per
+    request (Flask's dev server) do not accumulate shards.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        # Reentrant: a finalizer may run on a thread that already holds it
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        try:
+            return self._local.owner.shard
+        except AttributeError:
+            owner = self._local.owner = _ShardOwner()
+            with self._lock:
+                self._shards[id(owner.shard)] = owner.shard
+            weakref.finalize(owner, self._retire, owner.shard)
+            return owner.shard
+
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the retired totals"""
+        with self._lock:
+            del self._shards[id(shard)]
+            for labels, values in shard.items():
+                self._retired[labels] = self._merge(self._retired.get(labels), values)
+
+    def _collect(self):
+        """Merge the retired totals and every live thread's shard into {label values: totals}"""
+        with self._lock:
+            shards = list(self._shards.values())
+            merged = {labels: self._merge(None, values) for labels, values in self._retired.items()}
+        for shard in shards:
+            for labels, values in list(shard.items()):
+                merged[labels] = self._merge(merged.get(labels), values)
+        return merged
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for labels, values in sorted(self._collect().items()):
+            lines.extend(self._samples(labels, values))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{self._labels(labels)} {value}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # One count per bucket, then +Inf, then the running sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _merge(self, total, counts):
+        if total is None:
+            return list(counts)
+        return [a + b for a, b in zip(total, counts)]
+
+    def _samples(self, labels, counts):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{self._labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{self.name}_sum{self._labels(labels)} {counts[-1]}')
+        lines.append(f'{self.name}_count{self._labels(labels)} {cumulative}')
+        return lines
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def _collect(self):
+        return {(): self.value}
+
+    def _samples(self, labels, value):
+        return [f'{self.name} {value}']
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 'stage', 'start')
+
+    def __init__(self, histogram, stage):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, self.stage)
+
+
+class ServingMetrics:
+    """
+    Request, stage and model metrics shared by both Flask apps, rendered in
+    the Prometheus text exposition format by `render()`.
+    Values are per process; with several gunicorn workers each worker
+    reports its own series.
+    """
+
+    def __init__(self):
+        self.requests = Counter(
+            'swasthya_http_requests_total', 'HTTP requests by route, method and status code.',
+            ('route', 'method', 'status'))
+        self.request_seconds = Histogram(
+            'swasthya_http_request_duration_seconds', 'Request latency by route.',
+            ('route',), REQUEST_BUCKETS)
+        self.stage_seconds = Histogram(
+            'swasthya_stage_duration_seconds',
+            'Time spent per request stage (json_parse, features, inference, serialize).',
+            ('stage',), STAGE_BUCKETS)
+        self.meal_size = Histogram(
+            'swasthya_analyze_meal_batch_size', 'Foods per /api/analyze-meal request.',
+            (), BATCH_BUCKETS)
+        self.errors = Counter(
+            'swasthya_errors_total', 'Errors by route and exception type.',
+            ('route', 'exception'))
+        self.model_load_seconds = Gauge(
+            'swasthya_model_load_seconds', 'Time taken to load the serving model.')
+
+    def stage(self, name):
+        """Context manager timing one request stage"""
+        return _StageTimer(self.stage_seconds, name)
+
+    def record_error(self, exc):
+        self.errors.inc(_route(), type(exc).__name__)
+
+    def instrument(self, app):
+        """Count and time every request handled by `app`"""
+
+        @app.before_request
+        def start_timer():
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('metrics_start', None)
+            if start is not None:
+                route = _route()
+                self.request_seconds.observe(time.perf_counter() - start, route)
+                self.requests.inc(route, request.method, str(response.status_code))
+            return response
+
+        def record_unhandled(sender, exception, **extra):
+            self.record_error(exception)
+
+        got_request_exception.connect(record_unhandled, app, weak=False)
+
+    def render(self):
+        metrics = (self.requests, self.request_seconds, self.stage_seconds, self.meal_size,
+                   self.errors, self.model_load_seconds)
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+def _route():
+    """Route template (e.g. /api/foods/<path:name>) so labels stay low-cardinality"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces the feature rows of concurrent requests into one
+    predict_proba call.
+
+    Requests await `predict_proba(model, features)`; their rows wait in a
+    shared queue until `max_batch_size` rows are pending, every request in
+    flight (see `request_started`) is waiting, or the oldest has waited
+    `max_wait_ms`. The whole batch is then scored in a single call on a
+    worker thread (so the event loop keeps accepting requests meanwhile)
+    and every request gets its own slice of the result back. A lone request
+    therefore never waits for a batch that cannot fill.
+    A batch only holds requests for the same model, so a request that took
+    its model snapshot before a reload is scored by that model even if the
+    batch runs after it. `predict_proba` is any callable taking a model
+    and an (N, 7) matrix, e.g. a bound PredictionCache.predict_proba.
+    """
+
+    def __init__(self, predict_proba, max_batch_size=256, max_wait_ms=2.0):
+        self.predict = predict_proba
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = deque()     # (model, features, future) in arrival order
+        self._pending_rows = 0
+        self._arrived = None
+        self._ready = None
+        self.active = 0
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micro-batcher')
+        self.batches = 0
+        self.rows = 0
+
+    @classmethod
+    def from_env(cls, predict_proba):
+        """Build a batcher from SWASTHYA_BATCH_MAX_SIZE / SWASTHYA_BATCH_MAX_WAIT_MS"""
+        return cls(
+            predict_proba,
+            max_batch_size=int(os.environ.get('SWASTHYA_BATCH_MAX_SIZE', 256)),
+            max_wait_ms=float(os.environ.get('SWASTHYA_BATCH_MAX_WAIT_MS', 2.0)),
+        )
+
+    async def start(self):
+        self._arrived = asyncio.Event()
+        self._ready = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    def request_started(self):
+        """Count a request that may call predict_proba; pair with request_finished"""
+        self.active += 1
+
+    def request_finished(self):
+        self.active -= 1
+        self._check_ready()
+
+    def _check_ready(self):
+        if self._ready is not None and self._pending and \
+                (self._pending_rows >= self.max_batch_size or len(self._pending) >= self.active):
+            self._ready.set()
+
+    async def predict_proba(self, model, features):
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((model, features, future))
+        self._pending_rows += len(features)
+        self._arrived.set()
+        self._check_ready()
+        return await future
+
+    def _take_batch(self):
+        """
+        Pop whole requests for the model at the head of the queue, up to
+        max_batch_size rows (at least one request). Returns (model, batch).
+        """
+        model = self._pending[0][0] if self._pending else None
+        batch, rows = [], 0
+        while self._pending and self._pending[0][0] is model and \
+                (not batch or rows + len(self._pending[0][1]) <= self.max_batch_size):
+            _, features, future = self._pending.popleft()
+            batch.append((features, future))
+            rows += len(features)
+        self._pending_rows -= rows
+        self._ready.clear()
+        if not self._pending:
+            self._arrived.clear()
+        self._check_ready()
+        return model, batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+
+            model, batch = self._take_batch()
+            # Requests cancelled while queued (client went away) are dropped
+            batch = [(features, future) for features, future in batch if not future.done()]
+            if not batch:
+                continue
+            sizes = [len(features) for features, _ in batch]
+            try:
+                probabilities = await loop.run_in_executor(
+                    self._executor, self.predict, model, np.concatenate([features for features, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += sum(sizes)
+            for (_, future), rows in zip(batch, np.split(probabilities, np.cumsum(sizes)[:-1])):
+                if not future.done():
+                    future.set_result(rows)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_rows': round(self.rows / self.batches, 2) if self.batches else 0.0
+        }
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+from forest import MODEL_FILES, load_serving_model, model_version
+from food_catalog import FoodCatalog
+from meal_planner import MealPlanner
+from alternatives import AlternativesIndex
+
+# Published versions live in <model_dir>/models/<version>/, and
+# <model_dir>/models/manifest.json names the active one
+VERSIONS_DIR = 'models'
+MANIFEST_NAME = 'manifest.json'
+
+
+def manifest_path(model_dir):
+    return os.path.join(model_dir, VERSIONS_DIR, MANIFEST_NAME)
+
+
+def read_manifest(model_dir):
+    """The parsed manifest, or None when nothing has been published"""
+    try:
+        with open(manifest_path(model_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(model_dir, manifest):
+    # Write then rename, so readers see either the old or the new manifest
+    path = manifest_path(model_dir)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, path)
+
+
+def active_model(model_dir):
+    """
+    (version, directory) of the model to serve: the manifest's active
+    version, or the unversioned files in `model_dir` identified by their
+    content hash when there is no manifest
+    """
+    manifest = read_manifest(model_dir)
+    if manifest is None:
+        return model_version(model_dir), model_dir
+    version = manifest['active']
+    return version, os.path.join(model_dir, VERSIONS_DIR, version)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def publish_model(model_dir, source_dir=None, version=None, activate=True, keep=5):
+    """
+    Copy the model artifacts in `source_dir` (default `model_dir`) into a new
+    version directory, record it in the manifest and, with `activate`, make
+    it the served version. Keeps the newest `keep` versions plus the active
+    one. Returns the version name (timestamp plus content hash by default).
+    """
+    source_dir = source_dir or model_dir
+    files = [name for name in MODEL_FILES if os.path.exists(os.path.join(source_dir, name))]
+    if not files:
+        raise FileNotFoundError(f'No model artifacts in {source_dir}')
+    if version is None:
+        version = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{model_version(source_dir)[:8]}"
+
+    # Fill a scratch directory and rename it, so a version directory is never partial
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    target = os.path.join(versions_dir, version)
+    if os.path.exists(target):
+        raise FileExistsError(f'Version {version} already exists')
+    staging = f'{target}.{os.getpid()}.tmp'
+    os.makedirs(staging)
+    for name in files:
+        shutil.copy2(os.path.join(source_dir, name), staging)
+    os.replace(staging, target)
+
+    manifest = read_manifest(model_dir) or {'active': None, 'versions': []}
+    manifest['versions'].append({
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'files': {name: file_sha256(os.path.join(target, name)) for name in files},
+    })
+    if activate or manifest['active'] is None:
+        manifest['active'] = version
+
+    retired = manifest['versions'][:-keep] if keep else []
+    manifest['versions'] = [entry for entry in manifest['versions']
+                            if entry not in retired or entry['version'] == manifest['active']]
+    write_manifest(model_dir, manifest)
+    for entry in retired:
+        if entry['version'] != manifest['active']:
+            shutil.rmtree(os.path.join(versions_dir, entry['version']), ignore_errors=True)
+    return version
+
+
+def activate_version(model_dir, version):
+    """Point the manifest at an already published version (e.g. to roll back)"""
+    manifest = read_manifest(model_dir)
+    if manifest is None or version not in [entry['version'] for entry in manifest['versions']]:
+        raise ValueError(f"Version '{version}' has not been published")
+    manifest['active'] = version
+    write_manifest(model_dir, manifest)
+
+
+class ServingModel:
+    """
+    One model version and everything derived from it: the label encoder
+    and, built on first use, the scored food catalog with its meal planner
+    and alternatives index. Requests take one ServingModel and use only it,
+    so a reload never mixes two versions within a request.
+    """
+
+    def __init__(self, version, path, catalog_path=None, model=None, label_encoder=None):
+        self.version = version
+        self.path = path
+        self.catalog_path = catalog_path
+        if model is None:
+            model, label_encoder = load_serving_model(path)
+        self.model, self.label_encoder = model, label_encoder
+        self.loaded_at = time.time()
+        self._catalog = None
+        self._planner = None
+        self._alternatives = None
+        self._lock = threading.Lock()
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    self._catalog = FoodCatalog.from_csv(self.catalog_path, self.model, self.label_encoder)
+        return self._catalog
+
+    @property
+    def planner(self):
+        if self._planner is None:
+            self._planner = MealPlanner(self.catalog)
+        return self._planner
+
+    @property
+    def alternatives(self):
+        if self._alternatives is None:
+            self._alternatives = AlternativesIndex(self.catalog)
+        return self._alternatives
+
+    def warm_up(self):
+        """Run sample inferences and, with a catalog, build and exercise its indexes"""
+        if self.catalog_path is None:
+            self.model.predict_proba([[370, 7.9, 77.2, 2.9, 3.5, 1.47, 0]])
+            return
+        features = self.catalog.features.astype('float64')
+        self.model.predict_proba(features)
+        self.planner.plan(calories=2000)
+        self.alternatives.suggest(features[0], 0)
+
+
+class ModelReloader:
+    """
+    Serves the active model version and swaps in new ones without downtime.
+
+    At most every `interval` seconds, `get()` re-reads the manifest (see
+    publish_model). When it names a new version, that version is loaded
+    and, with `warmup`, exercised on a background thread while requests
+    keep using the current one; it then replaces the current ServingModel
+    in a single assignment and `on_swap` callbacks run (e.g. handing the
+    prediction cache to the new model). A version that fails to load is reported in
+    stats() and not retried; the previous one keeps serving.
+
+    Checks piggyback on requests, so nothing runs between them and a
+    forked worker needs no thread of its own until it reloads.
+    """
+
+    def __init__(self, model_dir, catalog_path=None, interval=5.0, warmup=True, on_swap=()):
+        self.model_dir = model_dir
+        self.catalog_path = catalog_path
+        self.interval = interval
+        self.warmup = warmup
+        self.on_swap = list(on_swap)
+        self.reloads = 0
+        self.last_error = None
+        self._serving = None
+        self._pending = None
+        self._failed = None
+        self._peeked = None
+        self._next_check = time.monotonic() + interval
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model_dir, catalog_path=None, on_swap=()):
+        """Build a reloader from SWASTHYA_RELOAD_INTERVAL (seconds, 0 disables) / _WARMUP"""
+        return cls(
+            model_dir,
+            catalog_path,
+            interval=float(os.environ.get('SWASTHYA_RELOAD_INTERVAL', 5)),
+            warmup=os.environ.get('SWASTHYA_RELOAD_WARMUP', '1') == '1',
+            on_swap=on_swap,
+        )
+
+    def get(self):
+        """The ServingModel to use for one request, loading the first one if needed"""
+        serving = self._serving
+        if serving is None:
+            with self._lock:
+                if self._serving is None:
+                    self._serving = ServingModel(*active_model(self.model_dir), self.catalog_path)
+                serving = self._serving
+        if self.interval > 0 and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.interval
+            self.check()
+        return serving
+
+    @property
+    def loaded(self):
+        return self._serving is not None
+
+    def version(self):
+        """Active version, without loading the model if nothing is loaded yet"""
+        serving = self._serving
+        if serving is not None:
+            return serving.version
+        if self._peeked is None:
+            self._peeked = active_model(self.model_dir)[0]
+        return self._peeked
+
+    def check(self, wait=False):
+        """Start loading the manifest's active version if it is new; `wait` blocks until swapped"""
+        try:
+            version, path = active_model(self.model_dir)
+        except (OSError, ValueError, KeyError) as e:
+            self.last_error = f'manifest: {e}'
+            return
+        with self._lock:
+            current = self._serving.version if self._serving is not None else None
+            if version in (current, self._pending, self._failed):
+                return
+            self._pending = version
+        thread = threading.Thread(target=self._reload, args=(version, path), daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+
+    def _reload(self, version, path):
+        try:
+            serving = ServingModel(version, path, self.catalog_path)
+            if self.warmup:
+                serving.warm_up()
+        except Exception as e:
+            with self._lock:
+                self._failed = version
+                self.last_error = f'{version}: {e}'
+                self._pending = None
+            return
+        self.swap(serving)
+        with self._lock:
+            self._pending = None
+
+    def swap(self, serving):
+        """Make `serving` current; requests that already hold the old one finish with it"""
+        replaced = self._serving is not None
+        self._serving = serving
+        if replaced:
+            self.reloads += 1
+            self.last_error = None
+            for callback in self.on_swap:
+                callback(serving)
+
+    def stats(self):
+        serving = self._serving
+        return {
+            'version': self.version(),
+            'loaded_at': datetime.fromtimestamp(serving.loaded_at, timezone.utc).isoformat(timespec='seconds')
+            if serving is not None else None,
+            'reloads': self.reloads,
+            'loading': self._pending,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,153 @@
+import numpy as np
+
+from scoring import FEATURE_NAMES, build_feature_matrix, score_matrix, rate_meal
+
+# Nutrients reported in plan totals (columns of the feature matrix)
+TOTAL_NUTRIENTS = FEATURE_NAMES
+DEFAULT_GRAMS = 100.0
+
+
+def food_features(foods, serving):
+    """
+    (N, 7) per-100 g nutrient matrix for a list of food dicts. A food that
+    sends no nutrients at all is looked up by name in the serving model's
+    catalog (only then is the catalog built).
+    """
+    features = build_feature_matrix(foods)
+    for index, food in enumerate(foods):
+        if any(name in food for name in FEATURE_NAMES):
+            continue
+        catalog = serving.catalog if serving.catalog_path is not None else None
+        row = catalog.lookup(food.get('name', '')) if catalog is not None else None
+        if row is None:
+            raise ValueError(f"Food '{food.get('name')}' not found; send its nutrients instead")
+        features[index] = catalog.features[row]
+    return features
+
+
+def flatten_plan(days):
+    """
+    Flatten days -> meals -> foods into one food list plus group sizes.
+    A day is {'name', 'meals': [{'name', 'foods': [...]}, ...]}; `meals`
+    may also be a {meal name: foods} dict.
+    Returns (foods, day_names, meal_names, meals_per_day, foods_per_meal).
+    """
+    foods, day_names, meal_names, meals_per_day, foods_per_meal = [], [], [], [], []
+    for day_index, day in enumerate(days):
+        meals = day.get('meals', [])
+        if isinstance(meals, dict):
+            meals = [{'name': name, 'foods': meal_foods} for name, meal_foods in meals.items()]
+        day_names.append(day.get('name', f'Day {day_index + 1}'))
+        meals_per_day.append(len(meals))
+        for meal_index, meal in enumerate(meals):
+            meal_foods = meal.get('foods', [])
+            meal_names.append(meal.get('name', f'Meal {meal_index + 1}'))
+            foods_per_meal.append(len(meal_foods))
+            foods.extend(meal_foods)
+    return (foods, day_names, meal_names,
+            np.asarray(meals_per_day, dtype=np.intp), np.asarray(foods_per_meal, dtype=np.intp))
+
+
+def group_sums(values, counts):
+    """Row sums over consecutive groups of `counts` rows each (zero for empty groups)"""
+    if len(counts) == 0:
+        return np.zeros((0,) + values.shape[1:])
+    # A trailing zero row keeps every start index in range when the last
+    # groups are empty; reduceat returns the row at an empty group's start
+    # instead of zero, so those are cleared afterwards
+    padded = np.concatenate([values, np.zeros((1,) + values.shape[1:])])
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sums = np.add.reduceat(padded, starts, axis=0)
+    sums[counts == 0] = 0
+    return sums
+
+
+def summarize(sums):
+    """Totals dicts and gram-weighted health scores from rows of [nutrients..., grams, score x grams]"""
+    grams = sums[:, -2]
+    scores = np.divide(sums[:, -1], grams, out=np.zeros(len(sums)), where=grams > 0)
+    totals = np.round(sums[:, :len(TOTAL_NUTRIENTS)], 1).tolist()
+    return [dict(zip(TOTAL_NUTRIENTS, row)) for row in totals], np.round(scores, 1).tolist()
+
+
+def analyze_plan(serving, days, cache=None, admission=None):
+    """
+    Score every food of a multi-day plan with `serving` (a ServingModel) in
+    one batched model call and aggregate nutrients and health scores per
+    meal, per day and for the whole plan.
+
+    Nutrients are per 100 g, as for /api/analyze-meal, and each food's
+    `grams` (default 100) scales its contribution to the totals. Health
+    scores are averaged weighted by grams, so a garnish counts less than a
+    main dish. All aggregation is done with reduceat over the flattened
+    foods, which are contiguous per meal and meals contiguous per day.
+    With an AdmissionControl, the plan's total foods count against its cap.
+    """
+    foods, day_names, meal_names, meals_per_day, foods_per_meal = flatten_plan(days)
+    if admission is not None:
+        admission.check_foods(len(foods))
+    features = food_features(foods, serving)
+    grams = np.array([float(food.get('grams', DEFAULT_GRAMS)) for food in foods], dtype=np.float64)
+    if (grams < 0).any():
+        raise ValueError('grams must not be negative')
+
+    labels, _, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=cache)
+
+    # One row per food: portion nutrients, grams and gram-weighted score
+    per_food = np.column_stack([features * (grams / 100)[:, None], grams, health_scores * grams])
+    meal_sums = group_sums(per_food, foods_per_meal)
+    day_sums = group_sums(meal_sums, meals_per_day)
+    plan_sums = day_sums.sum(axis=0, keepdims=True)
+
+    meal_totals, meal_scores = summarize(meal_sums)
+    day_totals, day_scores = summarize(day_sums)
+    (plan_totals,), (plan_score,) = summarize(plan_sums)
+    daily_average = np.round(plan_sums[0, :len(TOTAL_NUTRIENTS)] / max(len(day_names), 1), 1).tolist()
+
+    food_scores = np.round(health_scores, 1).tolist()
+    food_grams = grams.tolist()
+    food_labels = labels.tolist()
+    food_offsets = np.concatenate([[0], np.cumsum(foods_per_meal)]).tolist()
+    meal_offsets = np.concatenate([[0], np.cumsum(meals_per_day)]).tolist()
+
+    result_days = []
+    for day_index, name in enumerate(day_names):
+        meals = []
+        for meal_index in range(meal_offsets[day_index], meal_offsets[day_index + 1]):
+            rating, emoji = rate_meal(meal_scores[meal_index])
+            meals.append({
+                'name': meal_names[meal_index],
+                'totals': meal_totals[meal_index],
+                'health_score': meal_scores[meal_index],
+                'rating': rating,
+                'emoji': emoji,
+                'foods': [
+                    {'name': foods[i].get('name', 'Unknown'), 'grams': food_grams[i],
+                     'prediction': food_labels[i], 'health_score': food_scores[i]}
+                    for i in range(food_offsets[meal_index], food_offsets[meal_index + 1])
+                ]
+            })
+        rating, emoji = rate_meal(day_scores[day_index])
+        result_days.append({
+            'name': name,
+            'totals': day_totals[day_index],
+            'health_score': day_scores[day_index],
+            'rating': rating,
+            'emoji': emoji,
+            'meals': meals
+        })
+
+    rating, emoji = rate_meal(plan_score)
+    return {
+        'days': result_days,
+        'summary': {
+            'days': len(day_names),
+            'meals': len(meal_names),
+            'foods': len(foods),
+            'totals': plan_totals,
+            'daily_average': dict(zip(TOTAL_NUTRIENTS, daily_average)),
+            'health_score': plan_score,
+            'rating': rating,
+            'emoji': emoji
+        }
+    }
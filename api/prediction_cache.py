@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predict_proba rows, keyed on the feature vector
+    rounded to `precision` decimals.
+
+    Rows are quantized before they reach the model as well, so a cached
+    answer is exactly what a fresh prediction would have returned.
+    `ttl` (seconds) is optional; expired entries count as misses and are
+    replaced by the fresh prediction.
+    A maxsize of 0 disables caching.
+
+    The entries belong to one model: the first one seen, or the one passed
+    to clear() when a new version is swapped in. Requests still scoring
+    with another model (e.g. the version just replaced) are answered by
+    that model directly and never read or fill the cache, so old-model
+    rows cannot outlive a swap under the same keys.
+    """
+
+    def __init__(self, maxsize=4096, precision=2, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.precision = precision
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by clear(), so rows computed before a clear are not stored after it
+        self._generation = 0
+        self._model = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from SWASTHYA_CACHE_SIZE / _PRECISION / _TTL"""
+        ttl = os.environ.get('SWASTHYA_CACHE_TTL')
+        return cls(
+            maxsize=int(os.environ.get('SWASTHYA_CACHE_SIZE', 4096)),
+            precision=int(os.environ.get('SWASTHYA_CACHE_PRECISION', 2)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    def quantize(self, features):
+        # Adding 0.0 turns -0.0 into 0.0 so both produce the same key
+        return np.round(np.asarray(features, dtype=np.float64), self.precision) + 0.0
+
+    def predict_proba(self, model, features):
+        """
+        Return model.predict_proba for every row, sending only cache misses
+        to the model in a single batched call.
+        """
+        features = self.quantize(features)
+        if self.maxsize <= 0:
+            return model.predict_proba(features)
+
+        with self._lock:
+            if self._model is None:
+                self._model = model
+            current = model is self._model
+        if not current:
+            return model.predict_proba(features)
+
+        keys = [row.tobytes() for row in features]
+        probabilities = np.empty((len(features), len(model.classes_)))
+        missing = {}
+        now = self._clock()
+
+        with self._lock:
+            generation = self._generation
+            for index, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and (entry[0] is None or entry[0] > now):
+                    self._entries.move_to_end(key)
+                    probabilities[index] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(index)
+                    self.misses += 1
+
+        if not missing:
+            return probabilities
+
+        # One model call for the unique missing rows
+        first_rows = [indexes[0] for indexes in missing.values()]
+        computed = model.predict_proba(features[first_rows])
+        expires = now + self.ttl if self.ttl else None
+
+        with self._lock:
+            for (key, indexes), row in zip(missing.items(), computed):
+                probabilities[indexes] = row
+                if generation != self._generation:
+                    continue
+                self._entries[key] = (expires, row.copy())
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return probabilities
+
+    def clear(self, model=None):
+        """Drop every entry; with `model`, only that model's predictions are cached from now on"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._model = model
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'precision': self.precision,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
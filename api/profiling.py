@@ -0,0 +1,224 @@
+import cProfile
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PROFILE_HEADER = 'X-Swasthya-Profile'
+MODES = ('sample', 'cprofile')
+
+
+class _StackSampler:
+    """
+    Wall-clock sampler: one background thread records, every `interval`
+    seconds, the stack of each request thread being profiled as a
+    collapsed "outer;...;inner" string, keeping only the frames called
+    from that request's `root` frame. The profiled threads run untouched.
+
+    Python only lets another thread run every sys.getswitchinterval()
+    (5 ms by default), so while any request is sampled the switch interval
+    is lowered to `interval`.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._switch_interval = None
+
+    def begin(self, root):
+        """Start sampling the calling thread; returns the Counter that collects its stacks"""
+        samples = Counter()
+        with self._lock:
+            if not self._active:
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._switch_interval, self.interval))
+            self._active[threading.get_ident()] = (root, samples)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return samples
+
+    def end(self):
+        """Stop sampling the calling thread; its Counter is final once this returns"""
+        with self._lock:
+            del self._active[threading.get_ident()]
+            if not self._active:
+                sys.setswitchinterval(self._switch_interval)
+                self._wake.clear()
+
+    def _run(self):
+        own_frames = (self.begin.__code__, self.end.__code__)
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                frames = sys._current_frames()
+                for thread_id, (root, samples) in self._active.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    outermost = None
+                    while frame is not None and frame is not root:
+                        outermost = frame.f_code
+                        stack.append(f'{outermost.co_filename}:{outermost.co_firstlineno}({outermost.co_name})')
+                        frame = frame.f_back
+                    if frame is not None and stack and outermost not in own_frames:
+                        samples[';'.join(reversed(stack))] += 1
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling for a Flask app, wrapped around the whole
+    WSGI call so Flask's own dispatch and request parsing are included.
+
+    A request is profiled when it is picked by the sampling `rate`, or when
+    header triggering is on and it sends `X-Swasthya-Profile: sample` or
+    `cprofile`. "sample" uses the low-overhead wall-clock stack sampler,
+    "cprofile" the deterministic profiler. Each profile is written to
+    `directory` as <id>.json (route, method, payload bytes, status, wall
+    time, and the samples) plus <id>.prof for cProfile, keeping the newest
+    `keep` profiles. ml/profile_report.py aggregates them.
+
+    With a zero rate and header triggering off, instrument() leaves the app
+    untouched, so disabled profiling costs nothing.
+    """
+
+    def __init__(self, directory, rate=0.0, header=False, mode='sample', interval=0.001, keep=200):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'; expected one of {', '.join(MODES)}")
+        self.directory = directory
+        self.rate = rate
+        self.header = header
+        self.mode = mode
+        self.interval = interval
+        self.keep = keep
+        self._ids = itertools.count()
+        self._sampler = _StackSampler(interval)
+        # Only one cProfile can be active per process on newer Pythons
+        self._cprofile_lock = threading.Lock()
+        self._rotate_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from SWASTHYA_PROFILE_RATE / _HEADER / _MODE / _INTERVAL_MS / _DIR / _KEEP"""
+        return cls(
+            directory=os.environ.get('SWASTHYA_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'swasthya-profiles')),
+            rate=float(os.environ.get('SWASTHYA_PROFILE_RATE', 0)),
+            header=os.environ.get('SWASTHYA_PROFILE_HEADER') == '1',
+            mode=os.environ.get('SWASTHYA_PROFILE_MODE', 'sample'),
+            interval=float(os.environ.get('SWASTHYA_PROFILE_INTERVAL_MS', 1)) / 1000,
+            keep=int(os.environ.get('SWASTHYA_PROFILE_KEEP', 200)),
+        )
+
+    @property
+    def enabled(self):
+        return self.rate > 0 or self.header
+
+    def instrument(self, app):
+        """Wrap `app.wsgi_app` when profiling is enabled; otherwise do nothing"""
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Record the matched route template for the profile's tags
+        @app.before_request
+        def tag_route():
+            from flask import request
+            request.environ['swasthya.route'] = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+        app.wsgi_app = self._wrap(app.wsgi_app)
+
+    def _choose_mode(self, environ):
+        if self.header:
+            requested = environ.get('HTTP_' + PROFILE_HEADER.upper().replace('-', '_'), '').lower()
+            if requested in MODES:
+                return requested
+            if requested in ('1', 'true'):
+                return self.mode
+        if self.rate > 0 and random.random() < self.rate:
+            return self.mode
+        return None
+
+    def _wrap(self, wsgi_app):
+        def profiled_app(environ, start_response):
+            mode = self._choose_mode(environ)
+            if mode is None:
+                return wsgi_app(environ, start_response)
+
+            profile_id = f'{int(time.time() * 1000)}-{os.getpid()}-{next(self._ids)}'
+            status = []
+
+            def tagged_start_response(response_status, headers, exc_info=None):
+                status.append(int(response_status.split()[0]))
+                headers.append(('X-Swasthya-Profile-Id', profile_id))
+                return start_response(response_status, headers, exc_info)
+
+            profiler = samples = None
+            if mode == 'cprofile' and self._cprofile_lock.acquire(blocking=False):
+                profiler = cProfile.Profile()
+            else:
+                mode = 'sample'
+
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            else:
+                samples = self._sampler.begin(sys._getframe())
+            try:
+                return wsgi_app(environ, tagged_start_response)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    self._cprofile_lock.release()
+                else:
+                    self._sampler.end()
+                wall = time.perf_counter() - start
+                self._write(profile_id, environ, mode, wall, status[0] if status else None, profiler, samples)
+
+        return profiled_app
+
+    def _write(self, profile_id, environ, mode, wall, status, profiler, samples):
+        meta = {
+            'id': profile_id,
+            'route': environ.get('swasthya.route', environ.get('PATH_INFO', '')),
+            'method': environ.get('REQUEST_METHOD'),
+            'payload_bytes': int(environ.get('CONTENT_LENGTH') or 0),
+            'status': status,
+            'wall_ms': round(wall * 1000, 3),
+            'mode': mode,
+        }
+        path = os.path.join(self.directory, profile_id)
+        if profiler is not None:
+            profiler.dump_stats(path + '.prof')
+        else:
+            meta['interval_ms'] = self.interval * 1000
+            meta['samples'] = dict(samples)
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f)
+        self._rotate()
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond `keep`"""
+        with self._rotate_lock:
+            ids = sorted((name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')),
+                         key=_profile_order)
+            for stale in ids[:max(0, len(ids) - self.keep)]:
+                for extension in ('.json', '.prof'):
+                    try:
+                        os.remove(os.path.join(self.directory, stale + extension))
+                    except FileNotFoundError:
+                        pass
+
+
+def _profile_order(profile_id):
+    """Sort key for <milliseconds>-<pid>-<sequence> ids"""
+    return tuple(int(part) for part in re.findall(r'\d+', profile_id))
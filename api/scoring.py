@@ -0,0 +1,81 @@
+import numpy as np
+
+# Column order the model was trained on (see ml/train_swasthya.py)
+FEATURE_NAMES = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'iron', 'vitamin_c')
+
+
+def build_feature_matrix(foods):
+    """
+    Parse a list of food dicts into one (N, 7) float matrix.
+    Missing nutrients default to 0, same as the single-item endpoints.
+    """
+    rows = [[float(food.get(name, 0)) for name in FEATURE_NAMES] for food in foods]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_NAMES))
+
+
+def class_columns(label_encoder):
+    """
+    Map each label name to its column in predict_proba output.
+    LabelEncoder sorts classes alphabetically, so 'Healthy' is column 0.
+    """
+    return {name: index for index, name in enumerate(label_encoder.classes_)}
+
+
+def score_matrix(model, label_encoder, features, cache=None):
+    """
+    Score every row of `features` with a single predict_proba call.
+    When a PredictionCache is given, only the cache misses reach the model.
+
+    Returns:
+        (labels, probabilities, health_scores) where labels is an array of
+        label names, probabilities is (N, n_classes) and health_scores is the
+        Healthy probability scaled to 0-100.
+    """
+    if len(features) == 0:
+        n_classes = len(label_encoder.classes_)
+        return np.array([], dtype=object), np.empty((0, n_classes)), np.empty(0)
+
+    if cache is not None:
+        probabilities = cache.predict_proba(model, features)
+    else:
+        probabilities = model.predict_proba(features)
+    return scores_from_probabilities(model, label_encoder, probabilities)
+
+
+def scores_from_probabilities(model, label_encoder, probabilities):
+    """The (labels, probabilities, health_scores) of score_matrix for precomputed predict_proba rows"""
+    predictions = np.asarray(model.classes_).take(probabilities.argmax(axis=1))
+    labels = label_encoder.inverse_transform(predictions)
+    health_scores = probabilities[:, class_columns(label_encoder)['Healthy']] * 100
+    return labels, probabilities, health_scores
+
+
+def compact_scores(model, label_encoder, probabilities, health_scores):
+    """
+    Compact response body: label indexes into `classes` and health scores,
+    as parallel arrays
+    """
+    return {
+        'classes': np.asarray(label_encoder.classes_).tolist(),
+        'labels': np.asarray(model.classes_).take(probabilities.argmax(axis=1)),
+        'health_scores': np.round(health_scores, 1)
+    }
+
+
+def confidence(probabilities, label_encoder):
+    """Per-class confidence percentages for a single probability row"""
+    columns = class_columns(label_encoder)
+    return {
+        'healthy': round(float(probabilities[columns['Healthy']]) * 100, 1),
+        'moderate': round(float(probabilities[columns['Moderate']]) * 100, 1),
+        'unhealthy': round(float(probabilities[columns['Unhealthy']]) * 100, 1)
+    }
+
+
+def rate_meal(meal_score):
+    """Return (rating, emoji) for an aggregate meal score"""
+    if meal_score >= 70:
+        return "Excellent", "🌟"
+    elif meal_score >= 50:
+        return "Good", "👍"
+    return "Needs Improvement", "⚠️"
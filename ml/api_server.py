@@ -1,25 +1,136 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, redirect, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
 import numpy as np
 import os
+import sys
+import time
+
+# Serving helpers are shared with the Vercel function in api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'api'))
+from scoring import build_feature_matrix, score_matrix, compact_scores, confidence, rate_meal
+from prediction_cache import PredictionCache
+from model_registry import ModelReloader
+from bulk_scoring import score_ndjson, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from metrics import ServingMetrics
+from profiling import RequestProfiler
+from json_codec import json_response, loads, wants_compact
+from http_cache import REDIRECT_CACHE_CONTROL, cacheable, canonical_query, prediction_etag
+from plan_analysis import analyze_plan
+from admission import AdmissionControl, TooManyFoods
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Load ML model
+# Per-route and per-stage Prometheus metrics, served at /api/metrics
+metrics = ServingMetrics()
+metrics.instrument(app)
+
+# Opt-in per-request profiles (SWASTHYA_PROFILE_* env vars); a no-op when off
+RequestProfiler.from_env().instrument(app)
+
+# Bounded in-flight requests with fast 503s beyond, client deadlines and a
+# cap on foods per request (SWASTHYA_MAX_IN_FLIGHT / _RETRY_AFTER / _MAX_FOODS)
+admission = AdmissionControl.from_env()
+admission.instrument(app)
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
-model = joblib.load(os.path.join(script_dir, 'food_health_model.joblib'))
-label_encoder = joblib.load(os.path.join(script_dir, 'label_encoder.joblib'))
+
+# LRU of predictions keyed on rounded nutrient vectors (SWASTHYA_CACHE_* env vars)
+prediction_cache = PredictionCache.from_env()
+
+# Named food catalog; every row is scored once per model version, never per request
+catalog_path = os.environ.get('SWASTHYA_CATALOG_PATH', os.path.join(script_dir, 'data', 'sample_nutrition.csv'))
+
+# Active model version (models/manifest.json if published, else the files
+# here; exported NumPy forest if present, joblib otherwise) with its catalog
+# and indexes. New versions are loaded in the background and swapped in as a
+# whole (SWASTHYA_RELOAD_* env vars); handlers take one snapshot per request
+reloader = ModelReloader.from_env(script_dir, catalog_path, on_swap=[lambda serving: prediction_cache.clear(serving.model)])
+load_start = time.perf_counter()
+reloader.get().warm_up()
+metrics.model_load_seconds.set(time.perf_counter() - load_start)
+
+def prediction_body(serving, labels, probabilities, health_scores, compact=False, features=None):
+    """
+    Response body for /api/predict from the score_matrix outputs of one food;
+    pass its feature row to name healthier catalog alternatives when it scores Unhealthy
+    """
+    # Compact mode: label index and score only
+    if compact:
+        return {'success': True, **compact_scores(serving.model, serving.label_encoder, probabilities, health_scores)}
+    
+    label = labels[0]
+    health_score = float(health_scores[0])
+    
+    # Generate recommendation
+    if label == 'Healthy':
+        recommendation = f"✓ Great choice! This food is healthy with a score of {health_score:.0f}/100. Include it regularly in your diet."
+        emoji = "🥗"
+    elif label == 'Moderate':
+        recommendation = f"⚠ Moderate choice with a score of {health_score:.0f}/100. Consume in moderation as part of a balanced diet."
+        emoji = "🍽️"
+    else:
+        recommendation = f"✗ Not recommended. Health score: {health_score:.0f}/100. Consider healthier alternatives."
+        emoji = "🚫"
+    
+    body = {
+        'success': True,
+        'prediction': label,
+        'health_score': round(health_score, 1),
+        'confidence': confidence(probabilities[0], serving.label_encoder),
+        'recommendation': recommendation,
+        'emoji': emoji
+    }
+    if label == 'Unhealthy' and features is not None:
+        body['alternatives'] = serving.alternatives.suggest(features[0], health_score)
+        if body['alternatives']:
+            body['recommendation'] = recommendation[:-1] + f" such as {', '.join(body['alternatives'])}."
+    return body
+
+def meal_body(serving, foods, labels, probabilities, health_scores, compact=False):
+    """Response body for /api/analyze-meal from the score_matrix outputs of a meal"""
+    # Calculate meal score
+    meal_score = float(health_scores.mean()) if foods else 0
+    
+    # Compact mode: per-food label indexes and scores as arrays
+    if compact:
+        return {
+            'success': True,
+            'meal_score': round(meal_score, 1),
+            **compact_scores(serving.model, serving.label_encoder, probabilities, health_scores)
+        }
+    
+    results = [
+        {'name': food.get('name', 'Unknown'), 'prediction': label, 'health_score': score}
+        for food, label, score in zip(foods, labels.tolist(), np.round(health_scores, 1).tolist())
+    ]
+    meal_rating, meal_emoji = rate_meal(meal_score)
+    
+    return {
+        'success': True,
+        'meal_score': round(meal_score, 1),
+        'meal_rating': meal_rating,
+        'meal_emoji': meal_emoji,
+        'foods': results
+    }
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, with the active model version"""
+    reloader.get()
     return jsonify({
         'status': 'healthy',
-        'message': 'Swasthya AI ML API is running'
+        'message': 'Swasthya AI ML API is running',
+        'model': reloader.stats(),
+        'cache': prediction_cache.stats(),
+        'admission': admission.stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, stage and model metrics in Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/predict', methods=['POST'])
 def predict_food():
     """
@@ -37,61 +148,71 @@ def predict_food():
     }
     """
     try:
-        data = request.get_json()
-        
-        # Extract features
-        calories = float(data.get('calories', 0))
-        protein = float(data.get('protein', 0))
-        carbs = float(data.get('carbs', 0))
-        fat = float(data.get('fat', 0))
-        fiber = float(data.get('fiber', 0))
-        iron = float(data.get('iron', 0))
-        vitamin_c = float(data.get('vitamin_c', 0))
+        serving = reloader.get()
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
         
         # Prepare features array
-        features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]])
+        with metrics.stage('features'):
+            features = build_feature_matrix([data])
         
         # Make prediction
-        prediction = model.predict(features)[0]
-        probabilities = model.predict_proba(features)[0]
-        
-        # Get label
-        label = label_encoder.inverse_transform([prediction])[0]
-        
-        # Calculate health score
-        health_score = float(probabilities[2]) * 100  # Healthy probability
+        with metrics.stage('inference'):
+            labels, probabilities, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
         
-        # Generate recommendation
-        if label == 'Healthy':
-            recommendation = f"✓ Great choice! This food is healthy with a score of {health_score:.0f}/100. Include it regularly in your diet."
-            emoji = "🥗"
-        elif label == 'Moderate':
-            recommendation = f"⚠ Moderate choice with a score of {health_score:.0f}/100. Consume in moderation as part of a balanced diet."
-            emoji = "🍽️"
-        else:
-            recommendation = f"✗ Not recommended. Health score: {health_score:.0f}/100. Consider healthier alternatives."
-            emoji = "🚫"
-        
-        # Return result
-        return jsonify({
-            'success': True,
-            'prediction': label,
-            'health_score': round(health_score, 1),
-            'confidence': {
-                'healthy': round(float(probabilities[2]) * 100, 1),
-                'moderate': round(float(probabilities[1]) * 100, 1),
-                'unhealthy': round(float(probabilities[0]) * 100, 1)
-            },
-            'recommendation': recommendation,
-            'emoji': emoji
-        })
+        with metrics.stage('serialize'):
+            response = json_response(prediction_body(serving, labels, probabilities, health_scores, wants_compact(request), features))
+        return response
         
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 400
 
+@app.route('/api/predict', methods=['GET'])
+def predict_food_get():
+    """
+    Cacheable variant of /api/predict taking the nutrients as query
+    parameters, e.g. /api/predict?calories=370&protein=7.9&carbs=77.2
+
+    Values are rounded to the prediction cache precision; any other
+    spelling of the same food is redirected (308) to its canonical URL.
+    Responses carry Cache-Control and an ETag derived from the model
+    artifacts, and a matching If-None-Match gets a 304.
+    """
+    try:
+        data, query = canonical_query(request.args, prediction_cache.precision)
+    except ValueError as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if request.query_string.decode() != query:
+        response = redirect(f'{request.path}?{query}', code=308)
+        response.headers['Cache-Control'] = REDIRECT_CACHE_CONTROL
+        return response
+    
+    compact = wants_compact(request)
+    etag = prediction_etag(reloader.version(), compact)
+    if request.if_none_match.contains_weak(etag):
+        return cacheable(Response(status=304), etag)
+    
+    try:
+        serving = reloader.get()
+        etag = prediction_etag(serving.version, compact)
+        with metrics.stage('features'):
+            features = build_feature_matrix([data])
+        with metrics.stage('inference'):
+            labels, probabilities, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
+        with metrics.stage('serialize'):
+            response = json_response(prediction_body(serving, labels, probabilities, health_scores, compact, features))
+        return cacheable(response, etag)
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @app.route('/api/analyze-meal', methods=['POST'])
 def analyze_meal():
     """
@@ -106,65 +227,194 @@ def analyze_meal():
     }
     """
     try:
-        data = request.get_json()
+        serving = reloader.get()
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
         foods = data.get('foods', [])
+        admission.check_foods(len(foods))
+        metrics.meal_size.observe(len(foods))
         
-        results = []
-        total_score = 0
+        # Parse every item into one (N, 7) matrix and score it in a single call
+        with metrics.stage('features'):
+            features = build_feature_matrix(foods)
+        with metrics.stage('inference'):
+            labels, probabilities, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
         
-        for food in foods:
-            name = food.get('name', 'Unknown')
-            
-            # Extract nutritional values
-            calories = float(food.get('calories', 0))
-            protein = float(food.get('protein', 0))
-            carbs = float(food.get('carbs', 0))
-            fat = float(food.get('fat', 0))
-            fiber = float(food.get('fiber', 0))
-            iron = float(food.get('iron', 0))
-            vitamin_c = float(food.get('vitamin_c', 0))
-            
-            # Predict
-            features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]])
-            prediction = model.predict(features)[0]
-            probabilities = model.predict_proba(features)[0]
-            label = label_encoder.inverse_transform([prediction])[0]
-            health_score = float(probabilities[2]) * 100
-            
-            results.append({
-                'name': name,
-                'prediction': label,
-                'health_score': round(health_score, 1)
-            })
-            
-            total_score += health_score
+        with metrics.stage('serialize'):
+            response = json_response(meal_body(serving, foods, labels, probabilities, health_scores, wants_compact(request)))
+        return response
         
-        # Calculate meal score
-        meal_score = total_score / len(foods) if foods else 0
+    except TooManyFoods as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+@app.route('/api/analyze-plan', methods=['POST'])
+def analyze_plan_route():
+    """
+    Analyze a multi-day plan: every food is scored in one batched call and
+    nutrients and health scores are totalled per meal, per day and overall
+    
+    Expected JSON body (nutrients per 100 g, grams defaults to 100; a food
+    with only a name is looked up in the catalog):
+    {
+        "days": [
+            {"name": "Monday", "meals": [
+                {"name": "Breakfast", "foods": [{"name": "Oats", "calories": 389, ..., "grams": 60}]}
+            ]}
+        ]
+    }
+    """
+    try:
+        serving = reloader.get()
+        with metrics.stage('json_parse'):
+            data = loads(request.get_data())
+        with metrics.stage('inference'):
+            result = analyze_plan(serving, data.get('days', []), cache=prediction_cache, admission=admission)
+        with metrics.stage('serialize'):
+            response = json_response({'success': True, **result})
+        return response
         
-        if meal_score >= 70:
-            meal_rating = "Excellent"
-            meal_emoji = "🌟"
-        elif meal_score >= 50:
-            meal_rating = "Good"
-            meal_emoji = "👍"
-        else:
-            meal_rating = "Needs Improvement"
-            meal_emoji = "⚠️"
+    except TooManyFoods as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/predict-batch', methods=['POST'])
+def predict_batch():
+    """
+    Stream-score newline-delimited JSON food records
+
+    Request body: one food object per line (same fields as /api/predict,
+    plus an optional "id" or "name" that is echoed back). Rows are scored in
+    chunks of ?chunk_size= (default 1024) with one model call per chunk, and
+    results stream back as NDJSON in input order. Bad rows get an inline
+    {"success": false, "error": ...} record instead of aborting the stream.
+    """
+    try:
+        chunk_size = max(1, min(int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE)), MAX_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'chunk_size must be an integer'}), 400
+    
+    try:
+        serving = reloader.get()
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Bulk rows bypass the prediction cache so one-off rows don't evict the hot set
+    results = score_ndjson(request.stream, serving.model, serving.label_encoder, chunk_size)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+@app.route('/api/foods', methods=['GET'])
+def search_foods():
+    """
+    Autocomplete food names from the catalog
+
+    Query parameters: q (prefix or approximate name), limit (default 10,
+    max 50), category (optional filter)
+    """
+    try:
+        serving = reloader.get()
+        query = request.args.get('q', '')
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+        rows = serving.catalog.search(query, limit=limit, category=request.args.get('category'))
         
         return jsonify({
             'success': True,
-            'meal_score': round(meal_score, 1),
-            'meal_rating': meal_rating,
-            'meal_emoji': meal_emoji,
-            'foods': results
+            'query': query,
+            'foods': [serving.catalog.to_dict(row) for row in rows]
         })
         
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 400
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/foods/<path:name>', methods=['GET'])
+def get_food(name):
+    """Exact (case-insensitive) catalog lookup with the precomputed health score"""
+    try:
+        serving = reloader.get()
+        row = serving.catalog.lookup(name)
+        if row is None:
+            return jsonify({'success': False, 'error': f"Food '{name}' not found"}), 404
+        return jsonify({'success': True, 'food': serving.catalog.to_dict(row)})
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/alternatives', methods=['POST'])
+def find_alternatives():
+    """
+    Healthier catalog foods nearest in nutrient space to a given food
+
+    Expected JSON: either {"name": "Pizza"} for a catalog food or the
+    /api/predict nutrient fields, plus optional "k" (default 5, max 50) and
+    "category" to only suggest foods from that category
+    """
+    try:
+        serving = reloader.get()
+        data = loads(request.get_data())
+        k = max(1, min(int(data.get('k', 5)), 50))
+        row = serving.catalog.lookup(data['name']) if 'name' in data else None
+        if row is None and 'calories' not in data:
+            return jsonify({'success': False, 'error': f"Food '{data.get('name')}' not found; send its nutrients instead"}), 404
+        if row is not None:
+            features, health_score = serving.catalog.features[row], float(serving.catalog.health_scores[row])
+        else:
+            features = build_feature_matrix([data])
+            _, _, health_scores = score_matrix(serving.model, serving.label_encoder, features, cache=prediction_cache)
+            features, health_score = features[0], float(health_scores[0])
+        
+        rows, distances = serving.alternatives.query(features, health_score, k=k, category=data.get('category'))
+        return json_response({
+            'success': True,
+            'health_score': round(health_score, 1),
+            'alternatives': [
+                {**serving.catalog.to_dict(row), 'distance': round(float(distance), 3)}
+                for row, distance in zip(rows.tolist(), distances)
+            ]
+        })
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/generate-plan', methods=['POST'])
+def generate_plan():
+    """
+    Build a one-day meal plan from the catalog that maximizes the mean
+    health score while meeting the nutrition targets
+
+    Expected JSON: {"calories": 2000, "protein": 120, "carbs": 250, "fat": 60,
+    "diet_type": "vegetarian", "cuisine": "indian", "tolerance": 0.1}
+    Only calories is required; unset macros are not constrained.
+    """
+    try:
+        serving = reloader.get()
+        data = loads(request.get_data())
+        plan = serving.planner.plan(
+            calories=float(data.get('calories', 2000)),
+            protein=data.get('protein'),
+            carbs=data.get('carbs'),
+            fat=data.get('fat'),
+            diet_type=data.get('diet_type'),
+            cuisine=data.get('cuisine'),
+            tolerance=float(data.get('tolerance', 0.1))
+        )
+        return json_response({'success': True, **plan})
+        
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({'success': False, 'error': str(e)}), 400
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -173,7 +423,15 @@ if __name__ == '__main__':
     print("Server running on: http://localhost:5000")
     print("Endpoints:")
     print("  GET  /api/health        - Health check")
+    print("  GET  /api/metrics       - Prometheus metrics")
     print("  POST /api/predict       - Predict single food")
+    print("  GET  /api/predict?...   - Predict single food (cacheable, ETag)")
     print("  POST /api/analyze-meal  - Analyze complete meal")
+    print("  POST /api/analyze-plan  - Analyze a multi-day plan (days -> meals -> foods)")
+    print("  POST /api/predict-batch - Stream-score NDJSON food records")
+    print("  GET  /api/foods?q=      - Autocomplete food names")
+    print("  GET  /api/foods/<name>  - Look up a catalog food")
+    print("  POST /api/alternatives  - Healthier foods with similar nutrients")
+    print("  POST /api/generate-plan - Optimize a one-day meal plan")
     print("=" * 60)
     app.run(debug=True, port=5000)
@@ -0,0 +1,137 @@
+"""
+ASGI serving mode for the ML API with micro-batching across requests.
+
+Serves /api/health, /api/predict and /api/analyze-meal with the same
+request and response formats as api_server.py (including ?format=compact),
+but the feature rows of concurrent requests are queued and scored together
+by a MicroBatcher: one predict_proba call per batch instead of one per
+request. Under bursty traffic this amortizes the per-call model overhead
+across users. The remaining endpoints are served by api_server.py.
+
+Batching is configured with environment variables:
+    SWASTHYA_BATCH_MAX_SIZE     - rows per model call (default 256)
+    SWASTHYA_BATCH_MAX_WAIT_MS  - longest a row waits for a batch to fill (default 2)
+
+Run with:
+    uvicorn asgi_server:app --port 5000
+"""
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+# Model (with hot reload), cache and response bodies are shared with the Flask server
+from api_server import reloader, prediction_cache, prediction_body, meal_body
+from scoring import build_feature_matrix, score_matrix, scores_from_probabilities
+from micro_batching import MicroBatcher
+from json_codec import COMPACT_MEDIA_TYPE, dumps, loads
+
+# Each request is scored by the model of its own snapshot; requests that
+# straddle a reload go into separate batches
+batcher = MicroBatcher.from_env(prediction_cache.predict_proba)
+
+
+async def score(serving, features):
+    """score_matrix, with the model call shared with concurrent requests"""
+    if len(features) == 0:
+        return score_matrix(serving.model, serving.label_encoder, features)
+    probabilities = await batcher.predict_proba(serving.model, features)
+    return scores_from_probabilities(serving.model, serving.label_encoder, probabilities)
+
+
+async def health(body, compact):
+    return 200, {
+        'status': 'healthy',
+        'message': 'Swasthya AI ML API is running (ASGI, micro-batched)',
+        'model': reloader.stats(),
+        'cache': prediction_cache.stats(),
+        'batching': batcher.stats()
+    }
+
+
+async def predict(body, compact):
+    serving = reloader.get()
+    features = build_feature_matrix([loads(body)])
+    labels, probabilities, health_scores = await score(serving, features)
+    return 200, prediction_body(serving, labels, probabilities, health_scores, compact, features)
+
+
+async def analyze_meal(body, compact):
+    serving = reloader.get()
+    foods = loads(body).get('foods', [])
+    features = build_feature_matrix(foods)
+    labels, probabilities, health_scores = await score(serving, features)
+    return 200, meal_body(serving, foods, labels, probabilities, health_scores, compact)
+
+
+ROUTES = {
+    ('GET', '/api/health'): health,
+    ('POST', '/api/predict'): predict,
+    ('POST', '/api/analyze-meal'): analyze_meal,
+}
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await batcher.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await batcher.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    headers = dict(scope['headers'])
+    compact = b'format=compact' in scope.get('query_string', b'') or \
+        COMPACT_MEDIA_TYPE.encode() in headers.get(b'accept', b'')
+    handler = ROUTES.get((scope['method'], scope['path']))
+    body = await read_body(receive)
+
+    if scope['method'] == 'OPTIONS':
+        status, payload = 204, None
+    elif handler is None:
+        status, payload = 404, {'success': False, 'error': f"{scope['method']} {scope['path']} is not served in ASGI mode"}
+    else:
+        batcher.request_started()
+        try:
+            status, payload = await handler(body, compact)
+        except Exception as e:
+            status, payload = 400, {'success': False, 'error': str(e)}
+        finally:
+            batcher.request_finished()
+
+    content = dumps(payload) if payload is not None else b''
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(content)).encode()),
+            # Same open CORS policy as flask_cors in api_server.py
+            (b'access-control-allow-origin', b'*'),
+            (b'access-control-allow-headers', b'*'),
+            (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': content})
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,73 @@
+"""
+Query latency of the healthier-alternatives index behind /api/alternatives.
+
+Builds the catalog from data/sample_nutrition.csv plus synthetic foods up to
+--size rows (see catalog_lookup.py), then times k-nearest healthier-food
+queries for random catalog foods, over the whole catalog and within one
+category, and checks the results against a brute-force scan. Besides
+p50/p99 it reports the share of queries slower than --budget-ms, since the
+tail comes from a few outlier foods rather than from typical queries.
+
+Usage:
+    python ml/benchmarks/alternatives_lookup.py [--size 100000] [--queries 2000] [--k 5] [--budget-ms 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.join(script_dir, os.pardir)
+sys.path.insert(0, os.path.join(ml_dir, os.pardir, 'api'))
+sys.path.insert(0, script_dir)
+from forest import load_serving_model
+from food_catalog import FoodCatalog
+from alternatives import AlternativesIndex, normalize_features
+from catalog_lookup import synthetic_catalog
+
+
+def brute_force(index, catalog, row, k):
+    points = normalize_features(catalog.features, index.mean, index.std)
+    healthier = np.flatnonzero(catalog.health_scores > catalog.health_scores[row])
+    distances = ((points[healthier] - points[row]) ** 2).sum(axis=1)
+    return np.sqrt(np.sort(distances)[:k])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--category', default='Vegetables')
+    parser.add_argument('--budget-ms', type=float, default=1.0, help='latency target per query')
+    args = parser.parse_args()
+
+    model, label_encoder = load_serving_model(ml_dir)
+    catalog = FoodCatalog(*synthetic_catalog(args.size), model, label_encoder)
+    start = time.perf_counter()
+    index = AlternativesIndex(catalog)
+    print(f"Indexed {len(catalog)} foods in {time.perf_counter() - start:.2f} s")
+
+    rows = np.random.default_rng(0).integers(0, len(catalog), args.queries)
+    print(f"{'query':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {f'> {args.budget_ms:g} ms':>9}")
+    for label, category in (('all foods', None), (f'category={args.category}', args.category)):
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            index.query(catalog.features[row], catalog.health_scores[row], args.k, category=category)
+            timings.append((time.perf_counter() - start) * 1e3)
+        over = np.mean(np.asarray(timings) > args.budget_ms)
+        print(f"{label:<22} {np.percentile(timings, 50):>8.3f} {np.percentile(timings, 99):>8.3f} "
+              f"{max(timings):>8.3f} {over:>9.2%}")
+
+    mismatches = 0
+    for row in rows[:200]:
+        _, distances = index.query(catalog.features[row], catalog.health_scores[row], args.k)
+        mismatches += not np.allclose(distances, brute_force(index, catalog, row, args.k))
+    print(f"Results differing from a brute-force scan: {mismatches}/{min(200, len(rows))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for /api/analyze-meal latency against meal size N.
+
+Compares the old per-item loop (predict + predict_proba + inverse_transform
+for every food) with the batched sklearn path and the exported NumPy forest,
+and times the full request through Flask's test client.
+
+Usage:
+    python ml/benchmarks/analyze_meal.py [--sizes 1 5 20 50 100] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.join(script_dir, os.pardir)
+sys.path.insert(0, os.path.join(ml_dir, os.pardir, 'api'))
+from scoring import build_feature_matrix, score_matrix, FEATURE_NAMES
+from forest import load_compiled_model
+
+# sklearn warns on every call when fed arrays without feature names
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def sample_foods(n, seed=0):
+    """Random plausible foods drawn around the sample dataset ranges"""
+    rng = np.random.default_rng(seed)
+    upper = np.array([900, 35, 80, 100, 12, 5, 60])
+    values = rng.uniform(0, 1, size=(n, len(FEATURE_NAMES))) * upper
+    return [dict(zip(FEATURE_NAMES, row.round(1).tolist()), name=f'food-{i}') for i, row in enumerate(values)]
+
+
+def legacy_loop(model, label_encoder, foods):
+    """The pre-batching implementation: three sklearn dispatches per food"""
+    total_score = 0
+    for food in foods:
+        features = np.array([[float(food.get(name, 0)) for name in FEATURE_NAMES]])
+        prediction = model.predict(features)[0]
+        probabilities = model.predict_proba(features)[0]
+        label_encoder.inverse_transform([prediction])[0]
+        total_score += float(probabilities[2]) * 100
+    return total_score / len(foods) if foods else 0
+
+
+def batched(model, label_encoder, foods):
+    features = build_feature_matrix(foods)
+    _, _, health_scores = score_matrix(model, label_encoder, features)
+    return float(health_scores.mean()) if foods else 0
+
+
+def time_call(fn, repeat):
+    """Median wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20, 50, 100])
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(ml_dir, 'food_health_model.joblib'))
+    label_encoder = joblib.load(os.path.join(ml_dir, 'label_encoder.joblib'))
+    # Single-threaded predict avoids joblib pool start-up dominating small batches
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=1)
+    compiled, compiled_encoder = load_compiled_model(os.path.join(ml_dir, 'food_health_model.npz'))
+
+    sys.path.insert(0, ml_dir)
+    from api_server import app
+    client = app.test_client()
+
+    print(f"{'N':>5} {'legacy ms':>10} {'batched ms':>11} {'compiled ms':>12} {'speedup':>8} {'request ms':>11}")
+    for n in args.sizes:
+        foods = sample_foods(n)
+        legacy_ms = time_call(lambda: legacy_loop(model, label_encoder, foods), max(1, args.repeat // 5))
+        batched_ms = time_call(lambda: batched(model, label_encoder, foods), args.repeat)
+        compiled_ms = time_call(lambda: batched(compiled, compiled_encoder, foods), args.repeat)
+        with client.post('/api/analyze-meal', json={'foods': foods}) as response:
+            assert response.status_code == 200, response.data
+        request_ms = time_call(lambda: client.post('/api/analyze-meal', json={'foods': foods}).close(), args.repeat)
+        print(f"{n:>5} {legacy_ms:>10.2f} {batched_ms:>11.2f} {compiled_ms:>12.3f} "
+              f"{legacy_ms / compiled_ms:>7.0f}x {request_ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Lookup latency for the food catalog behind /api/foods.
+
+Builds the catalog from data/sample_nutrition.csv plus synthetic foods up to
+--size rows and times exact lookups, prefix autocomplete and fuzzy matches.
+
+Usage:
+    python ml/benchmarks/catalog_lookup.py [--size 100000] [--repeat 200]
+"""
+import argparse
+import csv
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.join(script_dir, os.pardir)
+sys.path.insert(0, os.path.join(ml_dir, os.pardir, 'api'))
+from forest import load_serving_model
+from food_catalog import FoodCatalog
+from scoring import FEATURE_NAMES
+
+
+def synthetic_catalog(size, seed=0):
+    with open(os.path.join(ml_dir, 'data', 'sample_nutrition.csv'), newline='') as f:
+        records = list(csv.DictReader(f))
+    names = [record['food_name'] for record in records]
+    categories = [record['category'] for record in records]
+    rows = [[float(record[name]) for name in FEATURE_NAMES] for record in records]
+
+    rng = random.Random(seed)
+    category_pool = sorted(set(categories))
+    while len(names) < size:
+        words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3))]
+        names.append(' '.join(words).title())
+        categories.append(rng.choice(category_pool))
+    extra = np.random.default_rng(seed).uniform(0, 1, size=(len(names) - len(rows), len(FEATURE_NAMES)))
+    features = np.vstack([np.array(rows), extra * [900, 35, 80, 100, 12, 5, 60]])
+    return names, categories, features
+
+
+def time_us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    model, label_encoder = load_serving_model(ml_dir)
+    names, categories, features = synthetic_catalog(args.size)
+    start = time.perf_counter()
+    catalog = FoodCatalog(names, categories, features, model, label_encoder)
+    print(f"Built catalog of {len(catalog)} foods in {time.perf_counter() - start:.2f} s")
+
+    cases = [
+        ('exact lookup', lambda: catalog.lookup('Brown Rice')),
+        ('prefix "br"', lambda: catalog.search('br')),
+        ('prefix "chicken b"', lambda: catalog.search('chicken b')),
+        ('prefix + category', lambda: catalog.search('s', category='Vegetables')),
+        ('fuzzy "chiken"', lambda: catalog.search('chiken')),
+        ('fuzzy "brocoli"', lambda: catalog.search('brocoli')),
+    ]
+    print(f"{'query':<20} {'us/lookup':>10}")
+    for label, fn in cases:
+        print(f"{label:<20} {time_us(fn, args.repeat):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
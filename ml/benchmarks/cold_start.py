@@ -0,0 +1,125 @@
+"""
+Cold-start timing report for the Vercel function in api/index.py.
+
+Each run starts a fresh Python interpreter and times the phases a cold
+serverless invocation pays for:
+    import_numpy   - importing NumPy
+    import_flask   - importing Flask and flask_cors
+    import_app     - importing api/index.py itself (routes, helpers)
+    model_load     - loading the model artifact
+    first_request  - first /api/predict through the WSGI app
+    warm_request   - a second request, for comparison
+
+Usage:
+    python ml/benchmarks/cold_start.py [--runs 5] [--format mmap|npz|joblib]
+        [--json out.json] [--baseline previous.json] [--tolerance 1.5]
+
+With --baseline, any phase whose median exceeds the baseline median by more
+than --tolerance times (plus 2 ms of noise) is reported and the script exits
+with status 1, so regressions show up in CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+api_dir = os.path.abspath(os.path.join(script_dir, os.pardir, os.pardir, 'api'))
+
+PHASES = ['import_numpy', 'import_flask', 'import_app', 'model_load', 'first_request', 'warm_request']
+
+# Runs inside a fresh interpreter; prints the phase timings as JSON
+CHILD = r'''
+import json, os, sys, time
+timings = {}
+start = time.perf_counter()
+def mark(phase):
+    global start
+    now = time.perf_counter()
+    timings[phase] = (now - start) * 1000
+    start = now
+
+import numpy
+mark('import_numpy')
+import flask, flask_cors
+mark('import_flask')
+sys.path.insert(0, API_DIR)
+import index
+mark('import_app')
+if FORMAT == 'joblib':
+    import joblib
+    model = joblib.load(os.path.join(API_DIR, 'food_health_model.joblib'))
+    label_encoder = joblib.load(os.path.join(API_DIR, 'label_encoder.joblib'))
+else:
+    from forest import load_compiled_model, COMPILED_MODEL_NAME
+    model, label_encoder = load_compiled_model(
+        os.path.join(API_DIR, COMPILED_MODEL_NAME), mmap_mode='r' if FORMAT == 'mmap' else None)
+from model_registry import ServingModel
+index.reloader.swap(ServingModel('cold-start', API_DIR, index.catalog_path, model, label_encoder))
+mark('model_load')
+client = index.app.test_client()
+body = {'calories': 370, 'protein': 7.9, 'carbs': 77.2, 'fat': 2.9, 'fiber': 3.5}
+assert client.post('/api/predict', json=body).status_code == 200
+mark('first_request')
+client.post('/api/predict', json=body)
+mark('warm_request')
+print(json.dumps(timings))
+'''
+
+
+def run_once(model_format):
+    code = CHILD.replace('API_DIR', repr(api_dir)).replace('FORMAT', repr(model_format))
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', PYTHONWARNINGS='ignore')
+    env.pop('SWASTHYA_PRELOAD_MODEL', None)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--format', choices=['mmap', 'npz', 'joblib'], default='mmap')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='compare against a report written by --json')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+
+    runs = [run_once(args.format) for _ in range(args.runs)]
+    report = {
+        'format': args.format,
+        'runs': args.runs,
+        'median_ms': {phase: float(np.median([run[phase] for run in runs])) for phase in PHASES},
+        'max_ms': {phase: float(np.max([run[phase] for run in runs])) for phase in PHASES},
+    }
+    report['median_ms']['total_cold'] = sum(report['median_ms'][phase] for phase in PHASES[:-1])
+
+    print(f"Cold start ({args.format}, {args.runs} runs)")
+    print(f"{'phase':<15} {'median ms':>10} {'max ms':>10}")
+    for phase in PHASES:
+        print(f"{phase:<15} {report['median_ms'][phase]:>10.1f} {report['max_ms'][phase]:>10.1f}")
+    print(f"{'total_cold':<15} {report['median_ms']['total_cold']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['median_ms']
+        regressions = [
+            (phase, baseline[phase], report['median_ms'][phase])
+            for phase in baseline
+            if report['median_ms'].get(phase, 0) > baseline[phase] * args.tolerance + 2
+        ]
+        for phase, before, after in regressions:
+            print(f"REGRESSION {phase}: {before:.1f} ms -> {after:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Parity check for the exported serving models: the NumPy backends in
+api/forest.py and api/boosting.py must return bit-for-bit the same
+predict_proba as scikit-learn.
+
+Checks, on ml/data/sample_nutrition.csv plus perturbed copies and rows with
+missing (NaN) nutrients:
+  - the committed food_health_model.joblib against the committed
+    food_health_model.npz in every --model-dir (ml/ and api/ by default)
+  - a gradient-boosted model (train_swasthya.py --backend boosting
+    defaults) fitted on the sample data with some values removed, so its
+    trees learn where missing values go, against its exported .npz
+
+Unlike the check train_swasthya.py runs after exporting, this one needs no
+retraining, so it can guard forest.py and boosting.py between retrains.
+Exits with status 1 on any difference.
+
+Usage:
+    python ml/benchmarks/export_parity.py [--model-dir ml --model-dir api] [--data CSV]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+api_dir = os.path.abspath(os.path.join(ml_dir, os.pardir, 'api'))
+sys.path.insert(0, ml_dir)
+sys.path.insert(0, api_dir)
+from forest import COMPILED_MODEL_NAME, load_compiled_model
+from train_swasthya import FEATURE_COLS, compile_model, make_model
+
+# sklearn warns on every call when fed arrays without feature names
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def check_rows(X, seed=42):
+    """The sample rows, perturbed copies, and copies with NaN in one, several or all columns"""
+    rng = np.random.default_rng(seed)
+    perturbed = X * rng.uniform(0.5, 1.5, size=X.shape)
+    rows = np.vstack([X, perturbed])
+
+    one_missing = np.repeat(rows, X.shape[1], axis=0)
+    one_missing[np.arange(len(one_missing)), np.tile(np.arange(X.shape[1]), len(rows))] = np.nan
+    some_missing = rows.copy()
+    some_missing[rng.random(some_missing.shape) < 0.3] = np.nan
+    all_missing = np.full((1, X.shape[1]), np.nan)
+    return np.vstack([rows, one_missing, some_missing, all_missing])
+
+
+def compare(label, model, exported, X):
+    """Print and return whether `exported` reproduces `model` exactly"""
+    expected = model.predict_proba(X)
+    actual = exported.predict_proba(X)
+    identical = expected.shape == actual.shape and np.array_equal(expected, actual)
+    labels_match = np.array_equal(model.predict(X), exported.predict(X))
+    max_diff = float(np.abs(expected - actual).max()) if expected.shape == actual.shape else float('inf')
+    missing = int(np.isnan(X).any(axis=1).sum())
+    status = 'ok' if identical and labels_match else 'MISMATCH'
+    print(f"{label:<34} {len(X):>6} rows ({missing} with NaN)  max diff {max_diff:.2e}  {status}")
+    return identical and labels_match
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', action='append',
+                        help='directory with food_health_model.joblib and .npz (repeatable; default ml/ and api/)')
+    parser.add_argument('--data', default=os.path.join(ml_dir, 'data', 'sample_nutrition.csv'))
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data)
+    X = check_rows(data[FEATURE_COLS].to_numpy(dtype=np.float64))
+    passed = True
+
+    for model_dir in args.model_dir or [ml_dir, api_dir]:
+        model = joblib.load(os.path.join(model_dir, 'food_health_model.joblib'))
+        exported, _ = load_compiled_model(os.path.join(model_dir, COMPILED_MODEL_NAME))
+        passed &= compare(f'{os.path.relpath(model_dir)}/{COMPILED_MODEL_NAME}', model, exported, X)
+
+    # No boosted model is committed, so fit one the way train_swasthya.py would
+    rng = np.random.default_rng(0)
+    X_train = data[FEATURE_COLS].to_numpy(dtype=np.float64)
+    X_train[rng.random(X_train.shape) < 0.1] = np.nan
+    label_encoder = LabelEncoder()
+    boosting = make_model('boosting').fit(X_train, label_encoder.fit_transform(data['healthy_label']))
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, COMPILED_MODEL_NAME)
+        compile_model(boosting).save(path, label_encoder.classes_)
+        exported, _ = load_compiled_model(path)
+        passed &= compare('boosting (fitted on sample data)', boosting, exported, X)
+
+    if not passed:
+        print('✗ Exported models differ from scikit-learn')
+        sys.exit(1)
+    print('✓ Exported models match scikit-learn bit for bit')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+Load test for the prediction API under a production WSGI server.
+
+Starts ml/api_server.py (--app ml) or the Vercel function in api/index.py
+(--app vercel) under gunicorn with the production ml/gunicorn.conf.py (the
+setup serve.py launches) or under waitress, or the micro-batching ASGI mode
+in ml/asgi_server.py (--app asgi) under uvicorn, then drives it from client
+threads at each --concurrency level for --duration seconds and reports
+throughput, p50/p95/p99 latency and error rate, overall and per request kind.
+
+Request mixes are weighted kinds:
+    single     - POST /api/predict with one food
+    meal-N     - POST /api/analyze-meal with N foods
+e.g. --mix single:70 meal-5:20 meal-20:10. Foods are drawn from
+ml/data/sample_nutrition.csv with nutrient values jittered by +/-20%, so
+the prediction cache sees a realistic mix of hits and misses.
+
+--replay FILE replays a captured request log instead: one JSON object per
+line with "path", optional "method" (POST when a body is given, GET
+otherwise) and optional "body". Lines without a "path" are treated as
+/api/predict bodies.
+
+Usage:
+    python ml/benchmarks/load_test.py [--app ml|vercel|asgi] [--server gunicorn|waitress|uvicorn]
+        [--workers 1] [--threads N] [--concurrency 1 8 32] [--duration 10]
+        [--mix single:70 meal-5:30] [--replay requests.jsonl] [--url http://host:port]
+        [--deadline-ms 500] [--json out.json] [--baseline previous.json] [--tolerance 1.5]
+
+--deadline-ms N sends every request with an X-Swasthya-Deadline N ms after
+it is sent. Requests the server sheds (503) or drops past their deadline
+(504) are counted under "shed" and in the error rate; "ok p99" is the p99 of
+the successful requests only, which is what admission control protects.
+Like well-behaved clients, client threads wait out a 503's Retry-After
+before their next request.
+
+With --baseline, a level whose throughput falls below baseline / --tolerance
+or whose p99 exceeds baseline * --tolerance (plus 2 ms of noise) is reported
+and the script exits with status 1. The client threads run on the same
+machine as the server, so compare runs from the same host.
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+api_dir = os.path.abspath(os.path.join(ml_dir, os.pardir, 'api'))
+
+FEATURE_NAMES = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'iron', 'vitamin_c')
+
+# (working directory, WSGI module:object) per --app
+APPS = {
+    'ml': (ml_dir, 'api_server:app'),
+    'vercel': (api_dir, 'index:app'),
+    'asgi': (ml_dir, 'asgi_server:app'),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, server, workers, threads, port):
+    """Launch the app under a WSGI server and wait until /api/health answers"""
+    cwd, target = APPS[app]
+    env = dict(os.environ, SWASTHYA_PRELOAD_MODEL='1', PYTHONWARNINGS='ignore')
+    if server == 'gunicorn':
+        # The production settings from gunicorn.conf.py, as serve.py runs them
+        env.update(SWASTHYA_BIND=f'127.0.0.1:{port}', SWASTHYA_WORKERS=str(workers))
+        if threads is not None:
+            env['SWASTHYA_THREADS'] = str(threads)
+        command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ml_dir, 'gunicorn.conf.py'),
+                   '--log-level', 'warning', target]
+    elif server == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning', '--no-access-log', target]
+    else:
+        command = [sys.executable, '-m', 'waitress', f'--listen=127.0.0.1:{port}', f'--threads={threads or 4}', target]
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{server} exited with status {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{server} did not become healthy within 60 s')
+
+
+def load_foods(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            {'name': record['food_name'], **{name: float(record.get(name) or 0) for name in FEATURE_NAMES}}
+            for record in csv.DictReader(f)
+        ]
+
+
+def jittered(food, rng):
+    return dict(food, **{name: round(food[name] * rng.uniform(0.8, 1.2), 1) for name in FEATURE_NAMES})
+
+
+def build_requests(kind, foods, rng, count=500):
+    """Pre-encode `count` requests of one kind as (method, path, body bytes)"""
+    requests = []
+    for _ in range(count):
+        if kind == 'single':
+            body = jittered(foods[rng.integers(len(foods))], rng)
+            requests.append(('POST', '/api/predict', json.dumps(body).encode()))
+        elif kind.startswith('meal-'):
+            meal = [jittered(foods[i], rng) for i in rng.integers(len(foods), size=int(kind[len('meal-'):]))]
+            requests.append(('POST', '/api/analyze-meal', json.dumps({'foods': meal}).encode()))
+        else:
+            raise ValueError(f'Unknown request kind: {kind}')
+    return requests
+
+
+def load_replay(path):
+    """Read a request log into [(method, path, body bytes or None)]"""
+    requests = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'path' not in entry:
+                entry = {'path': '/api/predict', 'body': entry}
+            body = entry.get('body')
+            method = entry.get('method', 'POST' if body is not None else 'GET')
+            requests.append((method, entry['path'], json.dumps(body).encode() if body is not None else None))
+    if not requests:
+        raise ValueError(f'{path} contains no requests')
+    return requests
+
+
+def parse_mix(items):
+    mix = {}
+    for item in items:
+        kind, _, weight = item.partition(':')
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def client_loop(host, port, schedule, deadline, results, deadline_ms=None):
+    """Send requests from `schedule` (kind, method, path, body) until `deadline`"""
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    index = 0
+    while time.perf_counter() < deadline:
+        kind, method, path, body = schedule[index % len(schedule)]
+        index += 1
+        if deadline_ms is not None:
+            headers['X-Swasthya-Deadline'] = f'{time.time() + deadline_ms / 1000:.3f}'
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            retry_after = float(response.getheader('Retry-After') or 0) if status == 503 else 0
+        except (OSError, http.client.HTTPException):
+            status = None
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+        results.append((kind, (time.perf_counter() - start) * 1000, status))
+        if status == 503:
+            time.sleep(min(retry_after, max(deadline - time.perf_counter(), 0)))
+    connection.close()
+
+
+def summarize(results, elapsed):
+    latencies = np.array([latency for _, latency, _ in results]) if results else np.zeros(1)
+    ok_latencies = [latency for _, latency, status in results if status is not None and status < 400] or [0.0]
+    errors = sum(1 for _, _, status in results if status is None or status >= 400)
+    shed = sum(1 for _, _, status in results if status in (503, 504))
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results) if results else 0.0,
+        'shed': shed,
+        'shed_rate': shed / len(results) if results else 0.0,
+        'throughput_rps': len(results) / elapsed,
+        'goodput_rps': (len(results) - errors) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'ok_p99_ms': float(np.percentile(ok_latencies, 99)),
+    }
+
+
+def run_level(host, port, schedules, concurrency, duration, deadline_ms=None):
+    """Run `concurrency` client threads for `duration` seconds"""
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client_loop,
+                         args=(host, port, schedules[i % len(schedules)], deadline, results, deadline_ms))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    level = summarize(results, elapsed)
+    level['concurrency'] = concurrency
+    level['by_kind'] = {
+        kind: summarize([result for result in results if result[0] == kind], elapsed)
+        for kind in sorted({result[0] for result in results})
+    }
+    return level
+
+
+def make_schedules(args, n_schedules, seed=0):
+    """
+    One shuffled request list per client thread (threads start at different
+    points so they do not send identical bodies in lock-step)
+    """
+    rng = np.random.default_rng(seed)
+    if args.replay:
+        replay = [('replay',) + request for request in load_replay(args.replay)]
+        return [replay[i * len(replay) // n_schedules:] + replay[:i * len(replay) // n_schedules]
+                for i in range(n_schedules)]
+
+    foods = load_foods(os.path.join(ml_dir, 'data', 'sample_nutrition.csv'))
+    mix = parse_mix(args.mix)
+    pools = {kind: build_requests(kind, foods, rng) for kind in mix}
+    weights = np.array(list(mix.values()))
+    schedules = []
+    for _ in range(n_schedules):
+        kinds = rng.choice(list(mix), size=2000, p=weights / weights.sum())
+        schedules.append([(kind,) + pools[kind][rng.integers(len(pools[kind]))] for kind in kinds])
+    return schedules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=sorted(APPS), default='ml')
+    parser.add_argument('--server', choices=['gunicorn', 'waitress', 'uvicorn'],
+                        help='default: uvicorn for --app asgi, gunicorn otherwise')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int,
+                        help="threads per worker (default: gunicorn.conf.py's, 4 under waitress)")
+    parser.add_argument('--url', help='load-test an already running server instead of starting one')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10, help='seconds per concurrency level')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds of unrecorded load before measuring')
+    parser.add_argument('--mix', nargs='+', default=['single:70', 'meal-5:20', 'meal-20:10'])
+    parser.add_argument('--replay', help='replay a JSON-lines request log instead of --mix')
+    parser.add_argument('--deadline-ms', type=float,
+                        help='send an X-Swasthya-Deadline this many ms after each request is sent')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--baseline', help='compare against a report written by --json')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+    args.server = args.server or ('uvicorn' if args.app == 'asgi' else 'gunicorn')
+
+    process = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        process = start_server(args.app, args.server, args.workers, args.threads, port)
+
+    try:
+        schedules = make_schedules(args, max(args.concurrency))
+        run_level(host, port, schedules, max(args.concurrency), args.warmup, args.deadline_ms)
+        levels = [run_level(host, port, schedules, concurrency, args.duration, args.deadline_ms)
+                  for concurrency in args.concurrency]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.server == 'gunicorn':
+        layout = f"{args.workers} workers x {args.threads or 'default'} threads, gunicorn.conf.py"
+    elif args.server == 'uvicorn':
+        layout = f'{args.workers} workers'
+    else:
+        layout = f'{args.threads or 4} threads'
+    report = {
+        'target': args.url or f'{args.app} under {args.server} ({layout})',
+        'workload': f'replay {args.replay}' if args.replay else ' '.join(args.mix),
+        'duration_s': args.duration,
+        'levels': levels,
+    }
+
+    print(f"{report['target']}, workload: {report['workload']}")
+    print(f"{'conc':>5} {'kind':<10} {'req/s':>9} {'ok/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'ok p99':>8} {'shed':>8} {'errors':>8}")
+    for level in levels:
+        rows = [('all', level)] + list(level['by_kind'].items())
+        for kind, stats in rows:
+            print(f"{level['concurrency']:>5} {kind:<10} {stats['throughput_rps']:>9.1f} {stats['goodput_rps']:>9.1f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['ok_p99_ms']:>8.2f} "
+                  f"{stats['shed_rate']:>7.2%} {stats['error_rate']:>7.2%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {level['concurrency']: level for level in json.load(f)['levels']}
+        regressions = []
+        for level in levels:
+            before = baseline.get(level['concurrency'])
+            if before is None:
+                continue
+            if level['throughput_rps'] < before['throughput_rps'] / args.tolerance:
+                regressions.append((level['concurrency'], 'req/s', before['throughput_rps'], level['throughput_rps']))
+            if level['p99_ms'] > before['p99_ms'] * args.tolerance + 2:
+                regressions.append((level['concurrency'], 'p99 ms', before['p99_ms'], level['p99_ms']))
+            if level['error_rate'] > before['error_rate']:
+                regressions.append((level['concurrency'], 'error rate', before['error_rate'], level['error_rate']))
+        for concurrency, metric, before, after in regressions:
+            print(f"REGRESSION concurrency {concurrency} {metric}: {before:.2f} -> {after:.2f}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
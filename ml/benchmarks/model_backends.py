@@ -0,0 +1,139 @@
+"""
+Head-to-head comparison of the model backends in train_swasthya.py
+(random forest vs histogram gradient boosting).
+
+Every backend is cross-validated on the same stratified folds and reports:
+  - training time (mean fit seconds per fold)
+  - accuracy (mean and std over folds)
+  - single-item latency (p50/p99) and batch latency of the compiled
+    serving model, i.e. what the API servers run
+  - artifact size of the exported .npz and of the joblib pickle
+
+Latency and size are measured on the model fitted to the whole dataset.
+
+Usage:
+    python ml/benchmarks/model_backends.py [--data CSV] [--folds 5] [--batch-size 1000]
+        [--params '{"boosting": {"max_iter": 50}}'] [--json report.json]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.join(script_dir, os.pardir)
+sys.path.insert(0, ml_dir)
+from train_swasthya import FEATURE_COLS, MODEL_BACKENDS, compile_model, make_model, serving_cost
+
+# sklearn warns on every call when fed arrays without feature names
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def batch_rows(X, n, seed=0):
+    """`n` rows resampled from X and perturbed, so batches are not just repeats of the training data"""
+    rng = np.random.default_rng(seed)
+    rows = X[rng.integers(0, len(X), size=n)]
+    return rows * rng.uniform(0.5, 1.5, size=rows.shape)
+
+
+def batch_latency(model, X, repeat=20):
+    """Median milliseconds to score all rows of X"""
+    model.predict_proba(X)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def compare_backend(backend, params, X, y, fold_ids, batch):
+    fit_seconds, accuracies = [], []
+    for fold in range(fold_ids.max() + 1):
+        train, test = fold_ids != fold, fold_ids == fold
+        model = make_model(backend, **params)
+        start = time.perf_counter()
+        model.fit(X[train], y[train])
+        fit_seconds.append(time.perf_counter() - start)
+        # Score with the serving form, which must agree with sklearn
+        compiled = compile_model(model)
+        predictions = compiled.predict(X[test])
+        assert np.array_equal(predictions, model.predict(X[test])), f'{backend}: compiled model disagrees'
+        accuracies.append(accuracy_score(y[test], predictions))
+
+    model = make_model(backend, **params).fit(X, y)
+    compiled = compile_model(model)
+    p50, p99, npz_bytes = serving_cost(compiled, X)
+    pickle = io.BytesIO()
+    joblib.dump(model, pickle)
+    batch_ms = batch_latency(compiled, batch)
+    return {
+        'backend': backend,
+        'params': dict(MODEL_BACKENDS[backend][1], **params),
+        'fit_seconds': float(np.mean(fit_seconds)),
+        'accuracy_mean': float(np.mean(accuracies)),
+        'accuracy_std': float(np.std(accuracies)),
+        'latency_p50_us': p50,
+        'latency_p99_us': p99,
+        'batch_ms': batch_ms,
+        'batch_us_per_row': batch_ms * 1000 / len(batch),
+        'npz_bytes': npz_bytes,
+        'joblib_bytes': len(pickle.getvalue()),
+        'trees': len(compiled.roots),
+        'nodes': len(compiled.feature),
+        'max_depth': compiled.max_depth,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join(ml_dir, 'data', 'sample_nutrition.csv'))
+    parser.add_argument('--backends', nargs='+', choices=sorted(MODEL_BACKENDS), default=sorted(MODEL_BACKENDS))
+    parser.add_argument('--params', type=json.loads, default={},
+                        help='JSON overrides per backend, e.g. \'{"forest": {"n_estimators": 50}}\'')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    X = df[FEATURE_COLS].to_numpy(dtype=np.float64)
+    y = LabelEncoder().fit_transform(df['healthy_label'])
+
+    # One fold assignment shared by every backend
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42)
+    for fold, (_, test_index) in enumerate(splitter.split(X, y)):
+        fold_ids[test_index] = fold
+    batch = batch_rows(X, args.batch_size)
+
+    print(f"{len(y)} rows, {args.folds} folds, batches of {args.batch_size}\n")
+    print(f"{'backend':>8} {'fit s':>7} {'accuracy':>15} {'p50 us':>8} {'p99 us':>8} {'batch ms':>9} "
+          f"{'us/row':>7} {'npz KB':>7} {'joblib KB':>9} {'trees':>6} {'depth':>5}")
+    results = []
+    for backend in args.backends:
+        r = compare_backend(backend, args.params.get(backend, {}), X, y, fold_ids, batch)
+        results.append(r)
+        print(f"{backend:>8} {r['fit_seconds']:>7.3f} {r['accuracy_mean']:>8.2%} ±{r['accuracy_std']:>5.1%} "
+              f"{r['latency_p50_us']:>8.0f} {r['latency_p99_us']:>8.0f} {r['batch_ms']:>9.2f} "
+              f"{r['batch_us_per_row']:>7.2f} {r['npz_bytes'] / 1024:>7.1f} {r['joblib_bytes'] / 1024:>9.1f} "
+              f"{r['trees']:>6} {r['max_depth']:>5}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': len(y), 'folds': args.folds, 'batch_size': args.batch_size, 'results': results},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
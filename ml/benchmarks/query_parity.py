@@ -0,0 +1,82 @@
+"""
+Parity check for GET /api/predict canonical URLs: the frontend's
+predictionQuery (src/services/mlService.js) must build exactly the query
+the server's canonical_query (api/http_cache.py) considers canonical, or
+every such lookup costs a 308 redirect that is itself cached for a day.
+
+Both sides are run on the cases in canonical_query_cases.json (binary
+halves such as 1.115 or 0.125, values that round to zero, negative zero,
+string input, ...), and every expected query must already be canonical.
+The JavaScript side needs `node` on the PATH. Exits with status 1 on any
+difference.
+
+Usage:
+    python ml/benchmarks/query_parity.py [--cases canonical_query_cases.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.abspath(os.path.join(script_dir, os.pardir, os.pardir))
+sys.path.insert(0, os.path.join(repo_dir, 'api'))
+from http_cache import canonical_query
+
+PRECISION = 2
+ML_SERVICE = os.path.join(repo_dir, 'src', 'services', 'mlService.js')
+NODE_SCRIPT = """
+const { predictionQuery } = await import(process.argv[1]);
+const foods = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+console.log(JSON.stringify(foods.map(predictionQuery)));
+"""
+
+
+def python_queries(foods):
+    return [canonical_query({name: str(value) for name, value in food.items()}, PRECISION)[1] for food in foods]
+
+
+def javascript_queries(foods):
+    node = shutil.which('node')
+    if node is None:
+        raise RuntimeError('node is not on the PATH')
+    result = subprocess.run(
+        [node, '--input-type=commonjs', '-e', f'(async () => {{{NODE_SCRIPT}}})()', Path(ML_SERVICE).as_uri()],
+        input=json.dumps(foods), capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', default=os.path.join(script_dir, 'canonical_query_cases.json'))
+    args = parser.parse_args()
+
+    with open(args.cases) as f:
+        cases = json.load(f)
+    foods = [case['food'] for case in cases]
+    expected = [case['query'] for case in cases]
+    sides = {'python': python_queries(foods), 'javascript': javascript_queries(foods)}
+
+    failures = 0
+    for index, food in enumerate(foods):
+        # The server redirects any query that is not its own canonical form
+        canonical = canonical_query(dict(parse_qsl(expected[index])), PRECISION)[1]
+        problems = [f'{side} gave {queries[index]!r}' for side, queries in sides.items() if queries[index] != expected[index]]
+        if canonical != expected[index]:
+            problems.append(f'expected query is not canonical ({canonical!r})')
+        if problems:
+            failures += 1
+            print(f"✗ {json.dumps(food)} -> {expected[index]!r}: {'; '.join(problems)}")
+
+    if failures:
+        print(f'✗ {failures}/{len(cases)} cases differ')
+        sys.exit(1)
+    print(f'✓ {len(cases)} cases: Python and JavaScript build the same canonical query')
+
+
+if __name__ == '__main__':
+    main()
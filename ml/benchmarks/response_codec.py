@@ -0,0 +1,86 @@
+"""
+Response size and latency per item for /api/analyze-meal, comparing the
+full response with the stdlib json codec (the previous behaviour), the full
+response with orjson, and the compact response (?format=compact).
+
+Times whole requests through Flask's test client (JSON parse, scoring and
+serialization) and encoding the response body alone, and reports bytes and
+microseconds per food.
+
+Usage:
+    python ml/benchmarks/response_codec.py [--sizes 1 50 1000] [--repeat 50]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.join(script_dir, os.pardir)
+sys.path.insert(0, ml_dir)
+sys.path.insert(0, os.path.join(ml_dir, os.pardir, 'api'))
+import json_codec
+from analyze_meal import sample_foods
+
+# (label, codec module or None for stdlib, query string)
+VARIANTS = [
+    ('full/stdlib', None, ''),
+    ('full/orjson', json_codec.orjson, ''),
+    ('compact/orjson', json_codec.orjson, '?format=compact'),
+]
+
+
+def time_request(client, path, body, repeat):
+    """Median request time in microseconds and the response body"""
+    with client.post(path, data=body, content_type='application/json') as response:
+        assert response.status_code == 200, response.data
+        payload = response.data
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        client.post(path, data=body, content_type='application/json').close()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(samples)), payload
+
+
+def time_encode(payload, repeat):
+    """Median time in microseconds to encode `payload` with the active codec"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json_codec.dumps(payload)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 50, 1000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if json_codec.orjson is None:
+        sys.exit('orjson is not installed; nothing to compare')
+
+    from api_server import app
+    client = app.test_client()
+
+    print(f"{'N':>5} {'variant':<16} {'bytes/item':>11} {'request us/item':>16} {'encode us/item':>15} {'vs before':>10}")
+    for n in args.sizes:
+        body = json.dumps({'foods': sample_foods(n)})
+        baseline = None
+        for label, codec, query in VARIANTS:
+            json_codec.orjson = codec
+            micros, payload = time_request(client, '/api/analyze-meal' + query, body, args.repeat)
+            encode_micros = time_encode(json.loads(payload), args.repeat)
+            baseline = baseline or micros
+            print(f"{n:>5} {label:<16} {len(payload) / n:>11.1f} {micros / n:>16.2f} {encode_micros / n:>15.2f} "
+                  f"{baseline / micros:>9.1f}x")
+    json_codec.orjson = VARIANTS[-1][1]
+
+
+if __name__ == '__main__':
+    main()
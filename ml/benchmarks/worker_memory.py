@@ -0,0 +1,145 @@
+"""
+Per-worker memory of ml/api_server.py under gunicorn (Linux only: reads
+/proc/<pid>/smaps_rollup).
+
+Compares three layouts:
+    joblib        - every worker unpickles its own copy of the forest
+                    (each process calling joblib.load, no preload)
+    npz           - every worker memory-maps the exported forest, no preload
+    npz-preload   - gunicorn.conf.py: model and catalog loaded once in the
+                    master before forking, forest arrays memory-mapped
+
+For each layout the workers are warmed with prediction requests and the
+report shows, per worker, RSS, PSS (shared pages split between processes)
+and USS (pages private to the worker, i.e. what each extra worker costs).
+
+Usage:
+    python ml/benchmarks/worker_memory.py [--workers 4] [--requests 400] [--json out.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+ml_dir = os.path.abspath(os.path.join(script_dir, os.pardir))
+api_dir = os.path.abspath(os.path.join(ml_dir, os.pardir, 'api'))
+sys.path.insert(0, script_dir)
+from load_test import free_port
+
+NO_PRELOAD_CONFIG = "preload_app = False\n"
+
+
+def joblib_only_tree(root):
+    """A copy of ml/ without the exported forest, so api_server.py falls back to joblib.load"""
+    tree_ml = os.path.join(root, 'ml')
+    os.makedirs(tree_ml)
+    for name in ('api_server.py', 'food_health_model.joblib', 'label_encoder.joblib'):
+        shutil.copy(os.path.join(ml_dir, name), tree_ml)
+    os.symlink(os.path.join(ml_dir, 'data'), os.path.join(tree_ml, 'data'))
+    os.symlink(api_dir, os.path.join(root, 'api'))
+    return tree_ml
+
+
+def memory(pid):
+    """RSS / PSS / USS in MB from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': fields['Rss'],
+        'pss_mb': fields['Pss'],
+        'uss_mb': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def measure(layout, workers, n_requests, root):
+    cwd = joblib_only_tree(os.path.join(root, layout)) if layout == 'joblib' else ml_dir
+    if layout == 'npz-preload':
+        config = os.path.join(ml_dir, 'gunicorn.conf.py')
+    else:
+        config = os.path.join(root, f'{layout}.conf.py')
+        with open(config, 'w') as f:
+            f.write(NO_PRELOAD_CONFIG)
+
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--threads', '1', '--log-level', 'warning', 'api_server:app']
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    process = subprocess.Popen(command, cwd=cwd, env=env)
+    try:
+        deadline = time.monotonic() + 120
+        while len(children(process.pid)) < workers or not healthy(port):
+            if time.monotonic() > deadline or process.poll() is not None:
+                raise RuntimeError(f'gunicorn did not start for layout {layout}')
+            time.sleep(0.2)
+
+        # Warm up every worker (new connection per request spreads them out)
+        body = json.dumps({'calories': 370, 'protein': 7.9, 'carbs': 77.2, 'fat': 2.9, 'fiber': 3.5})
+        for i in range(n_requests):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request('POST', '/api/predict', body=body.replace('370', str(300 + i % 200)),
+                               headers={'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            connection.close()
+
+        worker_stats = [memory(pid) for pid in children(process.pid)]
+        return {
+            'layout': layout,
+            'master': memory(process.pid),
+            'workers': worker_stats,
+            'worker_mean': {key: sum(w[key] for w in worker_stats) / len(worker_stats) for key in worker_stats[0]},
+            'total_pss_mb': memory(process.pid)['pss_mb'] + sum(w['pss_mb'] for w in worker_stats),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def healthy(port):
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        connection.request('GET', '/api/health')
+        return connection.getresponse().status == 200
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--layouts', nargs='+', default=['joblib', 'npz', 'npz-preload'])
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        results = [measure(layout, args.workers, args.requests, root) for layout in args.layouts]
+
+    print(f"{args.workers} workers; MB per worker (mean)")
+    print(f"{'layout':<13} {'RSS':>8} {'PSS':>8} {'USS':>8} {'master RSS':>11} {'total PSS':>10}")
+    for result in results:
+        mean = result['worker_mean']
+        print(f"{result['layout']:<13} {mean['rss_mb']:>8.1f} {mean['pss_mb']:>8.1f} {mean['uss_mb']:>8.1f} "
+              f"{result['master']['rss_mb']:>11.1f} {result['total_pss_mb']:>10.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
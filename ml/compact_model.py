@@ -0,0 +1,291 @@
+"""
+Post-training compaction of the exported forest.
+
+Starts from food_health_model.npz (see train_swasthya.py) and writes
+food_health_model.compact.npz, which the API servers load in preference to
+the full export:
+  - trees are picked greedily, most useful first, until the forest agrees
+    with the full model's labels on at least --min-agreement of a reference
+    set (the sample data, perturbed copies and random foods)
+  - leaf probabilities are quantized to uint8 / uint16
+  - leaves with identical quantized values are shared across all trees, and
+    splits whose two children end up as the same leaf are removed
+  - thresholds are stored as float32 (rounded down, so comparisons against
+    the float32 inputs are unchanged) and feature ids as int8
+
+Prints a report of agreement with the full model, latency and bytes on disk
+and in RAM.
+
+Usage:
+    python compact_model.py [--min-agreement 0.99] [--value-bits 8] [--json report.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, os.pardir, 'api'))
+from forest import CompiledForest, COMPILED_MODEL_NAME, COMPACT_MODEL_NAME, load_npz
+from scoring import FEATURE_NAMES, class_columns
+
+# sklearn warns on every call when fed arrays without feature names
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+
+def reference_rows(data_path, n_random=2000, seed=42):
+    """
+    Sample foods, perturbed copies that land on both sides of the split
+    thresholds, and random foods spanning the observed nutrient ranges
+    """
+    data = np.genfromtxt(data_path, delimiter=',', names=True, dtype=None, encoding='utf-8')
+    X = np.column_stack([data[name].astype(np.float64) for name in FEATURE_NAMES])
+    rng = np.random.default_rng(seed)
+    perturbed = X * rng.uniform(0.5, 1.5, size=X.shape)
+    random = rng.uniform(0, 1, size=(n_random, X.shape[1])) * X.max(axis=0) * 1.2
+    return np.vstack([X, perturbed, random])
+
+
+def tree_probabilities(forest, X):
+    """(N, n_trees, n_classes) probabilities from each tree of a full-format forest"""
+    return np.asarray(forest.value)[forest.apply(X)]
+
+
+def greedy_tree_order(tree_proba, target):
+    """
+    Order trees so that each prefix agrees as well as possible with `target`
+    labels: at every step add the tree that maximizes the agreement of the
+    running ensemble (ties go to the lower tree index).
+    Returns (order, agreement after each step).
+    """
+    n_trees = tree_proba.shape[1]
+    remaining = list(range(n_trees))
+    total = np.zeros((tree_proba.shape[0], tree_proba.shape[2]))
+    order, agreement = [], []
+    while remaining:
+        candidates = total[:, None, :] + tree_proba[:, remaining, :]
+        scores = (candidates.argmax(axis=2) == target[:, None]).mean(axis=0)
+        best = int(scores.argmax())
+        tree = remaining.pop(best)
+        total += tree_proba[:, tree, :]
+        order.append(tree)
+        agreement.append(float(scores[best]))
+    return order, agreement
+
+
+def compact_forest(forest, trees, value_bits=8):
+    """
+    Build a compact CompiledForest from the selected `trees` of a
+    full-format forest. Internal nodes come first, tree by tree, followed by
+    the shared, de-duplicated leaves.
+    """
+    scale = 2 ** value_bits - 1
+    value_dtype = np.uint8 if value_bits <= 8 else np.uint16
+    feature, threshold, left, right = np.asarray(forest.feature), np.asarray(forest.threshold), \
+        np.asarray(forest.left), np.asarray(forest.right)
+    missing_left, value = np.asarray(forest.missing_left), np.asarray(forest.value)
+
+    leaf_ids = {}       # quantized value bytes -> shared leaf number
+    leaf_values = []
+    internal = []       # [feature, threshold, missing_left, left ref, right ref]
+
+    def build(node):
+        """Return ('leaf', n) or ('node', n) for the subtree rooted at `node`"""
+        if left[node] == node:
+            quantized = np.rint(value[node] * scale).astype(value_dtype)
+            key = quantized.tobytes()
+            if key not in leaf_ids:
+                leaf_ids[key] = len(leaf_values)
+                leaf_values.append(quantized)
+            return 'leaf', leaf_ids[key]
+        left_ref, right_ref = build(left[node]), build(right[node])
+        if left_ref == right_ref:
+            return left_ref
+        internal.append([int(feature[node]), float(threshold[node]), bool(missing_left[node]), left_ref, right_ref])
+        return 'node', len(internal) - 1
+
+    root_refs = [build(int(forest.roots[tree])) for tree in trees]
+
+    n_internal = len(internal)
+    n_nodes = n_internal + len(leaf_values)
+
+    def index(ref):
+        kind, n = ref
+        return n if kind == 'node' else n_internal + n
+
+    index_dtype = np.int16 if n_nodes <= np.iinfo(np.int16).max else np.int32
+    nodes = np.arange(n_nodes)
+    out_feature = np.zeros(n_nodes, dtype=np.int8)
+    out_threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+    out_left, out_right = nodes.copy(), nodes.copy()
+    out_missing = np.zeros(n_nodes, dtype=bool)
+    for i, (feat, thr, missing, left_ref, right_ref) in enumerate(internal):
+        out_feature[i] = feat
+        # Largest float32 not above the float64 threshold: for float32 x,
+        # x <= thr64 exactly when x <= thr32
+        thr32 = np.float32(thr)
+        if np.float64(thr32) > thr:
+            thr32 = np.nextafter(thr32, np.float32(-np.inf))
+        out_threshold[i] = thr32
+        out_missing[i] = missing
+        out_left[i], out_right[i] = index(left_ref), index(right_ref)
+
+    def depth(node):
+        if out_left[node] == node:
+            return 0
+        return 1 + max(depth(out_left[node]), depth(out_right[node]))
+
+    roots = np.array([index(ref) for ref in root_refs], dtype=np.int32)
+    return CompiledForest(
+        feature=out_feature,
+        threshold=out_threshold,
+        left=out_left.astype(index_dtype),
+        right=out_right.astype(index_dtype),
+        missing_left=out_missing,
+        value=np.array(leaf_values, dtype=value_dtype).reshape(len(leaf_values), value.shape[1]),
+        roots=roots,
+        max_depth=max(depth(root) for root in roots),
+        classes=forest.classes_,
+        leaf_offset=n_internal,
+        value_scale=scale,
+    )
+
+
+def agreement_report(reference, candidate, X, label_encoder):
+    expected = reference.predict_proba(X)
+    actual = candidate.predict_proba(X)
+    healthy = class_columns(label_encoder)['Healthy']
+    diff = np.abs(expected - actual)
+    return {
+        'rows': len(X),
+        'label_agreement': float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        'max_probability_diff': float(diff.max()),
+        'mean_probability_diff': float(diff.mean()),
+        'max_health_score_diff': float(diff[:, healthy].max() * 100),
+    }
+
+
+def latency_report(model, X, repeat=500):
+    """Single-item p50/p99 in microseconds and batch throughput in rows/s"""
+    row = X[:1]
+    model.predict_proba(row)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append((time.perf_counter() - start) * 1e6)
+    start = time.perf_counter()
+    model.predict_proba(X)
+    elapsed = time.perf_counter() - start
+    return {
+        'single_p50_us': float(np.percentile(timings, 50)),
+        'single_p99_us': float(np.percentile(timings, 99)),
+        'batch_rows_per_s': float(len(X) / elapsed),
+    }
+
+
+def forest_nbytes(forest):
+    """Resident bytes of the arrays a CompiledForest keeps, including the derived child table"""
+    arrays = (forest.feature, forest.threshold, forest.left, forest.right, forest.missing_left,
+              forest.value, forest.roots, forest.children)
+    return int(sum(np.asarray(array).nbytes for array in arrays))
+
+
+def load_joblib(model_dir):
+    """Load the sklearn model, returning (model, bytes allocated while loading)"""
+    import joblib
+    import sklearn.ensemble  # noqa: F401  (imported up front so only the model itself is counted)
+    tracemalloc.start()
+    model = joblib.load(os.path.join(model_dir, 'food_health_model.joblib'))
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, allocated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prune and quantize the exported food health forest')
+    parser.add_argument('--model-dir', default=script_dir, help='directory holding the full export (default: ml/)')
+    parser.add_argument('--output', default=None, help=f'compact artifact path (default: <model-dir>/{COMPACT_MODEL_NAME})')
+    parser.add_argument('--data', default=os.path.join(script_dir, 'data', 'sample_nutrition.csv'),
+                        help='CSV used to build the reference set')
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help='required label agreement with the full forest (default 0.99)')
+    parser.add_argument('--value-bits', type=int, choices=(8, 16), default=8,
+                        help='bits per stored leaf probability (default 8)')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    full_path = os.path.join(args.model_dir, COMPILED_MODEL_NAME)
+    output = args.output or os.path.join(args.model_dir, COMPACT_MODEL_NAME)
+    full, label_encoder = CompiledForest.load(full_path)
+    X = reference_rows(args.data)
+    target = full.predict_proba(X).argmax(axis=1)
+
+    # Smallest greedy prefix that still agrees after quantization
+    order, agreement = greedy_tree_order(tree_probabilities(full, X), target)
+    n_trees = next((i + 1 for i, score in enumerate(agreement) if score >= args.min_agreement), len(order))
+    while True:
+        compact = compact_forest(full, sorted(order[:n_trees]), args.value_bits)
+        matched = (compact.predict_proba(X).argmax(axis=1) == target).mean()
+        if matched >= args.min_agreement or n_trees == len(order):
+            break
+        n_trees += 1
+    # Made from the same pickles as the full forest
+    exported_from = load_npz(full_path).get('source_hash')
+    compact.save(output, label_encoder.classes_, source_hash=str(exported_from) if exported_from is not None else None)
+    compact, _ = CompiledForest.load(output)
+
+    report = {
+        'trees': {'full': full.n_estimators, 'compact': compact.n_estimators},
+        'nodes': {'full': len(full.feature), 'compact': len(compact.feature),
+                  'compact_leaves': len(compact.value)},
+        'agreement': agreement_report(full, compact, X, label_encoder),
+        'latency': {
+            'npz': latency_report(full, X),
+            'compact': latency_report(compact, X),
+        },
+        'disk_bytes': {
+            'npz': os.path.getsize(full_path),
+            'compact': os.path.getsize(output),
+        },
+        'ram_bytes': {
+            'npz': forest_nbytes(full),
+            'compact': forest_nbytes(compact),
+        },
+    }
+    joblib_path = os.path.join(args.model_dir, 'food_health_model.joblib')
+    if os.path.exists(joblib_path):
+        sklearn_model, allocated = load_joblib(args.model_dir)
+        report['latency']['joblib'] = latency_report(sklearn_model, X)
+        report['disk_bytes']['joblib'] = os.path.getsize(joblib_path)
+        report['ram_bytes']['joblib'] = allocated
+
+    agreement = report['agreement']
+    print(f"Trees: {report['trees']['full']} -> {report['trees']['compact']}, "
+          f"nodes: {report['nodes']['full']} -> {report['nodes']['compact']} "
+          f"({report['nodes']['compact_leaves']} shared leaves, {args.value_bits}-bit values)")
+    print(f"Agreement on {agreement['rows']} reference rows: {agreement['label_agreement']:.2%} of labels, "
+          f"max probability diff {agreement['max_probability_diff']:.4f} "
+          f"(mean {agreement['mean_probability_diff']:.4f}, health score +/-{agreement['max_health_score_diff']:.1f})")
+    print(f"\n{'format':<10}{'disk':>10}{'RAM':>10}{'p50 us':>10}{'p99 us':>10}{'rows/s':>12}")
+    for name in ('joblib', 'npz', 'compact'):
+        if name not in report['latency']:
+            continue
+        latency = report['latency'][name]
+        print(f"{name:<10}{report['disk_bytes'][name] / 1024:>8.1f}KB{report['ram_bytes'][name] / 1024:>8.1f}KB"
+              f"{latency['single_p50_us']:>10.1f}{latency['single_p99_us']:>10.1f}{latency['batch_rows_per_s']:>12.0f}")
+    print(f"\n✓ Compact forest saved to '{output}'")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,292 @@
+"""
+Fetch the Kaggle training datasets into ml/data/ through a local cache.
+
+Archives are stored content-addressed under data/.cache/archives/ (named by
+their SHA-256) and data/.cache/manifest.json records, per dataset, the
+archive's size and checksum plus the size, checksum and mtime of every file
+extracted from it. A dataset whose extracted files still match the manifest
+is skipped without any network access; one whose archive is cached is only
+re-extracted. Interrupted downloads resume from the partial file. Only the
+files the training scripts read are extracted.
+
+Sources, in order: --mirror / SWASTHYA_DATA_MIRROR (a directory, file:// or
+http(s):// URL laid out as <owner>/<dataset>.zip, e.g. for offline CI), else
+the Kaggle API with credentials from KAGGLE_USERNAME / KAGGLE_KEY or
+~/.kaggle/kaggle.json.
+
+Usage:
+    python download_data.py [--mirror DIR_OR_URL] [--verify] [--force] [--dataset openfoodfacts/world-food-facts]
+"""
+import argparse
+import base64
+import fnmatch
+import hashlib
+import json
 import os
+import shutil
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+from datetime import datetime, timezone
+
+KAGGLE_DOWNLOAD_URL = 'https://www.kaggle.com/api/v1/datasets/download/{dataset}'
+
+# Dataset -> {archive member pattern: file name in data/ that the training scripts read}
+DATASETS = {
+    'openfoodfacts/world-food-facts': {
+        # train.py reads the tab-separated dump under a .csv name
+        'en.openfoodfacts.org.products.*': 'en.openfoodfacts.org.products.csv',
+    },
+    'yashkaggle27/nutrition-dataset-for-healthy-food-prediction': {
+        '*.csv': 'nutrition_dataset.csv',
+    },
+}
+
+CACHE_DIR = '.cache'
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 1 << 20
+
+
+class DatasetStore:
+    """
+    Content-addressed cache of dataset archives plus the files extracted
+    from them, described by a manifest in `<data_dir>/.cache/`
+    """
+
+    def __init__(self, data_dir='data', mirror=None):
+        self.data_dir = data_dir
+        self.cache_dir = os.path.join(data_dir, CACHE_DIR)
+        self.archive_dir = os.path.join(self.cache_dir, 'archives')
+        self.mirror = mirror
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.manifest = self.read_manifest()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'datasets': {}}
+
+    def write_manifest(self):
+        # Write then rename, so an interrupted run never leaves a truncated manifest
+        temporary = self.manifest_path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temporary, self.manifest_path)
+
+    def archive_path(self, sha256):
+        return os.path.join(self.archive_dir, f'{sha256}.zip')
+
+    def source_url(self, dataset):
+        """Download URL of `dataset` and the HTTP Authorization header it needs, if any"""
+        if self.mirror:
+            base = self.mirror
+            if '://' not in base:
+                base = 'file://' + urllib.request.pathname2url(os.path.abspath(base))
+            return f"{base.rstrip('/')}/{dataset}.zip", None
+        return KAGGLE_DOWNLOAD_URL.format(dataset=dataset), kaggle_authorization()
+
+    def files_valid(self, entry, verify=False):
+        """
+        Whether every extracted file of a manifest entry is present and
+        unchanged: same size and mtime, or with `verify` the same SHA-256
+        """
+        for name, recorded in entry['files'].items():
+            path = os.path.join(self.data_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if stat.st_size != recorded['size']:
+                return False
+            if verify or stat.st_mtime_ns != recorded['mtime_ns']:
+                if file_sha256(path) != recorded['sha256']:
+                    return False
+                recorded['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def archive_valid(self, entry):
+        archive = entry.get('archive')
+        if archive is None:
+            return False
+        path = self.archive_path(archive['sha256'])
+        return os.path.exists(path) and os.path.getsize(path) == archive['size']
+
+    def fetch(self, dataset):
+        """
+        Download the archive of `dataset` into the cache, resuming a partial
+        download. Returns {'sha256', 'size', 'source'}.
+        """
+        url, authorization = self.source_url(dataset)
+        partial = os.path.join(self.archive_dir, dataset.replace('/', '__') + '.part')
+        print(f"Fetching {url}...")
+        download(url, partial, authorization)
 
-def download_datasets():
-    print("Attempting to download datasets from Kaggle...")
-    
-    # Check if kaggle is installed
+        sha256, size = file_sha256(partial), os.path.getsize(partial)
+        if not zipfile.is_zipfile(partial):
+            os.remove(partial)
+            raise ValueError(f'{url} did not return a zip archive')
+        os.replace(partial, self.archive_path(sha256))
+        if os.path.exists(partial + '.etag'):
+            os.remove(partial + '.etag')
+        print(f"✓ {size / 2**20:.1f} MB, sha256 {sha256[:16]}")
+        return {'sha256': sha256, 'size': size, 'source': url}
+
+    def extract(self, dataset, archive):
+        """Extract the files DATASETS names for `dataset`; returns their manifest records"""
+        files = {}
+        with zipfile.ZipFile(self.archive_path(archive['sha256'])) as zf:
+            members = zf.namelist()
+            for pattern, name in DATASETS[dataset].items():
+                matches = sorted(member for member in members if fnmatch.fnmatch(os.path.basename(member), pattern))
+                if not matches:
+                    raise FileNotFoundError(f"{dataset}: no member matching '{pattern}' in the archive")
+                path = os.path.join(self.data_dir, name)
+                temporary = path + '.tmp'
+                digest = hashlib.sha256()
+                # ZipExtFile checks the member's CRC-32 once it is fully read
+                with zf.open(matches[0]) as source, open(temporary, 'wb') as target:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        target.write(chunk)
+                os.replace(temporary, path)
+                stat = os.stat(path)
+                files[name] = {'member': matches[0], 'size': stat.st_size, 'sha256': digest.hexdigest(),
+                               'mtime_ns': stat.st_mtime_ns}
+                print(f"✓ Extracted {matches[0]} -> {path}")
+        return files
+
+    def sync(self, dataset, verify=False, force=False):
+        """Make the files of `dataset` present and valid, fetching only when needed"""
+        entry = self.manifest['datasets'].get(dataset)
+        if entry is not None and not force and self.files_valid(entry, verify):
+            # Keeps re-hashed files' new mtimes, so the next run trusts them again
+            self.write_manifest()
+            print(f"✓ {dataset} is up to date")
+            return entry
+
+        if entry is not None and not force and self.archive_valid(entry):
+            print(f"Re-extracting {dataset} from the cached archive...")
+            archive = entry['archive']
+        else:
+            archive = self.fetch(dataset)
+            if entry is not None and entry.get('archive', {}).get('sha256') not in (None, archive['sha256']):
+                print(f"Note: {dataset} changed since the last download")
+
+        entry = {
+            'archive': archive,
+            'fetched': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'files': self.extract(dataset, archive),
+        }
+        self.manifest['datasets'][dataset] = entry
+        self.write_manifest()
+        self.prune()
+        return entry
+
+    def prune(self):
+        """Delete cached archives that no manifest entry refers to"""
+        referenced = {entry['archive']['sha256'] for entry in self.manifest['datasets'].values()}
+        for name in os.listdir(self.archive_dir):
+            if name.endswith('.zip') and name[:-len('.zip')] not in referenced:
+                os.remove(os.path.join(self.archive_dir, name))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def kaggle_authorization():
+    """Basic auth header from KAGGLE_USERNAME / KAGGLE_KEY or kaggle.json"""
+    username, key = os.environ.get('KAGGLE_USERNAME'), os.environ.get('KAGGLE_KEY')
+    if not (username and key):
+        config_dir = os.environ.get('KAGGLE_CONFIG_DIR', os.path.join(os.path.expanduser('~'), '.kaggle'))
+        try:
+            with open(os.path.join(config_dir, 'kaggle.json')) as f:
+                credentials = json.load(f)
+        except FileNotFoundError:
+            raise RuntimeError("No Kaggle credentials: set KAGGLE_USERNAME / KAGGLE_KEY, put kaggle.json in "
+                               "~/.kaggle/, or use --mirror") from None
+        username, key = credentials['username'], credentials['key']
+    return 'Basic ' + base64.b64encode(f'{username}:{key}'.encode()).decode()
+
+
+def download(url, path, authorization=None):
+    """
+    Download `url` to `path`. Over HTTP a partial `path` is continued with a
+    Range request; its ETag is kept in `<path>.etag` and sent as If-Range,
+    so the server restarts from scratch if the file changed in between.
+    file:// sources are local and simply copied.
+    """
+    if url.startswith('file://'):
+        shutil.copyfile(urllib.request.url2pathname(urllib.parse.urlparse(url).path), path)
+        return
+
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    etag_path = path + '.etag'
+    request = urllib.request.Request(url)
+    if authorization:
+        # Not forwarded on redirect: Kaggle redirects to a signed storage URL
+        request.add_unredirected_header('Authorization', authorization)
+    if offset and os.path.exists(etag_path):
+        with open(etag_path) as f:
+            request.add_header('If-Range', f.read())
+        request.add_header('Range', f'bytes={offset}-')
+        print(f"Resuming from {offset / 2**20:.1f} MB")
     try:
-        import kaggle
-    except ImportError:
-        print("Error: 'kaggle' library not installed. Run 'pip install kaggle'")
+        response = urllib.request.urlopen(request, timeout=60)
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise
+        # Range not satisfiable: the partial file is already complete
         return
+    etag = response.headers.get('ETag')
+    if etag:
+        with open(etag_path, 'w') as f:
+            f.write(etag)
+    with response, open(path, 'ab' if response.status == 206 else 'wb') as target:
+        expected = response.headers.get('Content-Length')
+        copied = 0
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+            target.write(chunk)
+            copied += len(chunk)
+    if expected is not None and copied != int(expected):
+        raise IOError(f'Download of {url} ended after {copied} of {expected} bytes; rerun to resume')
+
 
-    datasets = [
-        "openfoodfacts/world-food-facts",
-        "yashkaggle27/nutrition-dataset-for-healthy-food-prediction"
-    ]
-    
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-
-    for dataset in datasets:
-        print(f"Downloading {dataset}...")
+def download_datasets(datasets=None, data_dir='data', mirror=None, verify=False, force=False):
+    store = DatasetStore(data_dir, mirror)
+    failed = []
+    for dataset in datasets or DATASETS:
         try:
-            # This requires ~/.kaggle/kaggle.json to be present
-            kaggle.api.dataset_download_files(dataset, path=data_dir, unzip=True)
-            print(f"Successfully downloaded and unzipped {dataset}")
+            store.sync(dataset, verify=verify, force=force)
         except Exception as e:
             print(f"Failed to download {dataset}: {e}")
-            print("Make sure you have your Kaggle API key (kaggle.json) in ~/.kaggle/")
+            failed.append(dataset)
+    return failed
+
 
 if __name__ == "__main__":
-    download_datasets()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--mirror', default=os.environ.get('SWASTHYA_DATA_MIRROR'),
+                        help='directory or URL holding <owner>/<dataset>.zip, used instead of Kaggle')
+    parser.add_argument('--dataset', action='append', choices=sorted(DATASETS),
+                        help='only this dataset (repeatable; default all)')
+    parser.add_argument('--verify', action='store_true',
+                        help='re-hash extracted files instead of trusting unchanged size and mtime')
+    parser.add_argument('--force', action='store_true', help='download again even if the cache is valid')
+    args = parser.parse_args()
+
+    failed = download_datasets(args.dataset, args.data_dir, args.mirror, args.verify, args.force)
+    sys.exit(1 if failed else 0)
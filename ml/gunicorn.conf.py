@@ -0,0 +1,47 @@
+"""
+Production gunicorn settings for the API servers (see serve.py).
+
+    gunicorn -c gunicorn.conf.py api_server:app
+    gunicorn -c gunicorn.conf.py --chdir ../api index:app
+
+The app is imported once in the master before the workers are forked, so
+the model, label encoder and food catalog are loaded a single time. The
+forest itself is a memory-mapped .npz, so its arrays live in the page cache
+and every worker maps the same physical pages.
+
+Settings (environment variables, or the usual gunicorn flags):
+    SWASTHYA_BIND     - address to listen on (default 0.0.0.0:5000)
+    SWASTHYA_WORKERS  - worker processes (default: number of CPUs)
+    SWASTHYA_MAX_IN_FLIGHT - requests worked on at once per worker (default 4,
+                        0 for no limit; see api/admission.py)
+    SWASTHYA_THREADS  - threads per worker (default 4 x SWASTHYA_MAX_IN_FLIGHT)
+
+Admission control can only shed requests that a thread has picked up, so
+each worker gets more threads than its in-flight limit: the spare ones
+answer the excess with an immediate 503 instead of leaving it in
+gunicorn's queue until clients time out.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('SWASTHYA_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('SWASTHYA_WORKERS', multiprocessing.cpu_count()))
+# Set in the environment so the preloaded app's AdmissionControl.from_env sees it
+max_in_flight = int(os.environ.setdefault('SWASTHYA_MAX_IN_FLIGHT', '4'))
+threads = int(os.environ.get('SWASTHYA_THREADS', 4 * max_in_flight or 4))
+if max_in_flight and threads <= max_in_flight:
+    print(f'gunicorn.conf.py: SWASTHYA_THREADS={threads} is not above SWASTHYA_MAX_IN_FLIGHT={max_in_flight}; '
+          f'excess requests will queue in gunicorn instead of being shed', file=sys.stderr)
+
+# Load the model in the master; api/index.py only does so at import with this set
+preload_app = True
+os.environ.setdefault('SWASTHYA_PRELOAD_MODEL', '1')
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation: the
+    # workers' garbage collector then never touches (and un-shares) the
+    # pages holding the preloaded objects
+    gc.freeze()
@@ -1,13 +1,40 @@
-import joblib
-import numpy as np
+import argparse
+import collections
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # Get the directory of this script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Load the trained model
-model = joblib.load(os.path.join(script_dir, 'food_health_model.joblib'))
-label_encoder = joblib.load(os.path.join(script_dir, 'label_encoder.joblib'))
+# Model loading and scoring are shared with the API servers in api/
+sys.path.insert(0, os.path.join(script_dir, os.pardir, 'api'))
+from forest import load_serving_model
+from scoring import FEATURE_NAMES, class_columns, score_matrix
+
+# Load the trained model (each batch worker process loads it once on import)
+model, label_encoder = load_serving_model(script_dir)
+
+# Where each model feature comes from in a given file layout, as
+# [(source column, scale), ...] candidates tried in order
+COLUMN_PRESETS = {
+    'swasthya': {name: [(name, 1.0)] for name in FEATURE_NAMES},
+    # OpenFoodFacts dump (see download_data.py): energy in kJ unless the kcal
+    # column is present, iron and vitamin C in grams
+    'openfoodfacts': {
+        'calories': [('energy-kcal_100g', 1.0), ('energy_100g', 1 / 4.184)],
+        'protein': [('proteins_100g', 1.0)],
+        'carbs': [('carbohydrates_100g', 1.0)],
+        'fat': [('fat_100g', 1.0)],
+        'fiber': [('fiber_100g', 1.0)],
+        'iron': [('iron_100g', 1000.0)],
+        'vitamin_c': [('vitamin-c_100g', 1000.0)],
+    },
+}
 
 
 def predict_food_health(calories, protein, carbs, fat, fiber, iron=0, vitamin_c=0):
@@ -27,24 +54,21 @@ def predict_food_health(calories, protein, carbs, fat, fiber, iron=0, vitamin_c=
         dict with prediction and confidence scores
     """
     # Prepare features
-    features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]])
+    features = np.array([[calories, protein, carbs, fat, fiber, iron, vitamin_c]], dtype=np.float64)
     
     # Predict
-    prediction = model.predict(features)[0]
-    probabilities = model.predict_proba(features)[0]
-    
-    # Get label
-    label = label_encoder.inverse_transform([prediction])[0]
+    labels, probabilities, health_scores = score_matrix(model, label_encoder, features)
+    columns = class_columns(label_encoder)
     
     # Create result
     result = {
-        'prediction': label,
+        'prediction': str(labels[0]),
         'confidence': {
-            'Healthy': float(probabilities[2]),
-            'Moderate': float(probabilities[1]),
-            'Unhealthy': float(probabilities[0])
+            'Healthy': float(probabilities[0, columns['Healthy']]),
+            'Moderate': float(probabilities[0, columns['Moderate']]),
+            'Unhealthy': float(probabilities[0, columns['Unhealthy']])
         },
-        'score': float(probabilities[2]) * 100  # Health score out of 100
+        'score': float(health_scores[0])  # Health score out of 100
     }
     
     return result
@@ -63,8 +87,192 @@ def get_health_recommendation(prediction_result):
     else:
         return f"✗ Not recommended. Health score: {score:.0f}/100. Consider healthier alternatives."
 
+def score_features(features):
+    """
+    Score one chunk inside a worker process.
+    Returns (labels, health_scores) for the (N, 7) feature matrix.
+    """
+    labels, _, health_scores = score_matrix(model, label_encoder, features)
+    return labels.astype(str), health_scores.astype(np.float32)
+
+def detect_separator(path):
+    """Tab for .tsv files or tab-heavy headers (the OpenFoodFacts dump), comma otherwise"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        header = f.readline()
+    return '\t' if path.endswith('.tsv') or header.count('\t') > header.count(',') else ','
+
+def resolve_columns(header, preset):
+    """
+    Pick the source column and scale for each feature from the file header.
+    Features with no matching column are filled with 0.
+    """
+    if preset == 'auto':
+        preset = 'swasthya' if all(name in header for name in FEATURE_NAMES) else 'openfoodfacts'
+    sources = {}
+    for name, candidates in COLUMN_PRESETS[preset].items():
+        sources[name] = next(((column, scale) for column, scale in candidates if column in header), None)
+    return preset, sources
+
+def chunk_features(chunk, sources):
+    """Numeric (N, 7) feature matrix for a DataFrame chunk; unparseable values become 0"""
+    import pandas as pd
+    features = np.zeros((len(chunk), len(FEATURE_NAMES)), dtype=np.float64)
+    for index, name in enumerate(FEATURE_NAMES):
+        if sources[name] is not None:
+            column, scale = sources[name]
+            values = pd.to_numeric(chunk[column], errors='coerce').to_numpy(dtype=np.float64)
+            features[:, index] = np.nan_to_num(values, nan=0.0) * scale
+    return features
+
+class ChunkWriter:
+    """
+    Appends scored chunks in input order to a CSV file or a directory of
+    Parquet part files, and records progress in a checkpoint so an
+    interrupted run can resume after the last finished chunk.
+    """
+
+    def __init__(self, output, fmt, checkpoint):
+        self.output = output
+        self.format = fmt
+        self.checkpoint = checkpoint
+        self.state = {'chunks_done': 0, 'rows_done': 0, 'output_bytes': 0}
+
+    def resume(self, run_key):
+        """Restore progress for the same input/settings; returns chunks already done"""
+        if not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state.get('run_key') != run_key or not os.path.exists(self.output):
+            print(f"Checkpoint {self.checkpoint} does not match this run; starting over", file=sys.stderr)
+            return 0
+        self.state = state
+        if self.format == 'csv':
+            # Drop anything written after the last checkpointed chunk
+            with open(self.output, 'r+b') as f:
+                f.truncate(state['output_bytes'])
+        return state['chunks_done']
+
+    def start(self, run_key):
+        self.state = {'run_key': run_key, 'chunks_done': 0, 'rows_done': 0, 'output_bytes': 0}
+        if self.format == 'csv':
+            open(self.output, 'w').close()
+        else:
+            os.makedirs(self.output, exist_ok=True)
+            for name in os.listdir(self.output):
+                if name.startswith('part-'):
+                    os.remove(os.path.join(self.output, name))
+
+    def write(self, frame):
+        if self.format == 'csv':
+            with open(self.output, 'a', newline='', encoding='utf-8') as f:
+                frame.to_csv(f, index=False, header=self.state['chunks_done'] == 0)
+                self.state['output_bytes'] = f.tell()
+        else:
+            part = os.path.join(self.output, f"part-{self.state['chunks_done']:06d}.parquet")
+            frame.to_parquet(part + '.tmp', index=False)
+            os.replace(part + '.tmp', part)
+        self.state['chunks_done'] += 1
+        self.state['rows_done'] += len(frame)
+        with open(self.checkpoint + '.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(self.checkpoint + '.tmp', self.checkpoint)
+
+    def finish(self):
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+def score_file(input_path, output_path, chunk_size=50000, workers=None, columns='auto',
+               keep=(), sep=None, restart=False):
+    """
+    Score a CSV/TSV of any size in chunks across a process pool.
+    Writes `keep` columns plus prediction and health_score, in input order,
+    to `output_path` (.parquet writes a directory of part files).
+    Returns (rows, seconds).
+    """
+    import pandas as pd
+
+    sep = sep or detect_separator(input_path)
+    header = pd.read_csv(input_path, sep=sep, nrows=0).columns
+    preset, sources = resolve_columns(header, columns)
+    keep = [column for column in keep if column in header]
+    usecols = sorted({source[0] for source in sources.values() if source} | set(keep))
+    missing = [name for name, source in sources.items() if source is None]
+    print(f"Columns: {preset} preset" + (f" (no data for {', '.join(missing)}, using 0)" if missing else ''),
+          file=sys.stderr)
+
+    fmt = 'parquet' if output_path.endswith('.parquet') else 'csv'
+    writer = ChunkWriter(output_path, fmt, output_path.rstrip('/') + '.checkpoint.json')
+    run_key = f"{os.path.abspath(input_path)}|{os.path.getsize(input_path)}|{chunk_size}|{','.join(usecols)}"
+    skip = 0 if restart else writer.resume(run_key)
+    if skip:
+        print(f"Resuming after chunk {skip} ({writer.state['rows_done']} rows already scored)", file=sys.stderr)
+    else:
+        writer.start(run_key)
+
+    total_bytes = os.path.getsize(input_path)
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    rows = 0
+
+    def report(done, position):
+        elapsed = time.perf_counter() - start
+        print(f"\r{done} chunks, {writer.state['rows_done']} rows, {position / total_bytes:.0%} of input, "
+              f"{rows / elapsed if elapsed else 0:,.0f} rows/s", end='', file=sys.stderr, flush=True)
+
+    with open(input_path, 'rb') as source, ProcessPoolExecutor(max_workers=workers) as pool:
+        reader = pd.read_csv(source, sep=sep, usecols=usecols, chunksize=chunk_size, dtype=str,
+                             quoting=3 if sep == '\t' else 0, on_bad_lines='skip', encoding_errors='replace')
+        # Bounded in-flight queue keeps memory flat and output in input order
+        in_flight = collections.deque()
+        for index, chunk in enumerate(reader):
+            if index < skip:
+                continue
+            in_flight.append((chunk[keep].reset_index(drop=True), pool.submit(score_features, chunk_features(chunk, sources))))
+            while len(in_flight) > workers * 2 or (in_flight and in_flight[0][1].done()):
+                kept, future = in_flight.popleft()
+                labels, health_scores = future.result()
+                writer.write(kept.assign(prediction=labels, health_score=np.round(health_scores, 1)))
+                rows += len(kept)
+                report(writer.state['chunks_done'], source.tell())
+        while in_flight:
+            kept, future = in_flight.popleft()
+            labels, health_scores = future.result()
+            writer.write(kept.assign(prediction=labels, health_score=np.round(health_scores, 1)))
+            rows += len(kept)
+            report(writer.state['chunks_done'], total_bytes)
+
+    writer.finish()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    return rows, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a nutrition CSV/TSV file with the food health model')
+    parser.add_argument('input', help='CSV or TSV file (e.g. data/en.openfoodfacts.org.products.csv)')
+    parser.add_argument('output', help='output .csv file, or .parquet directory of part files')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='rows per chunk (default 50000)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--columns', choices=['auto'] + sorted(COLUMN_PRESETS), default='auto',
+                        help='input column layout (default: detect from the header)')
+    parser.add_argument('--keep', default='', help='comma-separated input columns to copy to the output')
+    parser.add_argument('--sep', default=None, help='field separator (default: detect)')
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint and start over')
+    args = parser.parse_args(argv)
+
+    keep = [column.strip() for column in args.keep.split(',') if column.strip()]
+    rows, elapsed = score_file(args.input, args.output, args.chunk_size, args.workers, args.columns,
+                               keep, args.sep, args.restart)
+    print(f"Scored {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s) -> {args.output}")
+
 # Example usage
 if __name__ == "__main__":
+    # With arguments: batch-score a file, e.g.
+    #   python predict_api.py data/en.openfoodfacts.org.products.csv scores.csv --keep code,product_name
+    if len(sys.argv) > 1:
+        main()
+        sys.exit(0)
+
     print("=== Swasthya AI - Food Health Predictor ===\n")
     
     # Test with some foods
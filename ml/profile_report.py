@@ -0,0 +1,114 @@
+"""
+Aggregate per-request profiles into a hot-function report.
+
+Reads the profiles the API servers write when SWASTHYA_PROFILE_RATE or
+SWASTHYA_PROFILE_HEADER is set (see api/profiling.py) and prints, for each
+profiling mode, the top functions by self time averaged over the selected
+requests:
+  - sampled profiles: self time is the samples with the function innermost,
+    total time the samples with it anywhere on the stack, times the interval
+  - cProfile profiles: pstats' tottime and cumtime
+
+Usage:
+    python profile_report.py [DIR] [--route /api/analyze-meal] [--top 20] [--sort self|total]
+"""
+import argparse
+import json
+import os
+import pstats
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+DEFAULT_DIR = os.environ.get('SWASTHYA_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'swasthya-profiles'))
+
+
+def load_profiles(directory, route=None, min_bytes=0):
+    """Metadata of every profile in `directory`, optionally for one route and payloads of at least `min_bytes`"""
+    profiles = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            meta = json.load(f)
+        if route is not None and meta['route'] != route:
+            continue
+        if meta['payload_bytes'] < min_bytes:
+            continue
+        meta['path'] = os.path.join(directory, name[:-len('.json')])
+        profiles.append(meta)
+    return profiles
+
+
+def short_name(frame):
+    """Last two path components of a 'file:line(function)' label"""
+    path, _, location = frame.rpartition(':')
+    return f"{os.path.join(*path.split(os.sep)[-2:]) if path else path}:{location}"
+
+
+def sampled_times(profiles):
+    """{function: [self ms, total ms]} summed over sampled profiles"""
+    times = defaultdict(lambda: [0.0, 0.0])
+    for meta in profiles:
+        interval = meta['interval_ms']
+        for stack, count in meta['samples'].items():
+            frames = stack.split(';')
+            times[frames[-1]][0] += count * interval
+            for frame in set(frames):
+                times[frame][1] += count * interval
+    return times
+
+
+def cprofile_times(profiles):
+    """{function: [self ms, total ms]} summed over cProfile profiles"""
+    times = {}
+    stats = pstats.Stats(*[meta['path'] + '.prof' for meta in profiles])
+    for (filename, line, function), (_, _, tottime, cumtime, _) in stats.stats.items():
+        times[f'{filename}:{line}({function})'] = [tottime * 1000, cumtime * 1000]
+    return times
+
+
+def print_table(title, profiles, times, top, sort):
+    n = len(profiles)
+    wall = sum(meta['wall_ms'] for meta in profiles) / n
+    print(f'\n{title}: {n} requests, mean wall time {wall:.2f} ms')
+    column = 0 if sort == 'self' else 1
+    ranked = sorted(times.items(), key=lambda item: item[1][column], reverse=True)[:top]
+    print(f"{'self ms':>9} {'self %':>7} {'total ms':>9}  function")
+    for frame, (self_ms, total_ms) in ranked:
+        print(f'{self_ms / n:9.3f} {100 * self_ms / n / wall:6.1f}% {total_ms / n:9.3f}  {short_name(frame)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', default=DEFAULT_DIR)
+    parser.add_argument('--route', help='Only profiles of this route template, e.g. /api/analyze-meal')
+    parser.add_argument('--min-bytes', type=int, default=0, help='Only requests with at least this many payload bytes')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=('self', 'total'), default='self')
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.directory, args.route, args.min_bytes)
+    if not profiles:
+        print(f'No matching profiles in {args.directory}')
+        return 1
+
+    routes = Counter((meta['method'], meta['route']) for meta in profiles)
+    print('Profiled requests:')
+    for (method, route), count in routes.most_common():
+        selected = [meta for meta in profiles if (meta['method'], meta['route']) == (method, route)]
+        payload = sum(meta['payload_bytes'] for meta in selected) / count
+        wall = sum(meta['wall_ms'] for meta in selected) / count
+        print(f'  {method} {route}: {count} requests, mean payload {payload:.0f} B, mean wall time {wall:.2f} ms')
+
+    sampled = [meta for meta in profiles if meta['mode'] == 'sample']
+    if sampled:
+        print_table('Sampled', sampled, sampled_times(sampled), args.top, args.sort)
+    profiled = [meta for meta in profiles if meta['mode'] == 'cprofile']
+    if profiled:
+        print_table('cProfile', profiled, cprofile_times(profiled), args.top, args.sort)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Production launcher: runs the API under gunicorn with gunicorn.conf.py
+(model preloaded before forking, forest arrays shared between workers).
+
+Usage:
+    python serve.py [--app ml|vercel] [--workers N] [--threads N] [--max-in-flight N] [--bind 0.0.0.0:5000]
+
+--app ml serves api_server.py; --app vercel serves api/index.py.
+Unset options fall back to SWASTHYA_WORKERS / SWASTHYA_THREADS /
+SWASTHYA_MAX_IN_FLIGHT / SWASTHYA_BIND and then to the defaults in
+gunicorn.conf.py.
+"""
+import argparse
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    'ml': (script_dir, 'api_server:app'),
+    'vercel': (os.path.abspath(os.path.join(script_dir, os.pardir, 'api')), 'index:app'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=sorted(APPS), default='ml')
+    parser.add_argument('--workers', type=int, help='worker processes (default: number of CPUs)')
+    parser.add_argument('--threads', type=int, help='threads per worker (default 4 x SWASTHYA_MAX_IN_FLIGHT)')
+    parser.add_argument('--max-in-flight', type=int, help='requests worked on at once per worker (default 4)')
+    parser.add_argument('--bind', help='address to listen on (default 0.0.0.0:5000)')
+    args = parser.parse_args(argv)
+
+    for name, value in (('SWASTHYA_WORKERS', args.workers), ('SWASTHYA_THREADS', args.threads),
+                        ('SWASTHYA_MAX_IN_FLIGHT', args.max_in_flight), ('SWASTHYA_BIND', args.bind)):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    chdir, target = APPS[args.app]
+    command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(script_dir, 'gunicorn.conf.py'),
+               '--chdir', chdir, target]
+    os.execv(sys.executable, command)
+
+
+if __name__ == '__main__':
+    main()
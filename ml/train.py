@@ -1,12 +1,134 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import classification_report, accuracy_score
 import joblib
+import argparse
+import json
 import os
+import resource
 
-def load_data():
+# OpenFoodFacts columns used for training; the dump has hundreds more
+OFF_FEATURES = [
+    'energy_100g', 'fat_100g', 'saturated-fat_100g', 
+    'carbohydrates_100g', 'sugars_100g', 'fiber_100g', 
+    'proteins_100g', 'salt_100g'
+]
+OFF_TARGET = 'nutrition_grade_fr'
+GRADE_MAP = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4}
+OFF_CACHE_PATH = 'data/openfoodfacts_features.parquet'
+OFF_CACHE_VERSION = 1
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB.
+    Reads /proc on Linux; elsewhere falls back to the peak RSS.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, KB elsewhere
+        return peak / 2**20 if peak > 2**32 else peak / 1024
+
+def off_cache_key(path):
+    stat = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': stat.st_size, 'mtime': int(stat.st_mtime),
+            'columns': OFF_FEATURES + [OFF_TARGET], 'version': OFF_CACHE_VERSION}
+
+def ingest_openfoodfacts(path, cache_path=OFF_CACHE_PATH, max_rss_mb=1024, chunk_rows=100000):
+    """
+    Stream the OpenFoodFacts TSV into a compact Parquet cache.
+
+    Only the training columns are parsed (float32 features, categorical
+    grade). Each chunk is dropna'd and grade-mapped before being appended to
+    the cache, so the full dump is never held in memory. The chunk size
+    halves when RSS nears `max_rss_mb` and grows again when well below it.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    header = pd.read_csv(path, sep='\t', nrows=0).columns
+    if OFF_TARGET not in header:
+        print(f"Warning: {path} has no '{OFF_TARGET}' column.")
+        return None
+    features = [c for c in OFF_FEATURES if c in header]
+    dtypes = {c: 'float32' for c in features}
+    dtypes[OFF_TARGET] = 'category'
+
+    print(f"Streaming {path} into {cache_path} (RSS limit {max_rss_mb} MB)...")
+    tmp_path = cache_path + '.tmp'
+    writer = None
+    rows_in = rows_out = 0
+    peak_rss = current_rss_mb()
+    reader = pd.read_csv(path, sep='\t', usecols=features + [OFF_TARGET], dtype=dtypes, iterator=True)
+    try:
+        while True:
+            try:
+                chunk = reader.get_chunk(chunk_rows)
+            except StopIteration:
+                break
+            rows_in += len(chunk)
+
+            chunk = chunk.dropna()
+            grades = chunk[OFF_TARGET].astype(str).str.lower()
+            target = grades.map(GRADE_MAP)
+            keep = target.notna()
+            out = chunk.loc[keep, features].copy()
+            out[OFF_TARGET] = pd.Categorical(grades[keep], categories=list(GRADE_MAP))
+            out['target'] = target[keep].astype('int8')
+
+            table = pa.Table.from_pandas(out, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            rows_out += len(out)
+            del chunk, out, table
+
+            # Adapt the chunk size to stay under the memory budget
+            rss = current_rss_mb()
+            peak_rss = max(peak_rss, rss)
+            if rss > 0.8 * max_rss_mb:
+                chunk_rows = max(1000, chunk_rows // 2)
+            elif rss < 0.5 * max_rss_mb:
+                chunk_rows = min(chunk_rows * 2, 1000000)
+            print(f"\r  {rows_in:,} rows read, {rows_out:,} kept, RSS {rss:.0f} MB", end='', flush=True)
+    finally:
+        reader.close()
+        if writer is not None:
+            writer.close()
+    print()
+
+    if writer is None:
+        print("Warning: no rows ingested.")
+        return None
+    os.replace(tmp_path, cache_path)
+    with open(cache_path + '.json', 'w') as f:
+        json.dump(dict(off_cache_key(path), rows=rows_out, peak_rss_mb=round(peak_rss, 1)), f, indent=2)
+    print(f"Cached {rows_out:,} of {rows_in:,} rows (peak RSS {peak_rss:.0f} MB)")
+    return cache_path
+
+def load_openfoodfacts(path, cache_path=OFF_CACHE_PATH, max_rss_mb=1024, rebuild=False):
+    """
+    Load the compact OpenFoodFacts training frame, reusing the Parquet cache
+    when it was built from the same source file
+    """
+    meta_path = cache_path + '.json'
+    cache_valid = False
+    if not rebuild and os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        cache_valid = all(meta.get(k) == v for k, v in off_cache_key(path).items())
+
+    if cache_valid:
+        print(f"Using cached features from {cache_path}")
+    elif ingest_openfoodfacts(path, cache_path, max_rss_mb) is None:
+        return None
+    return pd.read_parquet(cache_path)
+
+def load_data(max_rss_mb=1024, rebuild_cache=False):
     """
     Load datasets. 
     Assumes files are in ml/data/
@@ -20,8 +142,13 @@ def load_data():
     for name, path in paths.items():
         if os.path.exists(path):
             print(f"Loading {name}...")
-            # Using low_memory=False because OpenFoodFacts is huge and has mixed types
-            dfs[name] = pd.read_csv(path, sep='\t' if 'openfoodfacts' in path else ',', low_memory=False)
+            if 'openfoodfacts' in path:
+                # OpenFoodFacts is several GB: stream it into a columnar cache
+                df = load_openfoodfacts(path, max_rss_mb=max_rss_mb, rebuild=rebuild_cache)
+                if df is not None:
+                    dfs[name] = df
+            else:
+                dfs[name] = pd.read_csv(path)
         else:
             print(f"Warning: {path} not found.")
             
@@ -39,18 +166,17 @@ def preprocess_data(dfs):
     if 'world_facts' in dfs:
         print("Processing World Food Facts...")
         df1 = dfs['world_facts']
-        features1 = [
-            'energy_100g', 'fat_100g', 'saturated-fat_100g', 
-            'carbohydrates_100g', 'sugars_100g', 'fiber_100g', 
-            'proteins_100g', 'salt_100g'
-        ]
-        target1 = 'nutrition_grade_fr'
+        features1 = OFF_FEATURES
+        target1 = OFF_TARGET
         
         cols = [c for c in features1 if c in df1.columns]
-        if target1 in df1.columns:
+        if 'target' in df1.columns:
+            # Already filtered and grade-mapped during the streaming ingest
+            X_list.append(df1[cols])
+            y_list.append(df1['target'])
+        elif target1 in df1.columns:
             temp_df = df1[cols + [target1]].dropna()
-            grade_map = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4}
-            temp_df['target'] = temp_df[target1].str.lower().map(grade_map)
+            temp_df['target'] = temp_df[target1].str.lower().map(GRADE_MAP)
             temp_df = temp_df.dropna(subset=['target'])
             
             X_list.append(temp_df[cols])
@@ -105,12 +231,17 @@ def preprocess_data(dfs):
     
     return X, y
 
-def train_model(X, y):
+def train_model(X, y, backend='forest'):
     print("Splitting data...")
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    print("Training Random Forest Classifier...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    if backend == 'boosting':
+        # Histogram binning keeps training fast on the full OpenFoodFacts dump
+        print("Training Histogram Gradient Boosting Classifier...")
+        model = HistGradientBoostingClassifier(random_state=42)
+    else:
+        print("Training Random Forest Classifier...")
+        model = RandomForestClassifier(n_estimators=100, random_state=42)
     model.fit(X_train, y_train)
     
     y_pred = model.predict(X_test)
@@ -121,18 +252,27 @@ def train_model(X, y):
     return model
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the food model on the Kaggle datasets in ml/data/')
+    parser.add_argument('--max-rss-mb', type=int, default=1024,
+                        help='memory budget for the OpenFoodFacts ingest (default 1024)')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='re-parse the OpenFoodFacts dump even if the feature cache is current')
+    parser.add_argument('--backend', choices=('forest', 'boosting'), default='forest',
+                        help='random forest or histogram gradient boosting (default forest)')
+    args = parser.parse_args()
+    
     # Create data dir if it doesn't exist
     if not os.path.exists('data'):
         os.makedirs('data')
         print("Please place your datasets in 'ml/data/'")
     
-    data_frames = load_data()
+    data_frames = load_data(args.max_rss_mb, args.rebuild_cache)
     
     if data_frames:
         processed = preprocess_data(data_frames)
         if processed:
             X, y = processed
-            model = train_model(X, y)
+            model = train_model(X, y, args.backend)
             
             # Save the model
             joblib.dump(model, 'food_model.joblib')
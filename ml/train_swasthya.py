@@ -1,11 +1,74 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
 import joblib
+import argparse
+import copy
+import hashlib
+import io
+import json
 import os
+import sys
+import time
+
+# The NumPy forest evaluator is shared with the serving code in api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'api'))
+from forest import CompiledForest, COMPILED_MODEL_NAME, COMPACT_MODEL_NAME, load_compiled_model, source_hash
+from boosting import CompiledBoosting
+from scoring import class_columns
+from model_registry import publish_model, activate_version, read_manifest
+
+FEATURE_COLS = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'iron', 'vitamin_c']
+
+# Model families selectable with --backend: estimator, default parameters,
+# parameter that sets the number of trees (or boosting iterations) and
+# the class that compiles it for serving
+MODEL_BACKENDS = {
+    'forest': (RandomForestClassifier, {'n_estimators': 100, 'max_depth': 10, 'random_state': 42, 'n_jobs': -1},
+               'n_estimators', CompiledForest),
+    'boosting': (HistGradientBoostingClassifier, {'max_iter': 100, 'learning_rate': 0.1, 'max_depth': 4,
+                                                  'max_leaf_nodes': 15, 'min_samples_leaf': 4,
+                                                  'early_stopping': False, 'random_state': 42},
+                 'max_iter', CompiledBoosting),
+}
+
+# Default hyperparameter grid for --search, per backend
+SEARCH_GRIDS = {
+    'forest': {
+        'n_estimators': [25, 50, 100, 200],
+        'max_depth': [4, 6, 8, 10, None],
+        'min_samples_leaf': [1, 2, 4]
+    },
+    'boosting': {
+        'max_iter': [25, 50, 100, 200],
+        'max_depth': [2, 3, 4, 6],
+        'learning_rate': [0.05, 0.1, 0.2]
+    }
+}
+SEARCH_GRID = SEARCH_GRIDS['forest']
+
+def make_model(backend='forest', **params):
+    """An unfitted estimator of `backend` with its defaults overridden by `params`"""
+    estimator, defaults, _, _ = MODEL_BACKENDS[backend]
+    return estimator(**dict(defaults, **params))
+
+def model_backend(model):
+    """Name of the MODEL_BACKENDS entry a fitted model belongs to"""
+    for name, (estimator, _, _, _) in MODEL_BACKENDS.items():
+        if isinstance(model, estimator):
+            return name
+    raise TypeError(f'Unsupported model type {type(model).__name__}')
+
+def compile_model(model):
+    """The model's serving form (CompiledForest or CompiledBoosting)"""
+    return MODEL_BACKENDS[model_backend(model)][3].from_sklearn(model)
+
+def tree_count(model):
+    """Trees in a forest, or boosting iterations"""
+    return getattr(model, 'n_iter_', None) or len(model.estimators_)
 
 def load_sample_data():
     """
@@ -29,7 +92,7 @@ def preprocess_data(df):
     print("\n=== Data Preprocessing ===")
     
     # Features for prediction
-    feature_cols = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'iron', 'vitamin_c']
+    feature_cols = FEATURE_COLS
     target_col = 'healthy_label'
     
     # Check if all columns exist
@@ -42,7 +105,7 @@ def preprocess_data(df):
     X = df[feature_cols]
     y = df[target_col]
     
-    # Encode target labels (Healthy=2, Moderate=1, Unhealthy=0)
+    # Encode target labels (alphabetical: Healthy=0, Moderate=1, Unhealthy=2)
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
     
@@ -53,29 +116,24 @@ def preprocess_data(df):
     
     return X, y_encoded, label_encoder
 
-def train_model(X, y):
+def train_model(X, y, label_encoder, backend='forest'):
     """
-    Train Random Forest Classifier
+    Train a classifier of the given backend (see MODEL_BACKENDS)
     """
     print("\n=== Model Training ===")
     
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    X_train, X_test, y_train, y_test = split_holdout(X, y)
     
     print(f"Training samples: {len(X_train)}")
     print(f"Testing samples: {len(X_test)}")
     
     # Train model
-    print("\nTraining Random Forest Classifier...")
-    model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=10,
-        random_state=42,
-        n_jobs=-1
-    )
+    model = make_model(backend)
+    print(f"\nTraining {type(model).__name__}...")
+    start = time.perf_counter()
     model.fit(X_train, y_train)
+    print(f"Trained in {time.perf_counter() - start:.2f}s")
     
     # Evaluate
     y_pred = model.predict(X_test)
@@ -84,18 +142,233 @@ def train_model(X, y):
     print(f"\n=== Model Performance ===")
     print(f"Accuracy: {accuracy:.2%}")
     print("\nClassification Report:")
-    print(classification_report(y_test, y_pred, target_names=['Unhealthy', 'Moderate', 'Healthy']))
+    print(classification_report(y_test, y_pred, labels=np.arange(len(label_encoder.classes_)),
+                                target_names=label_encoder.classes_))
     
-    # Feature importance
-    print("\n=== Feature Importance ===")
-    feature_importance = pd.DataFrame({
-        'feature': X.columns,
-        'importance': model.feature_importances_
-    }).sort_values('importance', ascending=False)
-    print(feature_importance.to_string(index=False))
+    # Feature importance (forests only; boosting has no impurity importances)
+    if hasattr(model, 'feature_importances_'):
+        print("\n=== Feature Importance ===")
+        feature_importance = pd.DataFrame({
+            'feature': X.columns,
+            'importance': model.feature_importances_
+        }).sort_values('importance', ascending=False)
+        print(feature_importance.to_string(index=False))
     
     return model
 
+def split_holdout(X, y):
+    """The same stratified 80/20 split train_model uses, so held-out rows never leak into training"""
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def incremental_update(model, label_encoder, base_df, new_df, add_trees=20, replay_ratio=1.0, tolerance=0.0):
+    """
+    Grow an existing model with `add_trees` trees (boosting iterations for
+    the boosting backend) fitted on new labelled rows (warm_start), instead
+    of retraining on the whole corpus.
+    
+    The new trees see the training part of the delta plus a small stratified
+    replay sample of the corpus (at most `replay_ratio` x the delta, and at
+    least one row per class so every tree knows all classes). Training cost
+    therefore scales with the delta, not the corpus.
+    
+    Validation uses the corpus hold-out from train_model plus 20% of the
+    delta. Returns (candidate, baseline_accuracy, new_accuracy, accepted);
+    accepted is False when accuracy drops by more than `tolerance`.
+    """
+    print("\n=== Incremental Update ===")
+    unknown = sorted(set(new_df['healthy_label']) - set(label_encoder.classes_))
+    if unknown:
+        raise ValueError(f"Unknown labels in new rows: {unknown}")
+    
+    X_base, y_base = base_df[FEATURE_COLS], label_encoder.transform(base_df['healthy_label'])
+    X_new, y_new = new_df[FEATURE_COLS], label_encoder.transform(new_df['healthy_label'])
+    
+    X_base_train, X_base_hold, y_base_train, y_base_hold = split_holdout(X_base, y_base)
+    if len(new_df) >= 5:
+        counts = np.bincount(y_new)
+        stratify = y_new if counts[counts > 0].min() >= 2 else None
+        X_new_train, X_new_hold, y_new_train, y_new_hold = train_test_split(
+            X_new, y_new, test_size=0.2, random_state=42, stratify=stratify
+        )
+    else:
+        # Too few rows to spare any for validation
+        X_new_train, y_new_train = X_new, y_new
+        X_new_hold, y_new_hold = X_new.iloc[:0], y_new[:0]
+    
+    X_val = pd.concat([X_base_hold, X_new_hold])
+    y_val = np.concatenate([y_base_hold, y_new_hold])
+    
+    # Replay sample: one row of every class, then fill up to replay_ratio x delta
+    rng = np.random.default_rng(42)
+    replay = [rng.choice(np.flatnonzero(y_base_train == c)) for c in np.unique(y_base_train)]
+    budget = max(0, int(replay_ratio * len(X_new_train)) - len(replay))
+    rest = np.setdiff1d(np.arange(len(y_base_train)), replay)
+    replay += rng.choice(rest, size=min(budget, len(rest)), replace=False).tolist()
+    
+    X_fit = pd.concat([X_new_train, X_base_train.iloc[replay]])
+    y_fit = np.concatenate([y_new_train, y_base_train[replay]])
+    
+    baseline = accuracy_score(y_val, model.predict(X_val))
+    
+    candidate = copy.deepcopy(model)
+    size_param = MODEL_BACKENDS[model_backend(model)][2]
+    candidate.set_params(warm_start=True, **{size_param: tree_count(model) + add_trees})
+    start = time.perf_counter()
+    candidate.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    candidate.set_params(warm_start=False)
+    
+    updated = accuracy_score(y_val, candidate.predict(X_val))
+    accepted = updated >= baseline - tolerance
+    
+    print(f"New rows: {len(new_df)} ({len(X_new_train)} train, {len(X_new_hold)} held out)")
+    print(f"Fitted {add_trees} new trees on {len(X_fit)} rows in {fit_seconds:.2f}s "
+          f"({tree_count(model)} -> {tree_count(candidate)} trees)")
+    print(f"Held-out accuracy: {baseline:.2%} -> {updated:.2%} on {len(y_val)} rows")
+    return candidate, baseline, updated, accepted
+
+def dataset_key(X, y):
+    """Short content hash of the training data, used to key cached folds and results"""
+    digest = hashlib.sha1(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()[:16]
+
+def load_or_make_folds(X, y, n_folds, cache_dir, key):
+    """
+    Stratified fold assignment (one fold id per row), computed once and
+    cached so every config and every rerun is scored on identical splits
+    """
+    path = os.path.join(cache_dir, f'folds-{key}-k{n_folds}.npy')
+    if os.path.exists(path):
+        return np.load(path)
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for fold, (_, test_index) in enumerate(splitter.split(X, y)):
+        fold_ids[test_index] = fold
+    np.save(path, fold_ids)
+    return fold_ids
+
+def evaluate_fold(params, X, y, fold_ids, fold, backend='forest'):
+    """
+    Fit one config on one fold (single-threaded; parallelism is across
+    fold/config pairs). The fold-0 model is returned in its serving form
+    for latency and size measurements.
+    """
+    train, test = fold_ids != fold, fold_ids == fold
+    if backend == 'forest':
+        params = dict(params, n_jobs=1)
+    model = make_model(backend, **params)
+    model.fit(X[train], y[train])
+    accuracy = accuracy_score(y[test], model.predict(X[test]))
+    return accuracy, compile_model(model) if fold == 0 else None
+
+def serving_cost(forest, X, repeat=300):
+    """Single-item latency (p50, p99 in microseconds) and artifact size in bytes of a compiled model"""
+    row = X[:1]
+    forest.predict_proba(row)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        timings.append((time.perf_counter() - start) * 1e6)
+    buffer = io.BytesIO()
+    forest.save(buffer, ['Healthy', 'Moderate', 'Unhealthy'])
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99)), len(buffer.getvalue())
+
+def pareto_front(results):
+    """Indices of results not dominated on (accuracy up, p99 latency down, size down)"""
+    front = []
+    for i, a in enumerate(results):
+        dominated = any(
+            b['accuracy_mean'] >= a['accuracy_mean'] and b['latency_p99_us'] <= a['latency_p99_us']
+            and b['size_bytes'] <= a['size_bytes'] and
+            (b['accuracy_mean'] > a['accuracy_mean'] or b['latency_p99_us'] < a['latency_p99_us']
+             or b['size_bytes'] < a['size_bytes'])
+            for j, b in enumerate(results) if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+def search_hyperparameters(X, y, grid=SEARCH_GRID, n_folds=5, cache_dir='search_cache', p99_budget_us=None,
+                           backend='forest'):
+    """
+    Stratified k-fold search over model size, depth and leaf (or learning
+    rate) settings of one backend, run across all cores. Folds and per-config results are cached in
+    `cache_dir`, keyed by a hash of the data, so reruns only evaluate
+    configs that have not been scored yet. Prints accuracy against serving
+    latency and model size with the Pareto-optimal configs marked.
+    """
+    from itertools import product
+    from joblib import Parallel, delayed
+    
+    print("\n=== Hyperparameter Search ===")
+    os.makedirs(cache_dir, exist_ok=True)
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    key = dataset_key(X, y)
+    fold_ids = load_or_make_folds(X, y, n_folds, cache_dir, key)
+    
+    results_path = os.path.join(cache_dir, f'results-{backend}-{key}-k{n_folds}.jsonl')
+    cached = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                record = json.loads(line)
+                cached[json.dumps(record['params'], sort_keys=True)] = record
+    
+    configs = [dict(zip(grid, values)) for values in product(*grid.values())]
+    pending = [params for params in configs if json.dumps(params, sort_keys=True) not in cached]
+    print(f"Configs: {len(configs)} ({len(configs) - len(pending)} cached, {len(pending)} to evaluate), "
+          f"{n_folds} folds, {len(y)} rows")
+    
+    if pending:
+        start = time.perf_counter()
+        outputs = Parallel(n_jobs=-1)(
+            delayed(evaluate_fold)(params, X, y, fold_ids, fold, backend)
+            for params in pending for fold in range(n_folds)
+        )
+        print(f"Cross-validation took {time.perf_counter() - start:.1f}s")
+        
+        # Latency is measured serially so parallel fits don't skew it
+        with open(results_path, 'a') as f:
+            for index, params in enumerate(pending):
+                fold_results = outputs[index * n_folds:(index + 1) * n_folds]
+                accuracies = [accuracy for accuracy, _ in fold_results]
+                p50, p99, size = serving_cost(fold_results[0][1], X)
+                record = {
+                    'params': params,
+                    'accuracy_mean': float(np.mean(accuracies)),
+                    'accuracy_std': float(np.std(accuracies)),
+                    'latency_p50_us': p50,
+                    'latency_p99_us': p99,
+                    'size_bytes': size
+                }
+                cached[json.dumps(params, sort_keys=True)] = record
+                f.write(json.dumps(record) + '\n')
+    
+    results = [cached[json.dumps(params, sort_keys=True)] for params in configs]
+    front = set(pareto_front(results))
+    order = sorted(range(len(results)), key=lambda i: (-results[i]['accuracy_mean'], results[i]['latency_p99_us']))
+    
+    widths = {name: max(len(name), 5) for name in grid}
+    print('\n' + ' '.join(f'{name:>{width}}' for name, width in widths.items()) +
+          f" {'accuracy':>15} {'p50 us':>8} {'p99 us':>8} {'size KB':>8}  pareto")
+    for i in order:
+        r = results[i]
+        params = r['params']
+        print(' '.join(f'{str(params[name]):>{width}}' for name, width in widths.items()) +
+              f" {r['accuracy_mean']:>8.2%} ±{r['accuracy_std']:>5.1%} {r['latency_p50_us']:>8.0f} "
+              f"{r['latency_p99_us']:>8.0f} {r['size_bytes'] / 1024:>8.1f}  {'*' if i in front else ''}")
+    
+    if p99_budget_us is not None:
+        within = [results[i] for i in order if results[i]['latency_p99_us'] <= p99_budget_us]
+        if within:
+            print(f"\nMost accurate config within p99 {p99_budget_us:.0f} us: {within[0]['params']}")
+        else:
+            print(f"\nNo config meets p99 {p99_budget_us:.0f} us")
+    return results
+
 def save_model(model, label_encoder):
     """
     Save trained model and encoder
@@ -106,6 +379,64 @@ def save_model(model, label_encoder):
     print("✓ Model saved to 'food_health_model.joblib'")
     print("✓ Label encoder saved to 'label_encoder.joblib'")
 
+def export_forest(model, label_encoder, path=COMPILED_MODEL_NAME):
+    """
+    Flatten the trained forest (or boosted model) into contiguous NumPy
+    arrays so the API can serve it without importing scikit-learn. The
+    artifact records the hash of the saved joblib pickles, so the servers
+    refuse it once they are replaced without re-exporting
+    """
+    print("\n=== Exporting Compiled Model ===")
+    forest = compile_model(model)
+    forest.save(path, label_encoder.classes_, source_hash=source_hash(os.path.dirname(os.path.abspath(path))))
+    print(f"✓ {forest.kind}: {len(forest.roots)} trees, {len(forest.feature)} nodes saved to '{path}'")
+    return forest
+
+def remove_stale_compact(path=COMPACT_MODEL_NAME):
+    """
+    The servers prefer a compacted forest, so one made from the previous
+    model would keep being served after retraining
+    """
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"✓ Removed stale '{path}' (rerun compact_model.py to compact a forest)")
+
+def verify_forest_export(model, path=COMPILED_MODEL_NAME, data_path='data/sample_nutrition.csv'):
+    """
+    Parity check: the exported model must reproduce sklearn's
+    predict_proba on the sample dataset
+    """
+    print("\n=== Verifying Compiled Model ===")
+    forest, _ = load_compiled_model(path)
+    X = pd.read_csv(data_path)[FEATURE_COLS].to_numpy(dtype=np.float64)
+    
+    # Add perturbed copies so rows land on both sides of the split thresholds
+    rng = np.random.default_rng(42)
+    X = np.vstack([X, X * rng.uniform(0.5, 1.5, size=X.shape)])
+    
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    max_diff = float(np.abs(expected - actual).max())
+    identical = np.array_equal(expected, actual)
+    
+    print(f"Rows checked: {len(X)}")
+    print(f"Max probability difference: {max_diff:.2e} ({'bit-for-bit' if identical else 'within tolerance'})")
+    if not np.allclose(expected, actual, rtol=0, atol=1e-12) or \
+            not np.array_equal(model.predict(X), forest.predict(X)):
+        raise AssertionError(f"Compiled model disagrees with sklearn (max diff {max_diff:.2e})")
+    print("✓ Compiled model matches sklearn")
+    return max_diff
+
+def publish():
+    """
+    Copy the saved artifacts into a new version under models/ and make it
+    the active one; running API servers load it in the background and
+    switch over without a restart
+    """
+    version = publish_model('.')
+    print(f"✓ Published model version '{version}' (models/manifest.json)")
+    return version
+
 def test_prediction(model, label_encoder):
     """
     Test the model with sample predictions
@@ -121,6 +452,7 @@ def test_prediction(model, label_encoder):
         ([900, 0, 0, 100, 0, 0, 0], "Ghee")
     ]
     
+    columns = class_columns(label_encoder)
     for features, food_name in test_samples:
         prediction = model.predict([features])[0]
         label = label_encoder.inverse_transform([prediction])[0]
@@ -128,9 +460,48 @@ def test_prediction(model, label_encoder):
         
         print(f"\n{food_name}:")
         print(f"  Prediction: {label}")
-        print(f"  Confidence: Healthy={probabilities[2]:.1%}, Moderate={probabilities[1]:.1%}, Unhealthy={probabilities[0]:.1%}")
+        print(f"  Confidence: Healthy={probabilities[columns['Healthy']]:.1%}, "
+              f"Moderate={probabilities[columns['Moderate']]:.1%}, Unhealthy={probabilities[columns['Unhealthy']]:.1%}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train the Swasthya food health model')
+    parser.add_argument('--export-only', action='store_true',
+                        help='re-export and verify the existing model without retraining')
+    parser.add_argument('--incremental', metavar='CSV',
+                        help='add trees for the new labelled rows in CSV to the existing model')
+    parser.add_argument('--backend', choices=sorted(MODEL_BACKENDS), default='forest',
+                        help='model family to train or search: random forest or histogram gradient boosting '
+                             '(default forest)')
+    parser.add_argument('--add-trees', type=int, default=20,
+                        help='trees (boosting iterations) to add in --incremental mode (default 20)')
+    parser.add_argument('--tolerance', type=float, default=0.0,
+                        help='allowed held-out accuracy drop before refusing to publish (default 0)')
+    parser.add_argument('--search', action='store_true',
+                        help='cross-validated hyperparameter search instead of training')
+    parser.add_argument('--grid', type=json.loads, default=None,
+                        help='JSON grid overriding the default, e.g. \'{"n_estimators": [50, 100]}\'')
+    parser.add_argument('--folds', type=int, default=5, help='folds for --search (default 5)')
+    parser.add_argument('--p99-budget-us', type=float, default=None,
+                        help='report the most accurate config whose single-item p99 latency fits this budget')
+    parser.add_argument('--no-publish', action='store_true',
+                        help='save the model files without publishing a new version to running servers')
+    parser.add_argument('--activate', metavar='VERSION',
+                        help='make an already published version active again (rollback) and exit')
+    parser.add_argument('--list-versions', action='store_true', help='list published versions and exit')
+    args = parser.parse_args()
+    
+    # Version management only, no training
+    if args.list_versions:
+        manifest = read_manifest('.') or {'active': None, 'versions': []}
+        for entry in manifest['versions']:
+            marker = '*' if entry['version'] == manifest['active'] else ' '
+            print(f"{marker} {entry['version']}  {entry['created']}")
+        sys.exit(0)
+    if args.activate:
+        activate_version('.', args.activate)
+        print(f"✓ Version '{args.activate}' is now active")
+        sys.exit(0)
+    
     print("=" * 60)
     print("SWASTHYA AI - FOOD HEALTH PREDICTION MODEL TRAINING")
     print("=" * 60)
@@ -139,6 +510,41 @@ if __name__ == "__main__":
     if not os.path.exists('data'):
         os.makedirs('data')
     
+    # Re-export the existing model without retraining
+    if args.export_only:
+        model = joblib.load('food_health_model.joblib')
+        label_encoder = joblib.load('label_encoder.joblib')
+        export_forest(model, label_encoder)
+        verify_forest_export(model)
+        sys.exit(0)
+    
+    # Add trees for new labelled rows instead of retraining from scratch
+    if args.incremental:
+        model = joblib.load('food_health_model.joblib')
+        label_encoder = joblib.load('label_encoder.joblib')
+        candidate, baseline, updated, accepted = incremental_update(
+            model, label_encoder, load_sample_data(), pd.read_csv(args.incremental),
+            add_trees=args.add_trees, tolerance=args.tolerance
+        )
+        if not accepted:
+            print(f"✗ Accuracy regressed by more than {args.tolerance:.2%}; model NOT published")
+            sys.exit(1)
+        save_model(candidate, label_encoder)
+        export_forest(candidate, label_encoder)
+        verify_forest_export(candidate)
+        remove_stale_compact()
+        if not args.no_publish:
+            publish()
+        print("✓ Incremental update published")
+        sys.exit(0)
+    
+    # Search hyperparameters instead of training
+    if args.search:
+        X, y, _ = preprocess_data(load_sample_data())
+        search_hyperparameters(X, y, dict(SEARCH_GRIDS[args.backend], **(args.grid or {})), args.folds,
+                               p99_budget_us=args.p99_budget_us, backend=args.backend)
+        sys.exit(0)
+    
     # Load data
     df = load_sample_data()
     
@@ -148,10 +554,15 @@ if __name__ == "__main__":
         
         if X is not None:
             # Train
-            model = train_model(X, y)
+            model = train_model(X, y, label_encoder, args.backend)
             
             # Save
             save_model(model, label_encoder)
+            export_forest(model, label_encoder)
+            verify_forest_export(model)
+            remove_stale_compact()
+            if not args.no_publish:
+                publish()
             
             # Test
             test_prediction(model, label_encoder)
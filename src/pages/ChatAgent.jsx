@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { Send, User, Bot, RefreshCcw, Download, Info } from 'lucide-react';
-import { predictFood, analyzeMeal, checkMLHealth } from '../services/mlService';
+import { predictFood, analyzeMeal, checkMLHealth, generatePlan } from '../services/mlService';
 import { useUser } from '../context/UserContext';
 import { Save } from 'lucide-react';
 import './ChatAgent.css';
@@ -28,6 +28,16 @@ const getDietPreference = (dietType = '') => {
     return 'vegetarian';
 };
 
+// Daily nutrition targets sent to the plan optimizer for each goal
+const getPlanTargets = (goal = '') => {
+    if (goal === 'Weight Loss') return { calories: 1600 };
+    if (goal === 'Weight Gain') return { calories: 2600 };
+    if (goal === 'Muscle Build') return { calories: 2400, protein: 120 };
+    return { calories: 2000 };
+};
+
+const formatPlanMeal = (items = []) => items.map((item) => `${item.name} (${item.grams} g)`).join(', ');
+
 const ChatAgent = () => {
     const { user, addSavedPlan } = useUser();
     const [messages, setMessages] = useState([]);
@@ -162,8 +172,21 @@ const ChatAgent = () => {
 
         try {
             let analysis = { meal_score: 85, meal_rating: 'Excellent', meal_emoji: '🌟' };
+            let optimized = null;
 
             if (apiStatus === 'online') {
+                try {
+                    const result = await generatePlan({ ...getPlanTargets(data.goal), diet_type: dietType, cuisine });
+                    if (result.success) {
+                        optimized = result;
+                        analysis = result;
+                    }
+                } catch (error) {
+                    console.error('Plan optimizer failed, using template meals:', error);
+                }
+            }
+
+            if (apiStatus === 'online' && !optimized) {
                 const result = await analyzeMeal(suggestedFoods);
                 if (result.success) {
                     analysis = result;
@@ -171,11 +194,14 @@ const ChatAgent = () => {
             }
 
             const plan = {
-                title: `${cuisine} Style ${data.goal} Plan`,
-                breakfast: selectedMeals.breakfast,
-                lunch: selectedMeals.lunch + ' with sprouts salad',
-                snack: selectedMeals.snack,
-                dinner: selectedMeals.dinner,
+                // The optimizer may have ignored a cuisine the catalog does not cover
+                title: optimized && optimized.relaxed?.includes('cuisine')
+                    ? `${data.goal} Plan`
+                    : `${cuisine} Style ${data.goal} Plan`,
+                breakfast: optimized ? formatPlanMeal(optimized.plan.breakfast) : selectedMeals.breakfast,
+                lunch: optimized ? formatPlanMeal(optimized.plan.lunch) : selectedMeals.lunch + ' with sprouts salad',
+                snack: optimized ? formatPlanMeal(optimized.plan.snack) : selectedMeals.snack,
+                dinner: optimized ? formatPlanMeal(optimized.plan.dinner) : selectedMeals.dinner,
                 score: analysis.meal_score,
                 rating: analysis.meal_rating,
                 emoji: analysis.meal_emoji,
@@ -3,6 +3,9 @@
 
 const ML_API_URL = '/api';
 
+// Nutrients in the order the model was trained on (api/scoring.py FEATURE_NAMES)
+const PREDICTION_FEATURES = ['calories', 'protein', 'carbs', 'fat', 'fiber', 'iron', 'vitamin_c'];
+
 /**
  * Check if ML API server is running
  */
@@ -32,13 +35,8 @@ export const checkMLHealth = async () => {
  */
 export const predictFood = async (nutritionData) => {
     try {
-        const response = await fetch(`${ML_API_URL}/predict`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(nutritionData),
-        });
+        // GET with the canonical query so repeat lookups hit the CDN or get a 304
+        const response = await fetch(`${ML_API_URL}/predict?${predictionQuery(nutritionData)}`);
 
         if (!response.ok) {
             throw new Error(`API Error: ${response.status}`);
@@ -52,6 +50,43 @@ export const predictFood = async (nutritionData) => {
     }
 };
 
+/**
+ * Python's round(value, 2), which the API uses for canonical URLs: the exact
+ * binary value rounded to the nearest hundredth, ties to even. toFixed rounds
+ * the same exact value (unlike Math.round(value * 100), which rounds the
+ * already inexact product) but sends ties away from zero; a double is an
+ * exact tie only when it is an odd multiple of 1/8.
+ *
+ * @param {number} value
+ * @returns {number}
+ */
+const roundHundredths = (value) => {
+    const eighths = value * 8;
+    if (Number.isInteger(eighths) && eighths % 2 !== 0) {
+        const lower = Math.floor(value * 100);
+        return (lower % 2 === 0 ? lower : lower + 1) / 100;
+    }
+    return Number(value.toFixed(2));
+};
+
+/**
+ * Canonical query string for GET /api/predict: values rounded to 2 decimals
+ * exactly as the server rounds them, zeros dropped, nutrients in the model's
+ * feature order. Other spellings work too but cost a redirect.
+ * ml/benchmarks/canonical_query_cases.json lists edge values both sides must
+ * agree on (checked by ml/benchmarks/query_parity.py).
+ * 
+ * @param {Object} nutritionData - Nutritional information (see predictFood)
+ * @returns {string} Query string without the leading '?'
+ */
+export const predictionQuery = (nutritionData) => {
+    return PREDICTION_FEATURES
+        .map((name) => [name, roundHundredths(parseFloat(nutritionData[name]) || 0)])
+        .filter(([, value]) => value !== 0)
+        .map(([name, value]) => `${name}=${value}`)
+        .join('&');
+};
+
 /**
  * Analyze a complete meal with multiple food items
  * 
@@ -80,6 +115,70 @@ export const analyzeMeal = async (foods) => {
     }
 };
 
+/**
+ * Generate a one-day meal plan from the food catalog, optimized for health score
+ * 
+ * @param {Object} targets - Nutrition targets and preferences
+ * @param {number} targets.calories - Daily calories
+ * @param {number} [targets.protein] - Daily protein in grams (optional)
+ * @param {number} [targets.carbs] - Daily carbohydrates in grams (optional)
+ * @param {number} [targets.fat] - Daily fat in grams (optional)
+ * @param {string} [targets.diet_type] - vegan, vegetarian, eggetarian or non-vegetarian
+ * @param {string} [targets.cuisine] - Preferred cuisine (optional)
+ * @returns {Promise<Object>} Plan with foods and portions per meal, totals and meal score; `relaxed`
+ *   lists constraints that were dropped (e.g. 'cuisine' when no catalog food matches it)
+ */
+export const generatePlan = async (targets) => {
+    try {
+        const response = await fetch(`${ML_API_URL}/generate-plan`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(targets),
+        });
+
+        if (!response.ok) {
+            throw new Error(`API Error: ${response.status}`);
+        }
+
+        const data = await response.json();
+        return data;
+    } catch (error) {
+        console.error('ML Plan Generation Error:', error);
+        throw error;
+    }
+};
+
+/**
+ * Analyze a multi-day plan: totals and health scores per meal, per day and overall
+ * 
+ * @param {Array<Object>} days - Days as { name, meals: [{ name, foods }] }; each food has
+ *   nutrients per 100 g and optional grams (default 100), or just the name of a catalog food
+ * @returns {Promise<Object>} Per-day and per-meal breakdown plus a plan summary
+ */
+export const analyzePlan = async (days) => {
+    try {
+        const response = await fetch(`${ML_API_URL}/analyze-plan`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ days }),
+        });
+
+        if (!response.ok) {
+            throw new Error(`API Error: ${response.status}`);
+        }
+
+        const data = await response.json();
+        return data;
+    } catch (error) {
+        console.error('ML Plan Analysis Error:', error);
+        throw error;
+    }
+};
+
 /**
  * Helper function to format nutrition data from user input
  * 